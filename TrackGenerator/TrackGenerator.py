@@ -27,11 +27,10 @@ import os
 import sys
 import logging as log
 import math
+import hashlib
 import itertools
 import numpy as np
 
-from datetime import datetime, timedelta
-
 import Utilities.stats as stats
 import trackLandfall
 import Utilities.nctools as nctools
@@ -46,47 +45,224 @@ from scipy.ndimage.interpolation import spline_filter
 
 from StatInterface.generateStats import GenerateStats
 from StatInterface.SamplingOrigin import SamplingOrigin
-from Utilities.files import flLoadFile, flSaveFile
+from Utilities.files import flLoadFile, flGetStat
+from Utilities.track import ncSaveTracks, trackFileFields, trackFileDtype
 
 from DataProcess.CalcFrequency import CalcFrequency
 from DataProcess.CalcTrackDomain import CalcTrackDomain
 from Utilities.config import ConfigParser
 from Utilities.interp3d import interp3d
 from Utilities.parallel import attemptParallel
+from Utilities.writer import getWriter
+from Utilities.bundle import saveBundle, loadBundle
+
+TRACKFILE_HEADER = 'CycloneNumber,Datetime,TimeElapsed,Longitude,' + \
+                   'Latitude,Speed,Bearing,' + \
+                   'CentralPressure,EnvPressure,rMax\n'
+TRACKFILE_FMT = '%i,%s,%7.3f,%8.3f,%8.3f,%6.2f,%6.2f,%7.2f,%7.2f,%6.2f'
+
+# The calibration bundle in the process directory, and the attributes
+# of the objects that are saved in it:
+CALIBRATION_BUNDLE = 'calibration.bundle'
+CDF_NAMES = ('cdfInitBearing', 'cdfInitSpeed', 'cdfInitPressure',
+             'cdfInitDay', 'cdfInitSize')
+CDF_FIELDS = ('x', 'cdf', 'start', 'end', 'cdfKey', 'xKey', 'xMin',
+              'xStride')
+STATS_NAMES = ('vStats', 'pStats', 'bStats', 'dpStats')
+ORIGIN_FIELDS = ('x', 'y', 'z', 'cdfX', 'cdfY')
+LANDFALL_FIELDS = ('configFile', 'dt', 'tol')
+RASTER_FIELDS = ('land', 'lon0', 'lat0', 'resolution')
+
+# The configuration sections that determine the tracks of a simulation,
+# and the options of each section that do not. The tracks do not depend
+# on the batch size (see :meth:`TrackGenerator.iterTracks`).
+CALIBRATION_SETTINGS = {
+    'Region': (),
+    'Input': (),
+    'TrackGenerator': ('numsimulations', 'resume', 'chunksize'),
+}
+
 
 class SamplePressure(object):
     """
     Provide a method to get a 3-d interpolated mean sea level
     pressure at a given location
 
+    If `resolution` is given, the spline interpolation is evaluated
+    once for each day of the year on a grid covering `gridLimit`, and
+    :meth:`get_pressure` then takes the nearest value from this cube,
+    which is much faster than interpolating each point.
+
     :param str mslp_file: path to a 3-d (time, lat, lon) MSLP
                           netcdf file.
     :param str var: Variable name (assumed 'slp')
+    :param float resolution: resolution (degrees) of the precomputed
+                             daily cube. If None, the spline is
+                             interpolated at each point.
+    :param dict gridLimit: the domain of the precomputed cube.
     
     """
-    def __init__(self, mslp_file, var='slp'):
+    def __init__(self, mslp_file, var='slp', resolution=None,
+                 gridLimit=None):
         ncobj = nctools.ncLoadFile(mslp_file)
         data = nctools.ncGetData(ncobj, var)
         slpunits = getattr(ncobj.variables[var],'units')
 
         data = metutils.convert(data, slpunits, 'hPa')
         self.data = spline_filter(data)
-        
+        self.cube = None
+        if resolution:
+            self.precompute(gridLimit, resolution)
+
+    def interpolate(self, coords):
+        """
+        Spline interpolation of the daily long term mean sea level
+        pressure at the given coordinates.
+
+        :param coords: 3-by-n array of [day of year, latitude,
+                       longitude].
+        :return: :class:`numpy.ndarray` of long term MSLP.
+        """
+        scale = [365., 180., 360.]
+        offset = [0., -90., 0.]
+        return interp3d(self.data, coords, scale, offset, prefilter=False)
+
+    def precompute(self, gridLimit, resolution):
+        """
+        Evaluate the spline interpolation for each day of the year on
+        a regular grid covering `gridLimit`.
+
+        :param dict gridLimit: the domain of the grid.
+        :param float resolution: the grid resolution (degrees).
+        """
+        nlat = int(round((gridLimit['yMax'] - gridLimit['yMin']) /
+                         resolution)) + 1
+        nlon = int(round((gridLimit['xMax'] - gridLimit['xMin']) /
+                         resolution)) + 1
+        self.lat0 = gridLimit['yMin']
+        self.lon0 = gridLimit['xMin']
+        self.resolution = resolution
+
+        lat, lon = np.mgrid[0:nlat, 0:nlon] * resolution
+        lat = lat.ravel() + self.lat0
+        lon = lon.ravel() + self.lon0
+        log.debug('Precomputing daily MSLP on a %i x %i grid', nlat, nlon)
+
+        self.cube = np.empty((365, nlat, nlon), 'f')
+        for day in xrange(365):
+            coords = np.array([day * np.ones(len(lat)), lat, lon])
+            self.cube[day] = self.interpolate(coords).reshape((nlat, nlon))
+
     def get_pressure(self, coords):
         """
         Interpolate daily long term mean sea level pressure at
         the given coordinates.
 
-        :param list coords: [day of year, latitude, longitude]
-        :rtype: float
+        :param coords: 3-by-n array of [day of year, latitude,
+                       longitude].
+        :rtype: :class:`numpy.ndarray`
         :return: long term MSLP
 
         """
-        
-        scale = [365., 180., 360.]
-        offset = [0., -90., 0.]
-        mslp = interp3d(self.data, coords, scale, offset, prefilter=False)
-        return mslp
+        if self.cube is None:
+            return self.interpolate(coords)
+
+        # Nearest day and grid point, clipped to the precomputed grid:
+
+        day, lat, lon = np.asarray(coords, 'd')
+        ntime, nlat, nlon = self.cube.shape
+        i = np.mod(np.rint(day).astype(int), ntime)
+        j = np.clip(np.rint((lat - self.lat0) / self.resolution),
+                    0, nlat - 1).astype(int)
+        k = np.clip(np.rint((lon - self.lon0) / self.resolution),
+                    0, nlon - 1).astype(int)
+        return self.cube[i, j, k]
+
+
+class CellCDF(object):
+    """
+    Empirical CDFs of a parameter in each cell of the domain, indexed
+    so that a batch of tracks in different cells can be sampled with a
+    single search.
+
+    The rows of the table are sorted by cell number, keeping the order
+    of the rows within each cell, and the rows of cell `c` are
+    ``start[c]:end[c]``. The values and CDFs of each cell are offset by
+    a multiple of the cell number, so that they increase through the
+    whole table.
+
+    :param table: :class:`numpy.ndarray` with columns of the cell
+                  number, the parameter value and the CDF, with the
+                  rows of each cell in increasing order of value.
+
+    """
+
+    def __init__(self, table):
+        table = np.asarray(table, 'd')
+        order = np.argsort(table[:, 0], kind='mergesort')
+        cells = table[order, 0].astype(int)
+        self.x = table[order, 1]
+        self.cdf = table[order, 2]
+
+        index = np.arange(cells.max() + 1 if len(cells) > 0 else 0)
+        self.start = cells.searchsorted(index, side='left')
+        self.end = cells.searchsorted(index, side='right')
+
+        # The CDF values lie in [0, 1], so offsets of 2 per cell
+        # separate the cells. A search that leaves the rows of a cell
+        # is clipped back to them.
+
+        self.cdfKey = self.cdf + 2. * cells
+        self.xMin = self.x.min() if len(cells) > 0 else 0.
+        self.xStride = np.ptp(self.x) + 1. if len(cells) > 0 else 1.
+        self.xKey = (self.x - self.xMin) + self.xStride * cells
+
+    def _rows(self, cells):
+        """
+        :return: the first and last rows of each of `cells`.
+
+        :raises ValueError: if a cell has no distribution.
+        """
+        cells = np.asarray(cells, int)
+        valid = (cells >= 0) & (cells < len(self.start))
+        if np.all(valid):
+            valid = self.end[cells] > self.start[cells]
+        if not np.all(valid):
+            raise ValueError('No distribution for cells %s' %
+                             np.unique(cells[~valid]))
+        return self.start[cells], self.end[cells] - 1
+
+    def ppf(self, q, cells):
+        """
+        Percentage point function (inverse CDF) of the distribution in
+        each cell. This is the vectorised equivalent of :func:`ppf`
+        applied to the rows of each cell.
+
+        :param q: :class:`numpy.ndarray` of probabilities.
+        :param cells: :class:`numpy.ndarray` of cell numbers.
+
+        :returns: :class:`numpy.ndarray` of the sampled values.
+        """
+        first, last = self._rows(cells)
+        i = self.cdfKey.searchsorted(q + 2. * np.asarray(cells))
+        return self.x[np.clip(i, first, last)]
+
+    def cdfBelow(self, x, cells):
+        """
+        The CDF at the largest tabulated value below `x` in each
+        cell. Where `x` is not above any tabulated value, the CDF of
+        the last row of the cell is used.
+
+        :param x: :class:`numpy.ndarray` of parameter values.
+        :param cells: :class:`numpy.ndarray` of cell numbers.
+
+        :returns: :class:`numpy.ndarray` of CDF values.
+        """
+        first, last = self._rows(cells)
+        key = (np.asarray(x, 'd') - self.xMin +
+               self.xStride * np.asarray(cells))
+        i = np.clip(self.xKey.searchsorted(key), first, last + 1)
+        return self.cdf[np.where(i > first, i - 1, last)]
 
 class TrackGenerator(object):
 
@@ -133,7 +309,9 @@ class TrackGenerator(object):
                            :attr:`xMin`, :attr:`xMax`, :attr:`yMin` and
                            :attr:`yMax`. The *x* variable bounds the
                            longitude and the *y* variable bounds the
-                           latitude.
+                           latitude. Only tracks that stay inside this
+                           domain are kept, so tracks are stopped as
+                           soon as they leave it.
 
     :type  dt: float
     :param dt: the time step used the the track simulation.
@@ -156,11 +334,29 @@ class TrackGenerator(object):
                        The default value is taken from McConochie et al.
                        (2004).
 
+    :type  rng: :class:`numpy.random.Generator` or
+                :class:`numpy.random.RandomState`
+    :param rng: the stream of random numbers used to generate the
+                tracks (see :func:`Utilities.tcrandom.randomStream`).
+                If None, an unseeded stream is used. :func:`run`
+                sets a separate stream for each simulation.
+
+    :type  ensemble: bool (default: False)
+    :param ensemble: if True, the tracks from each call to
+                     :meth:`generateTracks` are advanced together as
+                     arrays (see :meth:`_ensembleTracks`), rather than
+                     one at a time.
+
+    :type  originSampler: :class:`StatInterface.SamplingOrigin.SamplingOrigin`
+    :param originSampler: the genesis location sampler. If None, it is
+                          loaded from `originPDF.nc` in `processPath`.
+
     """
 
     def __init__(self, processPath, gridLimit, gridSpace, gridInc, mslp,
                  landfall, innerGridLimit=None, dt=1.0, maxTimeSteps=360,
-                 sizeMean=57.0, sizeStdDev=0.6):
+                 sizeMean=57.0, sizeStdDev=0.6, rng=None,
+                 ensemble=False, originSampler=None):
         self.processPath = processPath
         self.gridLimit = gridLimit
         self.gridSpace = gridSpace
@@ -172,6 +368,10 @@ class TrackGenerator(object):
         self.maxTimeSteps = maxTimeSteps
         self.sizeMean = sizeMean
         self.sizeStdDev = sizeStdDev
+        self.ensemble = ensemble
+        if rng is None:
+            rng = random.randomStream()
+        self.rng = rng
         self.timeOverflow = dt * maxTimeSteps
         self.missingValue = sys.maxint  # FIXME: remove
         self.progressbar = None  # FIXME: remove
@@ -179,12 +379,18 @@ class TrackGenerator(object):
         self.allCDFInitSpeed = None
         self.allCDFInitPressure = None
         self.allCDFInitSize = None
+        self.cdfInitBearing = None
+        self.cdfInitSpeed = None
+        self.cdfInitPressure = None
+        self.cdfInitDay = None
+        self.cdfInitSize = None
         self.cdfSize = None
         self.vStats = None
         self.pStats = None
         self.bStats = None
         self.dpStats = None
 
+        self.innovations = None
         self.dpChi = None
         self.dsChi = None
         self.pChi = None
@@ -197,8 +403,10 @@ class TrackGenerator(object):
         self.sChi = None
         self.v = None
 
-        originDistFile = pjoin(processPath, 'originPDF.nc')
-        self.originSampler = SamplingOrigin(originDistFile, None, None)
+        if originSampler is None:
+            originDistFile = pjoin(processPath, 'originPDF.nc')
+            originSampler = SamplingOrigin(originDistFile, None, None)
+        self.originSampler = originSampler
 
     def loadInitialConditionDistributions(self):
         """
@@ -218,7 +426,8 @@ class TrackGenerator(object):
         tropical cyclone tracks with random values when
         :attr:`initBearing`,  :attr:`initSpeed`, and
         :attr:`initPressure` are not provided to
-        :meth:`generateTracks`.
+        :meth:`generateTracks`. Each is indexed by cell in a
+        :class:`CellCDF` when it is loaded.
         """
 
         def load(filename):
@@ -281,6 +490,13 @@ class TrackGenerator(object):
                                                    self.sizeStdDev,
                                                    maxrad=120.0)).T
 
+        self.cdfInitBearing = CellCDF(self.allCDFInitBearing)
+        self.cdfInitSpeed = CellCDF(self.allCDFInitSpeed)
+        self.cdfInitPressure = CellCDF(self.allCDFInitPressure)
+        self.cdfInitDay = CellCDF(self.allCDFInitDay)
+        if self.allCDFInitSize is not None:
+            self.cdfInitSize = CellCDF(self.allCDFInitSize)
+
     def loadCellStatistics(self):
         """
         Load the cell statistics for speed, bearing, pressure, and pressure
@@ -325,6 +541,53 @@ class TrackGenerator(object):
         self.dpStats = init('pressure_rate')
         self.dpStats.load(pjoin(self.processPath, 'pressure_rate_stats.nc'))
 
+    def saveCalibration(self, filename, attributes=None):
+        """
+        Save the loaded calibration -- the genesis sampler, the
+        initial condition CDFs, the cell statistics, the MSLP and the
+        land raster -- to a bundle file (see :mod:`Utilities.bundle`),
+        which :func:`loadCalibration` maps back into memory.
+
+        The land-sea mask is not saved, so :attr:`landfall` must have a
+        land raster (see :class:`trackLandfall.LandfallDecay`).
+
+        :param str filename: the bundle file name.
+        :param dict attributes: other values to save in the bundle.
+        """
+        arrays = {}
+        attributes = dict(attributes or {})
+
+        _packFields('origin.', self.originSampler, ORIGIN_FIELDS,
+                    arrays, attributes)
+        for name in CDF_NAMES:
+            if getattr(self, name) is not None:
+                _packFields(name + '.', getattr(self, name), CDF_FIELDS,
+                            arrays, attributes)
+        for name in STATS_NAMES:
+            coeffs = getattr(self, name).coeffs
+            fields = sorted(vars(coeffs))
+            attributes[name + '.fields'] = fields
+            _packFields(name + '.', coeffs, fields, arrays, attributes)
+        _packFields('', self, ('allCDFInitSize', 'cdfSize'), arrays,
+                    attributes)
+
+        if self.mslp.cube is None:
+            fields = ('cube', 'data')
+        else:
+            fields = ('cube', 'lat0', 'lon0', 'resolution')
+        attributes['mslp.fields'] = fields
+        _packFields('mslp.', self.mslp, fields, arrays, attributes)
+
+        if self.landfall.raster is None:
+            raise ValueError('The land-sea mask must be rasterised to '
+                             'save the calibration')
+        _packFields('landfall.', self.landfall, LANDFALL_FIELDS, arrays,
+                    attributes)
+        _packFields('raster.', self.landfall.raster, RASTER_FIELDS,
+                    arrays, attributes)
+
+        saveBundle(filename, arrays, attributes)
+
     def generateTracks(self, nTracks, initLon=None, initLat=None,
                        initSpeed=None, initBearing=None,
                        initPressure=None, initEnvPressure=None,
@@ -374,133 +637,189 @@ class TrackGenerator(object):
 
         :rtype :class:`numpy.array`
         :return: the tracks generated.
+
+        All the tracks are generated in a single batch. Use
+        :meth:`iterTracks` to generate a large number of tracks with
+        bounded memory.
+        """
+
+        chunks = [tracks for tracks in
+                  self.iterTracks(nTracks, initLon=initLon, initLat=initLat,
+                                  initSpeed=initSpeed,
+                                  initBearing=initBearing,
+                                  initPressure=initPressure,
+                                  initEnvPressure=initEnvPressure,
+                                  initRmax=initRmax, initDay=initDay,
+                                  chunkSize=max(nTracks, 1))
+                  if len(tracks) > 0]
+        if len(chunks) == 0:
+            return np.empty(0, dtype=trackFileDtype)
+        return np.concatenate(chunks)
+
+    def iterTracks(self, nTracks, initLon=None, initLat=None,
+                   initSpeed=None, initBearing=None, initPressure=None,
+                   initEnvPressure=None, initRmax=None, initDay=None,
+                   chunkSize=1000):
+        """
+        Generate tropical cyclone tracks in batches of at most
+        `chunkSize` genesis points, yielding the tracks of each batch
+        once they have been filtered.
+
+        Only one batch of tracks is held at a time, so the memory used
+        does not depend on `nTracks`. The cyclone numbers continue
+        from one batch to the next. The arguments are as for
+        :meth:`generateTracks`, which generates all the tracks in a
+        single batch.
+
+        The uniform variates for the genesis conditions of all the
+        tracks are drawn before the first batch, and the variates for
+        stepping each track are then drawn in turn, so the tracks do
+        not depend on `chunkSize`.
+
+        :type  chunkSize: int
+        :param chunkSize: the largest number of genesis points in a
+                          batch.
+
+        :rtype: generator
+        :return: the tracks of each batch, one row per track
+                 observation (empty if no tracks of the batch were
+                 kept).
         """
 
         log.debug('Generating %d tropical cyclone tracks', nTracks)
-        genesisYear = int(uniform(1900,9998))
-        results = []
-        for j in range(1, nTracks + 1):
-
-            if not (initLon and initLat):
-                log.debug('Cyclone origin not given, sampling a' +
-                          ' random one instead.')
-                genesisLon, genesisLat = \
-                    self.originSampler.ppf(uniform(), uniform())
-            else:
-                log.debug('Using prescribed initial position' +
-                          ' (%6.2f, %6.2f)'.format(initLon, initLat))
-                genesisLon = initLon
-                genesisLat = initLat
+        genesisYear = int(self.rng.uniform(1900, 9998))
 
-            # Get the initial grid cell
+        # The columns are used for the origin (2), bearing, speed,
+        # size, day, hour and pressure.
 
-            initCellNum = Cstats.getCellNum(genesisLon, genesisLat,
-                                            self.gridLimit,
-                                            self.gridSpace)
+        u = self.rng.uniform(size=(nTracks, 8))
 
-            log.debug('Cyclones origin: (%6.2f, %6.2f) Cell: %i' +
-                      ' Grid: %s', genesisLon, genesisLat, initCellNum,
-                      self.gridLimit)
+        for first in range(0, nTracks, chunkSize):
+            yield self._generateBatch(u[first:first + chunkSize],
+                                      first, genesisYear, initLon,
+                                      initLat, initSpeed, initBearing,
+                                      initPressure, initEnvPressure,
+                                      initRmax, initDay)
 
-            # Sample an initial bearing if none is provided
+    def _generateBatch(self, u, firstNumber, genesisYear, initLon,
+                       initLat, initSpeed, initBearing, initPressure,
+                       initEnvPressure, initRmax, initDay):
+        """
+        Generate and filter one batch of tracks for :meth:`iterTracks`.
 
-            if not initBearing:
-                ind = self.allCDFInitBearing[:, 0] == initCellNum
-                cdfInitBearing = self.allCDFInitBearing[ind, 1:3]
-                genesisBearing = ppf(uniform(), cdfInitBearing)
-            else:
-                genesisBearing = initBearing
+        :param u: :class:`numpy.ndarray` of the uniform variates for
+                  the genesis conditions, one row per genesis point
+                  in the batch.
+        :param int firstNumber: the number of tracks generated by the
+                                previous batches.
+        :param int genesisYear: the year of the genesis times.
 
-            # Sample an initial speed if none is provided
+        :rtype: :class:`numpy.ndarray`
+        :return: the tracks that were kept, one row per observation.
+        """
 
-            if not initSpeed:
-                ind = self.allCDFInitSpeed[:, 0] == initCellNum
-                cdfInitSpeed = self.allCDFInitSpeed[ind, 1:3]
-                genesisSpeed = ppf(uniform(), cdfInitSpeed)
-            else:
-                genesisSpeed = initSpeed
+        nTracks = len(u)
+        ones = np.ones(nTracks)
 
-            # Sample an initial maximum radius if none is provided
+        if not (initLon and initLat):
+            log.debug('Cyclone origin not given, sampling random' +
+                      ' ones instead.')
+            origins = [self.originSampler.ppf(q1, q2) for q1, q2 in u[:, :2]]
+            genesisLon, genesisLat = \
+                np.array(origins, 'd').reshape((nTracks, 2)).T
+        else:
+            log.debug('Using prescribed initial position' +
+                      ' (%6.2f, %6.2f)', initLon, initLat)
+            genesisLon = initLon * ones
+            genesisLat = initLat * ones
 
-            if not initRmax:
-                if not self.allCDFInitSize:
-                    cdfSize = self.cdfSize[:, [0, 2]]
-                else:
-                    ind = self.allCDFInitSize[:, 0] == initCellNum
-                    cdfSize = self.allCDFInitSize[ind, 1:3]
-                genesisRmax = ppf(uniform(), cdfSize)
-            else:
-                genesisRmax = initRmax
-                
-            # Sample an initial day if none is provided
+        # Get the initial grid cells
 
-            if not initDay:
-                ind = self.allCDFInitDay[:,0] == initCellNum
-                cdfInitDay = self.allCDFInitDay[ind, 1:3]
-                genesisDay = ppf(uniform(), cdfInitDay)
-            else:
-                genesisDay = initDay
-            
-            genesisHour = int(uniform(0,24))
-            
-            initTimeStr = "%04d-%03d %d:00" % (genesisYear, genesisDay, genesisHour)
-            genesisTime = datetime.strptime(initTimeStr, "%Y-%j %H:%M")
-
-            # Sample an initial environment pressure if none is
-            # provided - dependent on initial day of year:
-
-            if not initEnvPressure:
-                initEnvPressure = self.mslp.get_pressure(np.array([[genesisDay],
-                                                          [genesisLat],
-                                                          [genesisLon]]))
-                                                       
-            # Sample an initial pressure if none is provided
-
-            if not initPressure:
-                # Sample subject to the constraint initPressure <
-                # initEnvPressure
-                ind = self.allCDFInitPressure[:, 0] == initCellNum
-                cdfInitPressure = self.allCDFInitPressure[ind, 1:3]
-                ix = cdfInitPressure[:, 0].searchsorted(initEnvPressure)
-                upperProb = cdfInitPressure[ix - 1, 1]
-                genesisPressure = ppf(uniform(0.0, upperProb),
-                                      cdfInitPressure)
+        initCellNum = stats.getCellNumArray(genesisLon, genesisLat,
+                                            self.gridLimit, self.gridSpace)
+        if np.any(initCellNum < 0):
+            raise ValueError('Invalid input on cellNum: cell number is' +
+                             ' out of range')
+
+        # Sample the initial bearing, speed, maximum radius and day
+        # where they are not provided
+
+        if not initBearing:
+            genesisBearing = self.cdfInitBearing.ppf(u[:, 2], initCellNum)
+        else:
+            genesisBearing = initBearing * ones
+
+        if not initSpeed:
+            genesisSpeed = self.cdfInitSpeed.ppf(u[:, 3], initCellNum)
+        else:
+            genesisSpeed = initSpeed * ones
+
+        if not initRmax:
+            if self.cdfInitSize is None:
+                genesisRmax = ppf(u[:, 4], self.cdfSize[:, [0, 2]])
             else:
-                genesisPressure = initPressure
-                                                       
-            # Do not generate tracks from this genesis point if we are
-            # going to exit the domain on the first step
-
-            nextLon, nextLat = \
-                maputils.bear2LatLon(genesisBearing,
-                                     self.dt * genesisSpeed,
-                                     genesisLon, genesisLat)
-
-            log.debug('initBearing: %.2f initSpeed: %.2f' +
-                      ' initEnvPressure: %.2f initPressure: %.2f',
-                      genesisBearing, genesisSpeed, initEnvPressure,
-                      genesisPressure)
-
-            xMin = self.gridLimit['xMin']
-            xMax = self.gridLimit['xMax']
-            yMin = self.gridLimit['yMin']
-            yMax = self.gridLimit['yMax']
-
-            if not ((xMin <= nextLon <= xMax) and
-                    (yMin <= nextLat <= yMax)):
-                log.debug('Tracks will exit domain immediately' +
-                          ' for this genesis point.')
-                continue
+                genesisRmax = self.cdfInitSize.ppf(u[:, 4], initCellNum)
+        else:
+            genesisRmax = initRmax * ones
+
+        if not initDay:
+            genesisDay = self.cdfInitDay.ppf(u[:, 5], initCellNum)
+        else:
+            genesisDay = initDay * ones
 
-            log.debug('** Generating track %i from point (%.2f,%.2f)',
-                      j, genesisLon, genesisLat)
+        genesisHour = (24 * u[:, 6]).astype(int)
+        genesisTime = (np.datetime64('%04d-01-01' % genesisYear, 's') +
+                       (genesisDay.astype(int) - 1) * np.timedelta64(1, 'D') +
+                       genesisHour * np.timedelta64(1, 'h'))
 
-            track = self._singleTrack(j, genesisLon, genesisLat,
-                                      genesisSpeed, genesisBearing,
-                                      genesisPressure, initEnvPressure,
-                                      genesisRmax, genesisTime)
+        # Sample the initial environment pressure if none is
+        # provided - dependent on initial day of year:
 
-            results.append(track)
+        if not initEnvPressure:
+            genesisEnvPressure = self.mslp.get_pressure(
+                np.array([genesisDay, genesisLat, genesisLon]))
+        else:
+            genesisEnvPressure = initEnvPressure * ones
+
+        # Sample the initial pressure if none is provided, subject to
+        # the constraint initPressure < initEnvPressure
+
+        if not initPressure:
+            upperProb = self.cdfInitPressure.cdfBelow(genesisEnvPressure,
+                                                      initCellNum)
+            genesisPressure = self.cdfInitPressure.ppf(upperProb * u[:, 7],
+                                                       initCellNum)
+        else:
+            genesisPressure = initPressure * ones
+
+        # Do not generate tracks from genesis points where they are
+        # going to exit the domain on the first step
+
+        nextLon, nextLat = maputils.bear2LatLonArray(genesisBearing,
+                                                     self.dt * genesisSpeed,
+                                                     genesisLon, genesisLat)
+
+        xMin = self.gridLimit['xMin']
+        xMax = self.gridLimit['xMax']
+        yMin = self.gridLimit['yMin']
+        yMax = self.gridLimit['yMax']
+
+        inside = ((xMin <= nextLon) & (nextLon <= xMax) &
+                  (yMin <= nextLat) & (nextLat <= yMax))
+        log.debug('%i tracks will exit the domain immediately',
+                  nTracks - inside.sum())
+
+        cycloneNumber = np.arange(firstNumber + 1, firstNumber + nTracks + 1)
+        genesis = [values[inside] for values in
+                   (cycloneNumber, genesisLon, genesisLat, genesisSpeed,
+                    genesisBearing, genesisPressure, genesisEnvPressure,
+                    genesisRmax)]
+        genesis.append(genesisTime[inside])
+
+        if self.ensemble:
+            results = self._ensembleTracks(*genesis)
+        else:
+            results = [self._singleTrack(*args) for args in zip(*genesis)]
 
         # Define some filter functions
 
@@ -525,12 +844,7 @@ class TrackGenerator(object):
             otherwise.
             """
             index, dates, age, lon, lat, speed, bearing, P, penv, rmax = track
-            inside = [lon[k] > self.innerGridLimit['xMin'] and
-                      lon[k] < self.innerGridLimit['xMax'] and
-                      lat[k] > self.innerGridLimit['yMin'] and
-                      lat[k] < self.innerGridLimit['yMax']
-                      for k in range(len(lon))]
-            return all(inside)
+            return self._insideInnerDomain(lon, lat).all()
 
         def validPressures(track):
             """
@@ -539,6 +853,18 @@ class TrackGenerator(object):
             index, dates, age, lon, lat, speed, bearing, P, eP, rmax = track
             return all(np.round(P, 2) < np.round(eP, 2))
 
+        if self.innerGridLimit:
+            # Tracks are stopped at their first point outside the inner
+            # domain, so the last point of these tracks is outside it:
+            stopped = [len(track[0]) for track in results
+                       if 0 < len(track[0]) < self.maxTimeSteps and
+                       not self._insideInnerDomain(track[3][-1:],
+                                                   track[4][-1:])[0]]
+            log.debug('Stopped %i tracks on leaving the inner domain: '
+                      '%i time steps computed, up to %i saved',
+                      len(stopped), sum(len(track[0]) for track in results),
+                      len(stopped) * self.maxTimeSteps - sum(stopped))
+
         # Filter the generated tracks based on certain criteria
         nbefore = len(results)
         results = [track for track in results if not empty(track)]
@@ -560,15 +886,16 @@ class TrackGenerator(object):
             log.debug('Removed %i tracks that do not pass inside' +
                       ' domain.', nbefore - len(results))
 
-        # Return the tracks as a stacked array
-        
-        if len(results) > 1:
-            return np.hstack([np.vstack(r) for r in results]).T
-        else:
-            return np.array(results).T
-            
-        return results
-        
+        # Return the tracks as a single record array
+
+        tracks = np.empty(sum(len(track[0]) for track in results),
+                          dtype=trackFileDtype)
+        if len(results) > 0:
+            for k, field in enumerate(trackFileFields):
+                tracks[field] = np.concatenate([track[k]
+                                                for track in results])
+        return tracks
+
     def generateTracksToFile(self, outputFile, nTracks, initLon=None,
                              initLat=None, initSpeed=None,
                              initBearing=None, initPressure=None,
@@ -584,8 +911,11 @@ class TrackGenerator(object):
         :param outputFile: the filename of the file where the tracks
                            will be saved. If `outputFile` has the `shp`
                            extension then it will be saved to a shp
-                           file. Otherwise, the tracks will be saved in
-                           csv format.
+                           file, and if it has the `nc` extension it
+                           will be saved to a netCDF track file (see
+                           :func:`Utilities.track.ncSaveTracks`).
+                           Otherwise, the tracks will be saved in csv
+                           format.
         """
 
         results = self.generateTracks(
@@ -595,9 +925,11 @@ class TrackGenerator(object):
             initEnvPressure=initEnvPressure,
             initRmax=initRmax, initDay=initDay)
 
+        # The file is written by the shared background writer:
+        writer = getWriter()
+
         if outputFile.endswith("shp"):
             from Utilities.shptools import shpSaveTrackFile
-            from Utilities.AsyncRun import AsyncRun
 
             log.debug('Outputting data into %s', outputFile)
 
@@ -607,95 +939,75 @@ class TrackGenerator(object):
                 'Type': 1,
                 'Length': 5,
                 'Precision': 0,
-                'Data': results[:, 0]
+                'Data': results['CycloneNumber']
             }
 
             fields['Time'] = {
                 'Type': 2,
                 'Length': 7,
                 'Precision': 1,
-                'Data': results[:, 1]
+                'Data': results['TimeElapsed']
             }
 
             fields['Longitude'] = {
                 'Type': 2,
                 'Length': 7,
                 'Precision': 2,
-                'Data': results[:, 2]
+                'Data': results['Longitude']
             }
 
             fields['Latitude'] = {
                 'Type': 2,
                 'Length': 7,
                 'Precision': 2,
-                'Data': results[:, 3]
+                'Data': results['Latitude']
             }
 
             fields['Speed'] = {
                 'Type': 2,
                 'Length': 6,
                 'Precision': 1,
-                'Data': results[:, 4]
+                'Data': results['Speed']
             }
 
             fields['Bearing'] = {
                 'Type': 2,
                 'Length': 6,
                 'Precision': 1,
-                'Data': results[:, 5]
+                'Data': results['Bearing']
             }
 
             fields['Pressure'] = {
                 'Type': 2,
                 'Length': 6,
                 'Precision': 1,
-                'Data': results[:, 6]
+                'Data': results['CentralPressure']
             }
 
             fields['pEnv'] = {
                 'Type': 2,
                 'Length': 6,
                 'Precision': 1,
-                'Data': results[:, 7]
+                'Data': results['EnvPressure']
             }
 
             fields['rMax'] = {
                 'Type': 2,
                 'Length': 5,
                 'Precision': 1,
-                'Data': results[:, 8]
-            }
-
-            args = {
-                'filename': outputFile,
-                'lon': results[:, 2],
-                'lat': results[:, 3],
-                'fields': fields
+                'Data': results['rMax']
             }
 
-            thr = AsyncRun(shpSaveTrackFile, args)
-            try:
-                thr.start()
-            except:
-                raise
+            writer.submit(shpSaveTrackFile, filename=outputFile,
+                          lon=results['Longitude'], lat=results['Latitude'],
+                          fields=fields)
+        elif outputFile.endswith("nc"):
+            log.debug('Outputting data into %s', outputFile)
+            writer.submit(ncSaveTracks, outputFile, results)
         else:
             log.debug('Outputting data into %s', outputFile)
-
-            header = 'CycloneNumber,TimeElapsed(hr),' + \
-                     'Longitude(degree),Latitude(degree),' + \
-                     'Speed(km/hr),Bearing(degrees),' + \
-                     'CentralPressure(hPa),EnvPressure(hPa),rMax(km)'
-
-            args = {
-                'filename': outputFile,
-                'data': results,
-                'header': header,
-                'delimiter': ',',
-                'fmt': '%7.2f'
-            }
-
-            fl = AsyncRun(flSaveFile, args)
-            fl.start()
+            writer.submit(saveTrackFile, outputFile, results,
+                          TRACKFILE_HEADER, TRACKFILE_FMT)
 
     def _singleTrack(self, cycloneNumber, initLon, initLat, initSpeed,
                      initBearing, initPressure, initEnvPressure,
@@ -748,7 +1060,6 @@ class TrackGenerator(object):
         """
 
         index = np.ones(self.maxTimeSteps, 'f') * cycloneNumber
-        dates = np.empty(self.maxTimeSteps, dtype=datetime)
         age = np.empty(self.maxTimeSteps, 'i')
         jday = np.empty(self.maxTimeSteps, 'f')
         lon = np.empty(self.maxTimeSteps, 'f')
@@ -764,8 +1075,7 @@ class TrackGenerator(object):
         # Initialise the track
 
         age[0] = 0
-        dates[0] = initTime
-        jday[0] = int(initTime.strftime("%j")) + initTime.hour/24.
+        jday[0] = _dayOfYear(initTime)
         lon[0] = initLon
         lat[0] = initLat
         speed[0] = initSpeed
@@ -776,7 +1086,11 @@ class TrackGenerator(object):
         land[0] = 0
         dist[0] = self.dt * initSpeed
 
-        timestep = timedelta(self.dt/24.)
+        # The times of all steps at once, which is much quicker than
+        # adding the timestep to a numpy.datetime64 at each step:
+        timestep = np.timedelta64(int(round(self.dt * 3600.)), 's')
+        dates = (np.datetime64(initTime, 's') +
+                 np.arange(self.maxTimeSteps) * timestep)
 
         # Initialise variables that will be used when performing a step
 
@@ -796,6 +1110,22 @@ class TrackGenerator(object):
 
         tol = 0.0
 
+        # Draw the random variates for all steps of the track: the
+        # innovations of the pressure change, bearing, speed and size
+        # models, and the perturbations of the landfall decay rate.
+
+        self.innovations = self.rng.logistic(size=(4, self.maxTimeSteps))
+        landNoise = self.rng.normal(0, 0.001, size=self.maxTimeSteps)
+
+        # A track that starts outside the inner domain is discarded,
+        # so do not step it. The random variates are drawn first, so
+        # that the following tracks are unchanged.
+
+        if not self._insideInnerDomain(lon[:1], lat[:1])[0]:
+            return (index[:1], dates[:1], age[:1], lon[:1], lat[:1],
+                    speed[:1], bearing[:1], pressure[:1], penv[:1],
+                    rmax[:1])
+
         # Generate the track
 
         for i in xrange(1, self.maxTimeSteps):
@@ -809,7 +1139,6 @@ class TrackGenerator(object):
                                               lat[i - 1])
 
             age[i] = age[i - 1] + self.dt
-            dates[i] = dates[i - 1] + timestep
             jday[i] = jday[i - 1] + self.dt/24.
             jday[i] = np.mod(jday[i], 365)
 
@@ -858,7 +1187,7 @@ class TrackGenerator(object):
             if onLand:
                 tol += float(self.dt)
                 deltaP = penv[i] - self.offshorePressure
-                alpha = 0.008 + 0.0008 * deltaP + normal(0, 0.001)
+                alpha = 0.008 + 0.0008 * deltaP + landNoise[i]
                 pressure[i] = (penv[i] - deltaP *
                                np.exp(-alpha * tol))
 
@@ -908,9 +1237,246 @@ class TrackGenerator(object):
                         speed[:i], bearing[:i], pressure[:i], penv[:i],
                         rmax[:i])
 
+            # A track that leaves the inner domain is discarded, so
+            # stop it at this point
+
+            if not self._insideInnerDomain(lon[i:i + 1], lat[i:i + 1])[0]:
+                log.debug('TC left the inner domain at time %i', i)
+                return (index[:i + 1], dates[:i + 1], age[:i + 1],
+                        lon[:i + 1], lat[:i + 1], speed[:i + 1],
+                        bearing[:i + 1], pressure[:i + 1], penv[:i + 1],
+                        rmax[:i + 1])
+
         return (index, dates, age, lon, lat, speed, bearing, pressure, 
                 penv, rmax)
 
+    def _ensembleTracks(self, cycloneNumber, initLon, initLat, initSpeed,
+                        initBearing, initPressure, initEnvPressure,
+                        initRmax, initTime):
+        """
+        Generate a set of tropical cyclone tracks together, advancing
+        all active tracks one time step at a time.
+
+        This follows the same model as :meth:`_singleTrack`, but the
+        state of the tracks is held in arrays: at each step the cell
+        coefficients are gathered for all active tracks, the AR(1) and
+        landfall decay models are applied to the arrays, and tracks
+        that terminate are retired from the active set with a mask.
+
+        The random variates of each track are drawn from :attr:`rng`
+        before stepping, one track after another and in the same order
+        as :meth:`_singleTrack`, so the tracks do not depend on how
+        many are generated together. The tracks are computed in single
+        precision, so they are statistically equivalent to, but not
+        identical with, those generated one at a time.
+
+        The arguments are sequences with one element per track, with
+        the same meaning as the arguments of :meth:`_singleTrack`.
+
+        :return: a list of tuples of :class:`numpy.ndarray`'s, one for
+                 each track, in the form returned by
+                 :meth:`_singleTrack`.
+        """
+
+        n = len(cycloneNumber)
+        nsteps = self.maxTimeSteps
+        dt = self.dt
+        rng = self.rng
+
+        lon = np.empty((n, nsteps), 'f')
+        lat = np.empty((n, nsteps), 'f')
+        speed = np.empty((n, nsteps), 'f')
+        bearing = np.empty((n, nsteps), 'f')
+        pressure = np.empty((n, nsteps), 'f')
+        penv = np.empty((n, nsteps), 'f')
+        rmax = np.empty((n, nsteps), 'f')
+
+        lon[:, 0] = initLon
+        lat[:, 0] = initLat
+        speed[:, 0] = initSpeed
+        bearing[:, 0] = initBearing
+        pressure[:, 0] = initPressure
+        penv[:, 0] = np.ravel(initEnvPressure)
+        rmax[:, 0] = initRmax
+
+        initTime = np.asarray(initTime, 'M8[s]')
+        jday = _dayOfYear(initTime).astype('f')
+        dist = (np.asarray(initSpeed, 'd') * dt).astype('f')
+        ages = (np.arange(nsteps) * dt).astype('i')
+
+        # Model state of each track, as for the attributes used by
+        # :meth:`_singleTrack`:
+
+        offshorePressure = np.array(initPressure, 'd')
+        theta = np.array(initBearing, 'd')
+        v = np.array(initSpeed, 'd')
+        dp = np.zeros(n)
+        ds = np.zeros(n)
+        vChi = np.zeros(n)
+        bChi = np.zeros(n)
+        dpChi = np.zeros(n)
+        dsChi = np.zeros(n)
+        tol = np.zeros(n)
+
+        # Draw the random variates for all steps of each track, as in
+        # :meth:`_singleTrack`
+
+        innovations = np.empty((n, 4, nsteps))
+        landNoise = np.empty((n, nsteps))
+        for k in xrange(n):
+            innovations[k] = rng.logistic(size=(4, nsteps))
+            landNoise[k] = rng.normal(0, 0.001, size=nsteps)
+
+        # Number of valid steps in each track, and the indices of the
+        # tracks that are still active:
+
+        length = np.empty(n, int)
+        length.fill(nsteps)
+        active = np.arange(n)
+
+        # Tracks that start outside the inner domain are discarded, so
+        # are not stepped
+
+        inner = self._insideInnerDomain(lon[:, 0], lat[:, 0])
+        length[~inner] = 1
+        active = active[inner]
+
+        for i in xrange(1, nsteps):
+
+            if len(active) == 0:
+                break
+
+            a = active
+            lon[a, i], lat[a, i] = \
+                maputils.bear2LatLonArray(bearing[a, i - 1], dist[a],
+                                          lon[a, i - 1], lat[a, i - 1])
+
+            jday[a] = np.mod((jday[a].astype('d') + dt/24.).astype('f'),
+                             365)
+            penv[a, i] = self.mslp.get_pressure(np.array([jday[a],
+                                                          lat[a, i],
+                                                          lon[a, i]]))
+
+            # Retire the tracks that step out of the domain
+
+            inside = ((lon[a, i] >= self.gridLimit['xMin']) &
+                      (lon[a, i] < self.gridLimit['xMax']) &
+                      (lat[a, i] > self.gridLimit['yMin']) &
+                      (lat[a, i] <= self.gridLimit['yMax']))
+            length[a[~inside]] = i
+            a = a[inside]
+
+            cellNum = stats.getCellNumArray(lon[a, i], lat[a, i],
+                                            self.gridLimit, self.gridSpace)
+            onLand = self.landfall.overLand(lon[a, i], lat[a, i])
+
+            # Take a step of the pressure change, bearing and speed
+            # models
+
+            alpha, phi, mu, sigma = _cellCoeffs(self.dpStats, cellNum,
+                                                onLand)
+            dpChi[a] = alpha * dpChi[a] + phi * innovations[a, 0, i]
+            if i == 1:
+                dp[a] += sigma * dpChi[a]
+            else:
+                dp[a] = mu + sigma * dpChi[a]
+
+            alpha, phi, mu, sigma = _cellCoeffs(self.bStats, cellNum,
+                                                onLand)
+            bChi[a] = alpha * bChi[a] + phi * innovations[a, 1, i]
+            if i == 1:
+                theta[a] += np.degrees(sigma * bChi[a])
+            else:
+                theta[a] = np.degrees(mu + sigma * bChi[a])
+            theta[a] = np.mod(theta[a], 360.)
+
+            alpha, phi, mu, sigma = _cellCoeffs(self.vStats, cellNum,
+                                                onLand)
+            vChi[a] = alpha * vChi[a] + phi * innovations[a, 2, i]
+            if i == 1:
+                v[a] += np.abs(sigma * vChi[a])
+            else:
+                v[a] = np.abs(mu + sigma * vChi[a])
+
+            bearing[a, i] = theta[a]
+            speed[a, i] = np.abs(v[a])
+
+            # Calculate the central pressure, with the landfall decay
+            # model for tracks over land
+
+            p = pressure[a, i - 1] + dp[a] * dt
+            pstat = self.pStats.coeffs
+            low = ~onLand & (p < (pstat.min[cellNum] -
+                                  4. * pstat.sig[cellNum]))
+            p[low] = pressure[a[low], i - 1] + np.abs(dp[a[low]]) * dt
+
+            land = a[onLand]
+            if len(land) > 0:
+                tol[land] += float(dt)
+                deltaP = penv[land, i] - offshorePressure[land]
+                alpha = 0.008 + 0.0008 * deltaP + landNoise[land, i]
+                p[onLand] = (penv[land, i] - deltaP *
+                             np.exp(-alpha * tol[land]))
+
+            pressure[a, i] = p
+            sea = a[~onLand]
+            offshorePressure[sea] = pressure[sea, i]
+
+            # If the empirical distribution of tropical cyclone size is
+            # loaded then sample and update the maximum radius.
+            # Otherwise, keep the maximum radius constant.
+
+            if self.allCDFInitSize:
+                alpha, phi, mu, sigma = _cellCoeffs(self.dsStats, cellNum,
+                                                    onLand)
+                dsChi[a] = alpha * dsChi[a] + phi * innovations[a, 3, i]
+                if i == 1:
+                    ds[a] += sigma * dsChi[a]
+                else:
+                    ds[a] = mu + sigma * dsChi[a]
+                r = rmax[a, i - 1] + ds[a] * dt
+                # Antithetic increment if the radius goes below 1.0
+                small = r <= 1.0
+                r[small] = rmax[a[small], i - 1] - ds[a[small]] * dt
+                rmax[a, i] = r
+            else:
+                rmax[a, i] = rmax[a, i - 1]
+
+            dist[a] = dt * speed[a, i]
+
+            # Retire the tracks that no longer satisfy the criteria
+
+            deltaP = penv[a, i] - pressure[a, i]
+            if ages[i] > 12:
+                invalid = deltaP < 5.0
+            else:
+                invalid = deltaP < 1.0
+            length[a[invalid]] = i
+            a = a[~invalid]
+
+            # Retire the tracks that leave the inner domain, which are
+            # discarded, keeping this point so they are still culled
+
+            inner = self._insideInnerDomain(lon[a, i], lat[a, i])
+            length[a[~inner]] = i + 1
+            active = a[inner]
+
+        # Split the arrays into the individual tracks
+
+        timestep = np.timedelta64(int(round(dt * 3600.)), 's')
+        offsets = np.arange(nsteps) * timestep
+
+        tracks = []
+        for k in xrange(n):
+            L = length[k]
+            index = np.ones(L, 'f') * cycloneNumber[k]
+            tracks.append((index, initTime[k] + offsets[:L], ages[:L],
+                           lon[k, :L], lat[k, :L], speed[k, :L],
+                           bearing[k, :L], pressure[k, :L], penv[k, :L],
+                           rmax[k, :L]))
+
+        return tracks
+
     def _stepPressureChange(self, c, i, onLand):
         """
         Take one step of the pressure change model.
@@ -944,7 +1510,7 @@ class TrackGenerator(object):
 
         # Do the step
 
-        self.dpChi = alpha[c] * self.dpChi + phi[c] * logistic()
+        self.dpChi = alpha[c] * self.dpChi + phi[c] * self.innovations[0, i]
 
         if i == 1:
             self.dp += sigma[c] * self.dpChi
@@ -984,7 +1550,7 @@ class TrackGenerator(object):
 
         # Do the step
 
-        self.bChi = alpha[c] * self.bChi + phi[c] * logistic()
+        self.bChi = alpha[c] * self.bChi + phi[c] * self.innovations[1, i]
 
         # Update the bearing
 
@@ -1028,7 +1594,7 @@ class TrackGenerator(object):
 
         # Do the step
 
-        self.vChi = alpha[c] * self.vChi + phi[c] * logistic()
+        self.vChi = alpha[c] * self.vChi + phi[c] * self.innovations[2, i]
 
         # Update the speed
 
@@ -1070,7 +1636,7 @@ class TrackGenerator(object):
 
         # Do the step
 
-        self.dsChi = alpha[c] * self.dsChi + phi[c] * logistic()
+        self.dsChi = alpha[c] * self.dsChi + phi[c] * self.innovations[3, i]
 
         # Update the size change
 
@@ -1079,6 +1645,31 @@ class TrackGenerator(object):
         else:
             self.ds = mu[c] + sigma[c] * self.dsChi
 
+    def _insideInnerDomain(self, lon, lat):
+        """
+        Test if points lie inside the inner domain
+        (:attr:`innerGridLimit`), if one is set.
+
+        Tracks with any point outside the inner domain are discarded, so
+        a track is stopped at the first such point. This gives exactly
+        the same tracks as stepping the track to the end and then
+        discarding it, and the random variates of the other tracks are
+        not affected when the tracks are generated one at a time (see
+        :meth:`_singleTrack`).
+
+        :param lon: :class:`numpy.ndarray` of longitudes.
+        :param lat: :class:`numpy.ndarray` of latitudes.
+
+        :return: :class:`numpy.ndarray` of bools, True for the points
+                 inside the inner domain (or all True if there is no
+                 inner domain).
+        """
+        if not self.innerGridLimit:
+            return np.ones(len(lon), bool)
+        limit = self.innerGridLimit
+        return ((lon > limit['xMin']) & (lon < limit['xMax']) &
+                (lat > limit['yMin']) & (lat < limit['yMax']))
+
     def _notValidTrackStep(self, pressure, penv, age, lon0, lat0,
                            nextlon, nextlat):
         """
@@ -1477,33 +2068,68 @@ class TrackGenerator(object):
                            dtype='f', writedata=True,
                            keepfileopen=False)
 
-# Define a global pseudo-random number generator. This is done to
-# ensure we are sampling correctly across processors when performing
-# the simulation in parallel. We use the inbuilt Python `random`
-# library as it provides the ability to `jumpahead` in the stream (as
-# opposed to `numpy.random`).
 
-PRNG = random.Random()
+def _cellCoeffs(cellStats, cellNum, onLand):
+    """
+    Gather the AR(1) coefficients of a set of tracks, using the land
+    coefficients for the tracks that are over land.
 
+    :param cellStats: the :class:`StatInterface.generateStats.GenerateStats`
+                      instance holding the cell coefficients.
+    :param cellNum: :class:`numpy.ndarray` of the cell numbers of the
+                    tracks.
+    :param onLand: boolean :class:`numpy.ndarray`, True for tracks
+                   over land.
 
-def normal(mean=0.0, stddev=1.0):
+    :returns: arrays of `alpha`, `phi`, `mu` and `sigma` for each track.
     """
-    Sample from a Normal distribution.
+    coeffs = cellStats.coeffs
+    return [np.where(onLand, getattr(coeffs, 'l' + name)[cellNum],
+                     getattr(coeffs, name)[cellNum])
+            for name in ('alpha', 'phi', 'mu', 'sig')]
+
+def _packFields(prefix, obj, fields, arrays, attributes):
     """
-    return PRNG.normalvariate(mean, stddev)
+    Add the `fields` of `obj` to the `arrays` (for arrays) or the
+    `attributes` (for other values) of a bundle, as `prefix` + field.
+    """
+    for field in fields:
+        value = getattr(obj, field)
+        if isinstance(value, np.ndarray):
+            arrays[prefix + field] = np.ma.getdata(value)
+        elif isinstance(value, np.generic):
+            attributes[prefix + field] = value.item()
+        else:
+            attributes[prefix + field] = value
 
 
-def uniform(a=0.0, b=1.0):
+def _unpackFields(prefix, obj, fields, arrays, attributes):
     """
-    Sample from a uniform distribution.
+    Set the `fields` of `obj` from a bundle saved by
+    :func:`_packFields`.
+
+    :return: `obj`
     """
-    return PRNG.uniform(a, b)
-    
-def logistic(loc=0., scale=1.0):
+    for field in fields:
+        key = prefix + field
+        setattr(obj, field, arrays[key] if key in arrays
+                else attributes[key])
+    return obj
+
+
+def _dayOfYear(times):
     """
-    Sample from a logistic distribution.
+    The day of the year of `times` (1 on 1 January), plus the fraction
+    of the day given by the hour, as used to sample the daily MSLP.
+
+    :param times: :class:`numpy.datetime64` time(s).
+
+    :return: the day of the year of each time.
     """
-    return PRNG.logisticvariate(loc, scale)
+    times = np.asarray(times, 'M8[s]')
+    days = times.astype('M8[D]')
+    hours = (times - days).astype('m8[h]').astype(int)
+    return (days - times.astype('M8[Y]')).astype(int) + 1 + hours / 24.
 
 
 def ppf(q, cdf):
@@ -1535,17 +2161,16 @@ class Simulation(object):
     """
     Simulation parameters.
 
-    This is used to set the PRNG state before `ntracks` are simulated.
+    This is used to create the random number stream of the simulation
+    before `ntracks` are simulated. The stream depends only on `seed`
+    and `index`, so the simulation is reproducible however the
+    simulations are distributed across processors.
 
     :type  index: int
     :param index: the simulation index number.
 
     :type  seed: int
-    :param seed: the initial seed used for the PRNG.
-
-    :type  jumpahead: int
-    :param jumpahead: the amount to jump ahead from the initial seed in
-                      the PRNG stream.
+    :param seed: the base seed of the random number streams.
 
     :type  ntracks: int
     :param ntracks: the number of tracks to be generated during the
@@ -1555,15 +2180,366 @@ class Simulation(object):
     :param outfile: the filename where the tracks will be saved to.
     """
 
-    def __init__(self, index, seed, jumpahead, ntracks, outfile):
+    def __init__(self, index, seed, ntracks, outfile):
         self.index = index
         self.seed = seed
-        self.jumpahead = jumpahead
         self.ntracks = ntracks
         self.outfile = outfile
 
 
-def run(configFile, callback=None):
+def saveTrackFile(trackFile, tracks, header, fmt, append=False):
+    """
+    Save the tracks of one simulation to a csv format track file.
+
+    :param str trackFile: the filename of the track file.
+    :param tracks: :class:`numpy.ndarray` of the track data.
+    :param str header: the column names of the track data.
+    :param str fmt: the format string for a row of the track data.
+    :param bool append: if True, add the tracks to the end of an
+                        existing track file, without the header.
+    """
+    if len(tracks) > 0:
+        # Format all the times at once, as 'YYYY-MM-DD hh:mm:ss':
+        dtype = [(name, 'S19' if name == 'Datetime' else
+                  tracks.dtype[name]) for name in tracks.dtype.names]
+        tracks = tracks.astype(dtype)
+        tracks['Datetime'] = np.char.replace(tracks['Datetime'], 'T', ' ')
+
+    with open(trackFile, 'a' if append else 'w') as fp:
+        if not append:
+            fp.write('%' + header)
+        if len(tracks) > 0:
+            np.savetxt(fp, tracks, fmt=fmt)
+
+
+def saveTrackBatches(batches, trackFile, fmt):
+    """
+    Create a track file, then add batches of tracks to it as they are
+    generated. Each batch is written by the shared background writer
+    while the next batch is generated. The writer's queue is bounded,
+    so only a few batches are held in memory at any time.
+
+    :param batches: iterable of track data arrays (see
+                    :meth:`TrackGenerator.iterTracks`).
+    :param str trackFile: the filename of the track file.
+    :param str fmt: the track file format, 'csv' or 'nc'.
+
+    :rtype: generator
+    :return: the non-empty batches, after they are queued for writing.
+    """
+    writer = getWriter()
+    empty = np.empty(0, dtype=trackFileDtype)
+
+    if fmt == 'nc':
+        writer.submit(ncSaveTracks, trackFile, empty)
+    else:
+        writer.submit(saveTrackFile, trackFile, empty, TRACKFILE_HEADER,
+                      TRACKFILE_FMT)
+
+    for tracks in batches:
+        if len(tracks) == 0:
+            continue
+        if fmt == 'nc':
+            writer.submit(ncSaveTracks, trackFile, tracks, append=True)
+        else:
+            writer.submit(saveTrackFile, trackFile, tracks,
+                          TRACKFILE_HEADER, TRACKFILE_FMT, append=True)
+        yield tracks
+
+
+def _calibrationFiles(config, processPath):
+    """
+    :return: the existing input files of the track generator: the
+             calibration files in `processPath` and the MSLP and land
+             mask files.
+    """
+    names = ['originPDF.nc', 'speed_stats.nc', 'pressure_stats.nc',
+             'bearing_stats.nc', 'pressure_rate_stats.nc',
+             'cyclone_tracks', 'origin_year', 'origin_lon_lat']
+    for name in ['bearing', 'speed', 'pressure', 'day', 'rmax']:
+        names.append('all_cell_cdf_init_%s' % name)
+        names.append('all_cell_cdf_init_%s.nc' % name)
+    files = [pjoin(processPath, name) for name in names]
+    files.append(config.get('Input', 'MSLPFile'))
+    if config.has_option('Input', 'LandMask'):
+        files.append(config.get('Input', 'LandMask'))
+    return [filename for filename in files if os.path.isfile(filename)]
+
+
+def _configSettings(config, sections=CALIBRATION_SETTINGS):
+    """
+    :param dict sections: the names of the options to leave out of each
+                          section to include, keyed by section.
+
+    :return: the configuration settings of the given sections, one per
+             line.
+    """
+    lines = []
+    for section in sorted(sections):
+        if not config.has_section(section):
+            continue
+        for option in sorted(config.options(section)):
+            if option.lower() in sections[section]:
+                continue
+            lines.append('%s_%s=%s\n' % (section, option,
+                                         config.get(section, option)))
+    return ''.join(lines)
+
+
+def calibrationHash(config, processPath, settings=()):
+    """
+    Calculate a hash of the inputs that determine the tracks generated
+    for a given simulation: the calibration files in `processPath`,
+    the MSLP and land mask files, the configuration settings of the
+    Region, Input and TrackGenerator sections (see
+    `CALIBRATION_SETTINGS`) and any other `settings`.
+
+    The number of simulations is left out: the number of tracks and
+    the random number stream of each simulation do not depend on it.
+
+    :param config: :class:`Utilities.config.ConfigParser` instance.
+    :param str processPath: the directory of the calibration files.
+    :param settings: other values that the tracks depend on.
+
+    :return: the md5 hash of the inputs, as a hex string.
+    """
+    md5 = hashlib.md5()
+    for filename in _calibrationFiles(config, processPath):
+        md5.update('%s|%s\n' % (os.path.basename(filename),
+                                 flGetStat(filename)[2]))
+    md5.update(_configSettings(config))
+    md5.update(repr(tuple(settings)))
+    return md5.hexdigest()
+
+
+def calibrationSignature(config, processPath):
+    """
+    A quick check for changes to the inputs of the track generator,
+    from the size and modification time of the input files (see
+    :func:`calibrationHash`) and the configuration settings. This is
+    used to tell if a calibration bundle is out of date without
+    reading the input files.
+
+    :param config: :class:`Utilities.config.ConfigParser` instance.
+    :param str processPath: the directory of the calibration files.
+
+    :return: the signature, as a hex string.
+    """
+    md5 = hashlib.md5()
+    for filename in _calibrationFiles(config, processPath):
+        si = os.stat(filename)
+        md5.update('%s|%d|%r\n' % (filename, si.st_size, si.st_mtime))
+    md5.update(_configSettings(config))
+    return md5.hexdigest()
+
+
+def loadCheckpoints(path):
+    """
+    Load the records of the completed simulations, written by
+    :func:`saveCheckpoint` to the files `checkpoint.NNN.dat` in `path`
+    (one file for each processor). Incomplete records, e.g. from a run
+    that was killed, are ignored.
+
+    :param str path: the directory of the checkpoint files.
+
+    :return: a :class:`dict` of the records, keyed by simulation index.
+    """
+    records = {}
+    if not os.path.isdir(path):
+        return records
+    for name in sorted(os.listdir(path)):
+        if not (name.startswith('checkpoint.') and name.endswith('.dat')):
+            continue
+        with open(pjoin(path, name)) as fh:
+            for line in fh:
+                if not line.endswith('\n'):
+                    continue
+                fields = line.rstrip('\n').split('|')
+                if len(fields) < 4 or len(fields) % 2 != 0:
+                    continue
+                try:
+                    index, seed, ntracks = [int(x) for x in fields[:3]]
+                except ValueError:
+                    continue
+                records[index] = (seed, ntracks, fields[3],
+                                  zip(fields[4::2], fields[5::2]))
+    return records
+
+
+def saveCheckpoint(checkpointFile, sim, calibration, outputs):
+    """
+    Record that a simulation is complete, with the random number
+    stream (the seed and simulation index), the number of tracks,
+    the calibration hash (see :func:`calibrationHash`) and the md5
+    checksum of each output file.
+
+    This is run by the background writer after the output files of the
+    simulation have been written.
+
+    :param str checkpointFile: the checkpoint file to add the record to.
+    :param sim: the :class:`Simulation`.
+    :param str calibration: the calibration hash.
+    :param list outputs: the output files of the simulation.
+    """
+    fields = [str(sim.index), str(sim.seed), str(sim.ntracks), calibration]
+    for filename in outputs:
+        fields.extend([filename, flGetStat(filename)[2]])
+    with open(checkpointFile, 'a') as fh:
+        fh.write('|'.join(fields) + '\n')
+
+
+def isComplete(record, sim, calibration):
+    """
+    Test if a simulation has already been completed with the same
+    random number stream and calibration, and its output files are
+    unchanged since.
+
+    :param record: the checkpoint record of the simulation (see
+                   :func:`loadCheckpoints`), or None.
+    :param sim: the :class:`Simulation`.
+    :param str calibration: the calibration hash.
+
+    :rtype: bool
+    """
+    if record is None:
+        return False
+    seed, ntracks, recorded, outputs = record
+    if (seed, ntracks, recorded) != (sim.seed, sim.ntracks, calibration):
+        return False
+    return len(outputs) > 0 and all(
+        os.path.isfile(filename) and flGetStat(filename)[2] == md5sum
+        for filename, md5sum in outputs)
+
+
+def compileCalibration(configFile):
+    """
+    Load the calibration of the track generator from the output of the
+    statistics stage, the MSLP climatology and the land-sea mask, and
+    save it to the calibration bundle in the process directory (see
+    :meth:`TrackGenerator.saveCalibration`). The track generator domain
+    and genesis frequency are saved with it, along with the
+    :func:`calibrationSignature` and :func:`calibrationHash` of the
+    inputs.
+
+    :param str configFile: the configuration file.
+
+    :return: the name of the bundle file.
+    """
+    config = ConfigParser()
+    config.read(configFile)
+
+    processPath = pjoin(config.get('Output', 'Path'), 'process')
+    dt = config.getfloat('TrackGenerator', 'TimeStep')
+    gridSpace = config.geteval('Region', 'GridSpace')
+    gridInc = config.geteval('Region', 'GridInc')
+    mslpFile = config.get('Input', 'MSLPFile')
+    mslpResolution = config.getfloat('TrackGenerator', 'MSLPResolution')
+
+    log.info('Compiling the track generator calibration')
+
+    if config.has_option('TrackGenerator', 'gridLimit'):
+        gridLimit = config.geteval('TrackGenerator', 'gridLimit')
+    else:
+        CalcTD = CalcTrackDomain(configFile)
+        gridLimit = CalcTD.calcDomainFromFile()
+
+    if config.has_option('TrackGenerator', 'Frequency'):
+        meanFreq = config.getfloat('TrackGenerator', 'Frequency')
+    else:
+        log.info('No genesis frequency specified: auto-calculating')
+        CalcF = CalcFrequency(configFile, gridLimit)
+        meanFreq = CalcF.calc()
+        log.info('Estimated annual genesis frequency for domain: %s',
+                 meanFreq)
+
+    mslp = SamplePressure(mslpFile, resolution=mslpResolution,
+                          gridLimit=gridLimit)
+    landfall = trackLandfall.LandfallDecay(configFile, dt, gridLimit)
+
+    tg = TrackGenerator(processPath, gridLimit, gridSpace, gridInc,
+                        mslp, landfall, dt=dt)
+    tg.loadInitialConditionDistributions()
+    tg.loadCellStatistics()
+
+    gridLimit = dict((key, float(value))
+                     for key, value in gridLimit.items())
+    attributes = {'gridLimit': gridLimit,
+                  'meanFreq': float(meanFreq),
+                  'signature': calibrationSignature(config, processPath),
+                  'calibration': calibrationHash(config, processPath)}
+    bundleFile = pjoin(processPath, CALIBRATION_BUNDLE)
+    tg.saveCalibration(bundleFile, attributes)
+    return bundleFile
+
+
+def isCalibrationCurrent(bundleFile, config, processPath):
+    """
+    Test if the calibration bundle exists and was compiled from the
+    current inputs (see :func:`calibrationSignature`).
+
+    :param str bundleFile: the calibration bundle.
+    :param config: :class:`Utilities.config.ConfigParser` instance.
+    :param str processPath: the directory of the calibration files.
+
+    :rtype: bool
+    """
+    try:
+        arrays, attributes = loadBundle(bundleFile)
+    except IOError:
+        return False
+    return (attributes.get('signature') ==
+            calibrationSignature(config, processPath))
+
+
+def loadCalibration(bundleFile, processPath, gridSpace, gridInc,
+                    **kwargs):
+    """
+    Create a :class:`TrackGenerator` from a calibration bundle (see
+    :func:`compileCalibration`). The arrays of the calibration are
+    mapped from the bundle file rather than read into memory, so
+    processes on the same node share them.
+
+    :param str bundleFile: the calibration bundle.
+    :param str processPath: the directory of the calibration files.
+    :param dict gridSpace: the grid cell size.
+    :param dict gridInc: the grid cell increment.
+    :param kwargs: other arguments of :class:`TrackGenerator`.
+
+    :return: the :class:`TrackGenerator` and a :class:`dict` of the
+             attributes saved in the bundle.
+    """
+    arrays, attributes = loadBundle(bundleFile)
+    gridLimit = attributes['gridLimit']
+
+    def unpack(prefix, obj, fields):
+        return _unpackFields(prefix, obj, fields, arrays, attributes)
+
+    origin = unpack('origin.', SamplingOrigin(), ORIGIN_FIELDS)
+    mslp = unpack('mslp.', SamplePressure.__new__(SamplePressure),
+                  attributes['mslp.fields'])
+    landfall = unpack('landfall.', trackLandfall.LandfallDecay.__new__(
+        trackLandfall.LandfallDecay), LANDFALL_FIELDS)
+    landfall.landMask = None
+    landfall.raster = unpack('raster.', trackLandfall.LandRaster.__new__(
+        trackLandfall.LandRaster), RASTER_FIELDS)
+
+    tg = TrackGenerator(processPath, gridLimit, gridSpace, gridInc, mslp,
+                        landfall, originSampler=origin, **kwargs)
+    for name in CDF_NAMES:
+        if name + '.x' in arrays:
+            setattr(tg, name, unpack(name + '.', CellCDF.__new__(CellCDF),
+                                     CDF_FIELDS))
+    for name in STATS_NAMES:
+        cellStats = GenerateStats(None, None, gridLimit, gridSpace, gridInc,
+                                  calculateLater=True)
+        unpack(name + '.', cellStats.coeffs, attributes[name + '.fields'])
+        setattr(tg, name, cellStats)
+    unpack('', tg, ('allCDFInitSize', 'cdfSize'))
+
+    return tg, attributes
+
+
+def run(configFile, callback=None, windfield=False):
     """
     Run the tropical cyclone track generation.
 
@@ -1573,6 +2549,15 @@ def run(configFile, callback=None):
     :type  configFile: str
     :param configFile: the filename of the configuration file to load
                        the track generation configuration from.
+
+    :type  windfield: bool
+    :param windfield: if True, also calculate the wind field of each
+                      simulation as its tracks are generated, passing
+                      the tracks to the wind field calculation in
+                      memory (see
+                      :meth:`wind.WindfieldGenerator.dumpGustsFromBatches`).
+                      The track files are then only written if the
+                      `SaveTracks` option is set.
     """
 
     log.info('Loading track generation settings')
@@ -1588,31 +2573,26 @@ def run(configFile, callback=None):
     maxTimeSteps = config.getint('TrackGenerator', 'NumTimeSteps')
     dt = config.getfloat('TrackGenerator', 'TimeStep')
     fmt = config.get('TrackGenerator', 'Format')
+    ensemble = config.getboolean('TrackGenerator', 'Ensemble')
     gridSpace = config.geteval('Region', 'GridSpace')
     gridInc = config.geteval('Region', 'GridInc')
-    gridLimit = config.geteval('Region', 'gridLimit')
-    mslpFile = config.get('Input', 'MSLPFile')
+    chunkSize = config.getint('TrackGenerator', 'ChunkSize')
+    saveTracks = (not windfield or
+                  config.getboolean('TrackGenerator', 'SaveTracks'))
+    resume = config.getboolean('TrackGenerator', 'Resume')
+    if fmt not in ('csv', 'nc'):
+        raise ValueError("Unknown track file format: %s" % fmt)
     seasonSeed = None
     trackSeed = None
     trackPath = pjoin(outputPath, 'tracks')
     processPath = pjoin(outputPath, 'process')
     #trackFilename = 'tracks.%05i-%%04i.' + fmt
     trackFilename = 'tracks.%05i.' + fmt
+    bundleFile = pjoin(processPath, CALIBRATION_BUNDLE)
 
-    if config.has_option('TrackGenerator', 'gridLimit'):
-        gridLimit = config.geteval('TrackGenerator', 'gridLimit')
-    else:
-        CalcTD = CalcTrackDomain(configFile)
-        gridLimit = CalcTD.calcDomainFromFile()
-
-    if config.has_option('TrackGenerator', 'Frequency'):
-        meanFreq = config.getfloat('TrackGenerator', 'Frequency')
-    else:
-        log.info('No genesis frequency specified: auto-calculating')
-        CalcF = CalcFrequency(configFile, gridLimit)
-        meanFreq = CalcF.calc()
-        log.info('Estimated annual genesis frequency for domain: %s',
-                 meanFreq)
+    innerGridLimit = None
+    if config.has_option('TrackGenerator', 'InnerGridLimit'):
+        innerGridLimit = config.geteval('TrackGenerator', 'InnerGridLimit')
 
     if config.has_option('TrackGenerator', 'SeasonSeed'):
         seasonSeed = config.getint('TrackGenerator', 'SeasonSeed')
@@ -1629,23 +2609,26 @@ def run(configFile, callback=None):
                      ' for parallel runs!')
         sys.exit(1)
 
-    mslp = SamplePressure(mslpFile)
-    
-    # Initialise the landfall tracking
+    # Compile the calibration bundle if it is missing or out of date,
+    # then load it on all processors
 
-    landfall = trackLandfall.LandfallDecay(configFile, dt)
-
-    # Wait for configuration to be loaded by all processors
+    if pp.rank() == 0 and not isCalibrationCurrent(bundleFile, config,
+                                                   processPath):
+        compileCalibration(configFile)
 
     pp.barrier()
 
-    # Seed the numpy PRNG. We use this PRNG to sample the number of
-    # tropical cyclone tracks to simulate for each season. The inbuilt
-    # Python `random` library does not provide a function to sample
-    # from the Poisson distribution.
+    tg, calibration = loadCalibration(bundleFile, processPath, gridSpace,
+                                      gridInc, innerGridLimit=innerGridLimit,
+                                      dt=dt, maxTimeSteps=maxTimeSteps,
+                                      ensemble=ensemble)
+    gridLimit = calibration['gridLimit']
+    meanFreq = calibration['meanFreq']
+
+    # Create the stream used to sample the number of tropical cyclone
+    # tracks to simulate for each season.
 
-    if seasonSeed:
-        np.random.seed(seasonSeed)
+    seasonRNG = random.randomStream(seasonSeed)
 
     # Do the first stage of the simulation (i.e., sample the number of
     # tracks to simulate at each genesis point) on all processors
@@ -1653,18 +2636,9 @@ def run(configFile, callback=None):
     # they will all get exactly the same simulation outcome. This also
     # behaves correctly when not done in parallel.
 
-    nCyclones = np.random.poisson(
+    nCyclones = seasonRNG.poisson(
         np.floor(yrsPerSim) * meanFreq, nSimulations)
 
-    # Estimate the maximum number of random values to be drawn from the
-    # PRNG for each track and calculate how much each track simulation
-    # should jump ahead in the PRNG stream to ensure that it is
-    # independent of all other simulations.
-
-    maxRvsPerTrack = 5 * (maxTimeSteps + 2)
-    jumpAhead = np.hstack([[0],
-                          np.cumsum(nCyclones * maxRvsPerTrack)[:-1]])
-
     log.info('Generating %i total events for %i simulations',
               sum(nCyclones), nSimulations)
 
@@ -1672,23 +2646,38 @@ def run(configFile, callback=None):
 
     sims = []
     for i, n in enumerate(nCyclones):
-        sims.append(Simulation(i, trackSeed, jumpAhead[i], n,
-                               trackFilename % i))
-
-    # Load the track generator
-
-    tg = TrackGenerator(processPath, gridLimit, gridSpace, gridInc,
-                        mslp, landfall, dt=dt,
-                        maxTimeSteps=maxTimeSteps)
-
-    tg.loadInitialConditionDistributions()
-    tg.loadCellStatistics()
+        sims.append(Simulation(i, trackSeed, n, trackFilename % i))
 
     # Hold until all processors are ready
 
     pp.barrier()
 
     N = sims[-1].index
+    writer = getWriter()
+
+    # Simulations that were completed by an earlier run, with the same
+    # random number streams and calibration, are not run again. The
+    # streams are only reproducible if both seeds are set.
+
+    # Simulations whose tracks are passed straight to the wind field
+    # calculation also depend on the wind field settings:
+    if windfield:
+        windSettings = _configSettings(config, {'WindfieldInterface': ()})
+    else:
+        windSettings = None
+    calibration = hashlib.md5(repr((calibration['calibration'],
+                                    windfield, windSettings))).hexdigest()
+    checkpointFile = pjoin(processPath, 'checkpoint.%03i.dat' % pp.rank())
+    if resume and seasonSeed is not None and trackSeed is not None:
+        checkpoints = loadCheckpoints(processPath)
+    else:
+        checkpoints = {}
+
+    if windfield:
+        import wind
+        windfieldPath = pjoin(outputPath, 'windfield')
+        wfg, timestepCallback, ts = \
+            wind.windfieldGeneratorFromConfig(configFile)
 
     # Balance the simulations over the number of processors and do it
 
@@ -1699,31 +2688,39 @@ def run(configFile, callback=None):
         if callback is not None:
             callback(sim.index, N)
 
-        if sim.seed:
-            PRNG.seed(sim.seed)
-            PRNG.jumpahead(sim.jumpahead)
-            log.debug('seed %i jumpahead %i', sim.seed, sim.jumpahead)
+        if isComplete(checkpoints.get(sim.index), sim, calibration):
+            log.debug('Simulation %i is already complete', sim.index)
+            continue
+
+        # Each simulation has an independent stream of random numbers,
+        # which is the same whichever processor runs the simulation:
+
+        tg.rng = random.randomStream(sim.seed, sim.index)
 
         trackFile = pjoin(trackPath, sim.outfile)
-        tracks = tg.generateTracks(sim.ntracks)
+        outputs = []
+        batches = tg.iterTracks(sim.ntracks, chunkSize=chunkSize)
+        if saveTracks:
+            batches = saveTrackBatches(batches, trackFile, fmt)
+            outputs.append(trackFile)
+
+        if windfield:
+            # Pass the tracks straight to the wind field calculation:
+            outputs.append(wfg.dumpGustsFromBatches(batches, trackFile,
+                                                    windfieldPath,
+                                                    timestepCallback))
+        else:
+            for tracks in batches:
+                pass
 
-        header = 'CycloneNumber,Datetime,TimeElapsed,Longitude,' + \
-                 'Latitude,Speed,Bearing,' + \
-                 'CentralPressure,EnvPressure,rMax\n'
-        fmt = '%i,%s,%7.3f,%8.3f,%8.3f,%6.2f,%6.2f,%7.2f,%7.2f,%6.2f'
-        
-        """
-        for i, track in enumerate(tracks):
-            trackFile = pjoin(trackPath, sim.outfile % (i + 1))
-            with open (trackFile, 'w') as fp:
-                fp.write('%' + header)
-                if len(track) > 0:
-                    np.savetxt(fp, np.array(track).T, fmt=fmt)
-        """            
-        with open(trackFile, 'w') as fp:
-            fp.write('%' + header)
-            if len(tracks) > 0:
-                np.savetxt(fp, tracks, fmt=fmt)
+        # The writer runs this after the outputs have been written, and
+        # drops it if writing them failed:
+        writer.submit(saveCheckpoint, checkpointFile, sim, calibration,
+                      outputs)
+
+    writer.flush()
+    if windfield and ts is not None:
+        ts.shutdown()
 
     log.info('Simulating tropical cyclone tracks:' +
              ' 100 percent complete')
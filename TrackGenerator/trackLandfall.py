@@ -18,6 +18,7 @@ References:
 
 """
 
+import math
 import logging
 
 import numpy as np
@@ -29,7 +30,77 @@ from Utilities.config import ConfigParser
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
 
-class LandfallDecay:
+class LandRaster(object):
+    """
+    A boolean land raster over a domain, so that the land points of
+    arrays of positions can be found by indexing rather than
+    searching the land-sea mask.
+
+    Each raster node `k` covers the longitudes (and similarly
+    latitudes) ``(lon0 + (k - 1) * resolution, lon0 + k *
+    resolution]``. The nodes are aligned with the nodes of the
+    land-sea mask, so at the resolution of the mask (the default) the
+    raster gives the same result as :meth:`SampleGrid.sampleGrid`.
+
+    :param landMask: :class:`Utilities.grid.SampleGrid` of the
+                     land-sea mask.
+    :param dict gridLimit: the domain of the raster.
+    :param float resolution: the resolution of the raster (degrees).
+
+    """
+
+    def __init__(self, landMask, gridLimit, resolution=None):
+        lon = landMask.lon
+        lat = landMask.lat
+        if resolution is None:
+            resolution = abs(lon[1] - lon[0])
+        self.resolution = resolution
+
+        self.lon0 = lon[0] + resolution * np.floor((gridLimit['xMin'] -
+                                                    lon[0]) / resolution)
+        self.lat0 = lat[0] + resolution * np.floor((gridLimit['yMin'] -
+                                                    lat[0]) / resolution)
+        nx = int(np.ceil((gridLimit['xMax'] - self.lon0) / resolution)) + 1
+        ny = int(np.ceil((gridLimit['yMax'] - self.lat0) / resolution)) + 1
+
+        # Sample the mask in the middle of the interval of each node:
+
+        lons = self.lon0 + (np.arange(nx) - 0.5) * resolution
+        lats = self.lat0 + (np.arange(ny) - 0.5) * resolution
+        indi = np.minimum(lon.searchsorted(lons), len(lon) - 1)
+        indj = np.minimum(lat.searchsorted(lats), len(lat) - 1)
+        self.land = landMask.grid[indj[:, np.newaxis], indi] > 0.0
+
+    def _index(self, lon, lat):
+        """
+        :return: the raster indices of the given positions, clipped to
+                 the raster.
+        """
+        ny, nx = self.land.shape
+        if np.isscalar(lon) and np.isscalar(lat):
+            # Avoid the overhead of array operations for single points
+            j = int(math.ceil((lat - self.lat0) / self.resolution))
+            i = int(math.ceil((lon - self.lon0) / self.resolution))
+            return min(max(j, 0), ny - 1), min(max(i, 0), nx - 1)
+
+        j = np.ceil((np.asarray(lat) - self.lat0) / self.resolution)
+        i = np.ceil((np.asarray(lon) - self.lon0) / self.resolution)
+        return (np.clip(j, 0, ny - 1).astype(int),
+                np.clip(i, 0, nx - 1).astype(int))
+
+    def onLand(self, lon, lat):
+        """
+        Determine which of the positions are over land.
+
+        :param lon: :class:`numpy.ndarray` of longitudes.
+        :param lat: :class:`numpy.ndarray` of latitudes.
+
+        :return: boolean :class:`numpy.ndarray`, True over land.
+        """
+        return self.land[self._index(lon, lat)]
+
+
+class LandfallDecay(object):
     """
     Description: Calculates the decay rate of a tropical cyclone after
     it has made landfall.  Based on the work of on the model of Vickery
@@ -39,22 +110,28 @@ class LandfallDecay:
 
     :param str configFile: Configuration file
     :param float dt: time step of the generated cyclone tracks
+    :param dict gridLimit: if given, the land-sea mask is rasterised
+                           over this domain (see :class:`LandRaster`)
+    :param float resolution: resolution of the land raster (degrees).
+                             Defaults to the resolution of the mask.
 
     Members:
     dt - time step of the generated cyclone tracks
     landMask - 2D array of 0/1 indicating ocean/land respectively (any
     positive non-zero value can be used to indicate land points)
+    raster - :class:`LandRaster` of the land-sea mask, or None
 
     Methods:
     onLand - Determine if a cyclone centred at (cLon, cLat) is over land
     or not.
+    overLand - Determine which of an array of positions are over land.
     pChange - If the cyclone centre is over land, then this function
     determines the filling as a function of the time elapsed
     since the storm made landfall.
 
     """
     
-    def __init__(self, configFile, dt):
+    def __init__(self, configFile, dt, gridLimit=None, resolution=None):
         """
         Initialise required fields
 
@@ -68,9 +145,25 @@ class LandfallDecay:
         landMaskFile = config.get('Input', 'LandMask')
 
         self.landMask = SampleGrid(landMaskFile)
+        self.raster = None
+        if gridLimit is not None:
+            self.raster = LandRaster(self.landMask, gridLimit, resolution)
         self.tol = 0 # Time over land
         self.dt = dt
 
+    def overLand(self, lon, lat):
+        """
+        Determine which of the given positions are over land.
+
+        :param lon: :class:`numpy.ndarray` of longitudes.
+        :param lat: :class:`numpy.ndarray` of latitudes.
+
+        :return: boolean :class:`numpy.ndarray`, True over land.
+        """
+        if self.raster is not None:
+            return self.raster.onLand(lon, lat)
+        return self.landMask.sampleGrid(lon, lat) > 0.0
+
     def onLand(self, cLon, cLat):
         """
         Determine if a cyclone centred at (cLon, cLat) is over land or not.
@@ -83,7 +176,7 @@ class LandfallDecay:
         
         """
 
-        if self.landMask.sampleGrid(cLon, cLat) > 0.0:
+        if self.overLand(cLon, cLat):
             self.tol += self.dt
             log.debug("Storm centre: %6.2f, %6.2f"%(cLon, cLat))
             log.debug("Time over land: %d hours"%self.tol)
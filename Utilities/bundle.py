@@ -0,0 +1,169 @@
+"""
+:mod:`bundle` -- memory-mapped bundles of arrays
+================================================
+
+.. module:: bundle
+    :synopsis: Save a set of arrays (and a few scalar attributes) to a
+               single binary file, which can be loaded again as
+               read-only memory maps.
+
+A bundle file holds a short text header, giving the data type, shape
+and offset of each array and the attributes, followed by the raw array
+data. Loading a bundle only reads the header: the arrays are
+:class:`numpy.memmap` objects, so the data are read from disk as they
+are used, and processes on the same node that load the same bundle
+share the pages in memory::
+
+    >>> from Utilities.bundle import saveBundle, loadBundle
+    >>> saveBundle('calibration.bundle', {'x': x}, {'version': 1})
+    >>> arrays, attributes = loadBundle('calibration.bundle')
+
+"""
+
+import os
+import ast
+import logging
+
+import numpy as np
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+MAGIC = 'TCRMBUNDLE1\n'
+ALIGN = 64
+
+
+def _writeHeader(fh, arrays, attributes):
+    """
+    Write the header of a bundle file, and extend the file to hold the
+    array data.
+
+    :param fh: the open bundle file.
+    :param dict arrays: the data type and shape of each array, keyed by
+                        name.
+    :param dict attributes: the attributes of the bundle.
+
+    :return: the offset of each array from the start of the file, keyed
+             by name.
+    """
+    # The offsets depend on the length of the header, so the header is
+    # built with a fixed width for the data offset:
+
+    index = {}
+    offset = 0
+    for name in sorted(arrays):
+        dtype, shape = arrays[name]
+        dtype = np.dtype(dtype)
+        if dtype.hasobject:
+            raise TypeError('Cannot save object array %s' % name)
+        shape = tuple(int(n) for n in shape)
+        index[name] = (dtype.str, shape, offset)
+        nbytes = dtype.itemsize * int(np.prod(shape))
+        offset += -(-nbytes // ALIGN) * ALIGN
+
+    header = repr({'arrays': index, 'attributes': attributes})
+    start = -(-(len(MAGIC) + 16 + len(header)) // ALIGN) * ALIGN
+
+    fh.write(MAGIC)
+    fh.write('%015d\n' % start)
+    fh.write(header)
+    fh.truncate(start + offset)
+    return dict((name, start + index[name][2]) for name in index)
+
+
+def saveBundle(filename, arrays, attributes=None):
+    """
+    Save arrays to a bundle file. The file is written under a temporary
+    name and then renamed, so that a bundle that is being written is
+    never loaded.
+
+    :param str filename: the bundle file name.
+    :param dict arrays: the :class:`numpy.ndarray`'s to save, keyed by
+                        name.
+    :param dict attributes: scalar values (numbers, strings, tuples,
+                            lists or dicts of these, or None) to save
+                            with the arrays.
+    """
+    arrays = dict((name, np.asarray(value, order='C'))
+                  for name, value in arrays.items())
+    if attributes is None:
+        attributes = {}
+
+    tmpfile = filename + '.tmp%d' % os.getpid()
+    with open(tmpfile, 'wb') as fh:
+        offsets = _writeHeader(fh, dict((name, (value.dtype, value.shape))
+                                        for name, value in arrays.items()),
+                               attributes)
+        for name in sorted(arrays):
+            fh.seek(offsets[name])
+            arrays[name].tofile(fh)
+    os.rename(tmpfile, filename)
+    log.debug('Saved %i arrays to %s', len(arrays), filename)
+
+
+def createBundle(filename, arrays, attributes=None):
+    """
+    Create a bundle file to be filled in place, for arrays too large
+    to hold in memory. The arrays are returned as writable memory maps,
+    initially filled with zeros. Changes are written to the file when
+    the memory maps are flushed or deleted.
+
+    Unlike :func:`saveBundle`, the file is written under the given
+    name, so a temporary name should be used and the file renamed when
+    the arrays have been filled.
+
+    :param str filename: the bundle file name.
+    :param dict arrays: the data type and shape of each array, keyed by
+                        name.
+    :param dict attributes: scalar values to save with the arrays.
+
+    :return: a :class:`dict` of the arrays, as :class:`numpy.memmap`
+             objects.
+    """
+    if attributes is None:
+        attributes = {}
+    with open(filename, 'wb') as fh:
+        offsets = _writeHeader(fh, arrays, attributes)
+
+    result = {}
+    for name, (dtype, shape) in arrays.items():
+        if np.prod(shape) == 0:
+            result[name] = np.empty(shape, dtype)
+        else:
+            result[name] = np.memmap(filename, dtype=dtype, mode='r+',
+                                     offset=offsets[name],
+                                     shape=shape or (1,)).reshape(shape)
+    return result
+
+
+def loadBundle(filename):
+    """
+    Load a bundle file as read-only memory maps.
+
+    :param str filename: the bundle file name.
+
+    :return: a :class:`dict` of the arrays (as :class:`numpy.memmap`
+             objects) and a :class:`dict` of the attributes.
+
+    :raises IOError: if the file cannot be read or is not a bundle.
+    """
+    with open(filename, 'rb') as fh:
+        if fh.read(len(MAGIC)) != MAGIC:
+            raise IOError('%s is not a bundle file' % filename)
+        try:
+            start = int(fh.readline())
+            header = fh.read(start - fh.tell()).rstrip('\0')
+            header = ast.literal_eval(header)
+        except (ValueError, SyntaxError):
+            raise IOError('%s has an invalid header' % filename)
+
+    arrays = {}
+    for name, (dtype, shape, offset) in header['arrays'].items():
+        if np.prod(shape) == 0:
+            # Empty arrays cannot be memory mapped
+            arrays[name] = np.empty(shape, dtype)
+        else:
+            arrays[name] = np.memmap(filename, dtype=dtype, mode='r',
+                                     offset=start + offset,
+                                     shape=shape or (1,)).reshape(shape)
+    return arrays, header['attributes']
@@ -75,11 +75,16 @@ PARSERS = {
     'DataProcess_startseason': int,
     'DataProcess_filterseasons': parseBool,
     'Hazard_calculateci': parseBool,
+    'Hazard_incremental': parseBool,
+    'Hazard_method': str,
+    'Hazard_plottingposition': str,
     'Hazard_minimumrecords': int,
     'Hazard_plotspeedunits': str,
     'Hazard_years': parseList,
     'Hazard_samplesize': int,
     'Hazard_percentilerange': int,
+    'Hazard_seed': int,
+    'Hazard_workermemory': int,
     'Input_landmask': str,
     'Input_mslpgrid': parseList,
     'Logging_logfile': str,
@@ -109,7 +114,13 @@ PARSERS = {
     'TCRM_numberofheadinglines': int,
     'TCRM_pressureunits': str,
     'TCRM_speedunits': str,
+    'TrackGenerator_chunksize': int,
+    'TrackGenerator_ensemble': parseBool,
+    'TrackGenerator_inlinewindfield': parseBool,
+    'TrackGenerator_mslpresolution': float,
     'TrackGenerator_numsimulations': int,
+    'TrackGenerator_resume': parseBool,
+    'TrackGenerator_savetracks': parseBool,
     'TrackGenerator_seasonseed': int,
     'TrackGenerator_trackseed': int,
     'TrackGenerator_yearspersimulation': int,
@@ -119,6 +130,9 @@ PARSERS = {
     'WindfieldInterface_beta1': float,
     'WindfieldInterface_beta2': float,
     'WindfieldInterface_margin': float,
+    'WindfieldInterface_nestfactor': int,
+    'WindfieldInterface_nestradius': float,
+    'WindfieldInterface_packoutput': parseBool,
     'WindfieldInterface_profiletype': str,
     'WindfieldInterface_resolution': float,
     'WindfieldInterface_domain': str,
@@ -164,6 +178,12 @@ TimeStep=1.0
 Format=csv
 SeasonSeed=1
 TrackSeed=1
+Ensemble=False
+MSLPResolution=0
+ChunkSize=1000
+SaveTracks=True
+InlineWindfield=False
+Resume=True
 
 [WindfieldInterface]
 profileType=holland
@@ -176,6 +196,9 @@ Margin=2
 Resolution=0.05
 PlotOutput=False
 Domain=bounded
+PackOutput=False
+NestFactor=1
+NestRadius=4.0
 
 [Hazard]
 Years=2,5,10,20,25,50,100,200,250,500,1000
@@ -183,6 +206,11 @@ MinimumRecords=50
 CalculateCI=True
 PercentileRange=90
 SampleSize=50
+Seed=1
+WorkerMemory=1024
+Incremental=True
+Method=GEV
+PlottingPosition=weibull
 PlotSpeedUnits=mps
 
 [RMW]
@@ -345,3 +345,128 @@ def samlmu3(X):
         XMOM[2] = XMOM[2] - COEF12*X[NHALF]
     XMOM = [XMOM[0]/N, XMOM[1]/N, XMOM[2]/XMOM[1]]
     return numpy.array(XMOM)
+
+
+def samlmu3Array(X, mask=None):
+    """
+    Array version of :func:`samlmu3`: the first three sample L-moments
+    of each column of an array, calculated using the unbiased
+    probability weighted moments of Hosking (1990).
+
+    :param X: Array of data, in ascending order along the first axis.
+    :type  X: :class:`numpy.ndarray`
+    :param mask: Optional boolean array, the same shape as `X`, which is
+                 True for the values to include. The values included in
+                 each column must also be in ascending order.
+    :type  mask: :class:`numpy.ndarray`
+
+    :returns: Arrays of Lambda-1, Lambda-2 and TAU3, with the shape of
+              `X[0]`. Columns with fewer than 3 values (or with all
+              values equal) give non-finite values.
+    :rtype: tuple of :class:`numpy.ndarray`
+    """
+    X = numpy.asarray(X, dtype=float)
+    if mask is None:
+        mask = numpy.ones(X.shape, dtype=bool)
+    X = numpy.where(mask, X, 0.0)
+
+    # Rank of each value amongst the values included in its column:
+    R = numpy.cumsum(mask, axis=0) - 1.0
+    N = mask.sum(axis=0).astype(float)
+
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        B0 = X.sum(axis=0)/N
+        X *= R
+        B1 = X.sum(axis=0)/(N*(N - 1.0))
+        X *= R - 1.0
+        B2 = X.sum(axis=0)/(N*(N - 1.0)*(N - 2.0))
+
+        L1 = B0
+        L2 = 2.0*B1 - B0
+        T3 = (6.0*B2 - 6.0*B1 + B0)/L2
+    return L1, L2, T3
+
+
+def pelgevArray(L1, L2, T3):
+    """
+    Array version of :func:`pelgev`: parameter estimation via
+    L-moments for the Generalised Extreme Value Distribution, for
+    arrays of L-moments. The same approximations and Newton-Raphson
+    iteration as :func:`pelgev` are used. Invalid L-moments give zero
+    for all three parameters.
+
+    :param L1: Array of L-moments Lambda-1.
+    :param L2: Array of L-moments Lambda-2.
+    :param T3: Array of L-moment ratios TAU3.
+
+    :returns: Arrays of the location, scale and shape parameters of
+              the GEV distribution.
+    :rtype: tuple of :class:`numpy.ndarray`
+
+    """
+    L1, L2, T3 = numpy.broadcast_arrays(numpy.asarray(L1, dtype=float),
+                                        numpy.asarray(L2, dtype=float),
+                                        numpy.asarray(T3, dtype=float))
+    SMALL = 1E-5
+    EPS = 1E-6
+    MAXIT = 20
+    EU = 0.57721566
+    DL2 = 0.69314718
+    DL3 = 1.0986123
+
+    LOC = numpy.zeros(L1.shape)
+    SCALE = numpy.zeros(L1.shape)
+    SHAPE = numpy.zeros(L1.shape)
+    valid = (L2 > 0.0) & (numpy.abs(T3) < 1.0)
+    if (~valid).any():
+        print ' *** ERROR *** ROUTINE PELGEVARRAY : L-MOMENTS INVALID'
+
+    # Rational-function approximations for TAU3 between -0.8 and 1
+    with numpy.errstate(invalid='ignore', divide='ignore'):
+        Z = 1.0 - T3
+        G = numpy.where(T3 > 0.0,
+                        (-1.0 + Z*(1.59921491 + Z*(-0.48832213 +
+                                                   Z*0.01573152))) /
+                        (1.0 + Z*(-0.64363929 + Z*0.08985247)),
+                        (0.28377530 + T3*(-1.21096399 + T3*(-2.50728214 +
+                         T3*(-1.13455566 + T3*-0.07138022)))) /
+                        (1.0 + T3*(2.06189696 + T3*(1.31912239 +
+                                                    T3*0.25077104))))
+
+        # Newton-Raphson iteration for TAU3 less than -0.8:
+        active = valid & (T3 < -0.8)
+        G = numpy.where(active & (T3 <= -0.97),
+                        1.0 - numpy.log(1.0 + T3)/DL2, G)
+        T0 = (T3 + 3.0)*0.5
+        for IT in xrange(MAXIT):
+            if not active.any():
+                break
+            X2 = 2.0**(-G[active])
+            X3 = 3.0**(-G[active])
+            XX2 = 1.0 - X2
+            XX3 = 1.0 - X3
+            T = XX3/XX2
+            DERIV = (XX2*X3*DL3 - XX3*X2*DL2)/(XX2*XX2)
+            GOLD = G[active]
+            GNEW = GOLD - (T - T0[active])/DERIV
+            G[active] = GNEW
+            converged = numpy.abs(GNEW - GOLD) <= EPS*GNEW
+            active[active] = ~converged
+        if active.any():
+            print (' ** WARNING ** ROUTINE PELGEVARRAY : ITERATION HAS NOT '
+                   'CONVERGED FOR %d VALUES. RESULTS MAY BE UNRELIABLE.'
+                   % active.sum())
+
+        # Estimated K effectively zero:
+        zero = valid & (T3 > 0.0) & (numpy.abs(G) < SMALL)
+        SCALE[zero] = L2[zero]/DL2
+        LOC[zero] = L1[zero] - EU*SCALE[zero]
+
+        # Estimate alpha, xi
+        rest = valid & ~zero
+        G = G[rest]
+        GAM = special.gamma(1.0 + G)
+        SHAPE[rest] = G
+        SCALE[rest] = L2[rest]*G/(GAM*(1.0 - 2.0**(-G)))
+        LOC[rest] = L1[rest] - SCALE[rest]*(1.0 - GAM)/G
+    return LOC, SCALE, SHAPE
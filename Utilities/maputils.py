@@ -118,6 +118,44 @@ def bear2LatLon(bearing, distance, oLon, oLat):
 
     return math.degrees(nLon), math.degrees(nLat)
 
+def bear2LatLonArray(bearing, distance, oLon, oLat):
+    """
+    Array version of :func:`bear2LatLon`, for many points at once.
+
+    The results are the same as from :func:`Utilities.Cmap.bear2LatLon`,
+    which is used to step the simulated tracks, and uses the same
+    (truncated) degree-radian conversion factors.
+
+    :param bearing: :class:`numpy.ndarray` of directions to the new
+                    positions (degrees, +ve clockwise from north).
+    :param distance: :class:`numpy.ndarray` of distances to the new
+                     positions (km).
+    :param oLon: :class:`numpy.ndarray` of initial longitudes.
+    :param oLat: :class:`numpy.ndarray` of initial latitudes.
+
+    :returns: :class:`numpy.ndarray`'s of the new longitudes and
+              latitudes (in degrees)
+    """
+    radius = 6367.0 # Earth radius (km)
+    toRads = 0.0174532925
+    toDegs = 57.2957795130
+
+    oLon = np.asarray(oLon, 'd') * toRads
+    oLat = np.asarray(oLat, 'd') * toRads
+    bear = np.asarray(bearing, 'd') * toRads
+    angle = np.asarray(distance, 'd') / radius
+
+    sin0 = np.sin(oLat)
+    cos0 = np.cos(oLat)
+    sin1 = np.sin(angle)
+    cos1 = np.cos(angle)
+
+    nLat = np.arcsin(sin0 * cos1 + cos0 * sin1 * np.cos(bear))
+    nLon = oLon + np.arctan2(np.sin(bear) * sin1 * cos0,
+                             cos1 - sin0 * np.sin(nLat))
+
+    return nLon * toDegs, nLat * toDegs
+
 def latLon2XY(xr, yr, lat, lon, ieast=1, azimuth=0):
     """
     Calculate the cartesian distance between consecutive lat,lon
@@ -486,6 +524,19 @@ def makeGrid(cLon, cLat, margin=2, resolution=0.01, minLon=None, maxLon=None,
         type(cLon)==np.ndarray or type(cLat)==np.ndarray):
         raise TypeError, "Input values must be scalar values"
 
+    lonArray, latArray = makeGridCoords(cLon, cLat, margin, resolution,
+                                        minLon, maxLon, minLat, maxLat)
+    return polarGrid(cLon, cLat, lonArray, latArray)
+
+def makeGridCoords(cLon, cLat, margin=2, resolution=0.01, minLon=None,
+                   maxLon=None, minLat=None, maxLat=None):
+    """
+    Generate the longitude and latitude vectors of the grid used by
+    :func:`makeGrid`. Arguments are the same as for :func:`makeGrid`.
+
+    :returns: 1-d arrays of the longitudes and latitudes (degrees) of
+              the grid points.
+    """
     gridSize = int(resolution * 1000)
 
     if minLon:
@@ -508,9 +559,24 @@ def makeGrid(cLon, cLat, margin=2, resolution=0.01, minLon=None, maxLon=None,
     xGrid = np.array(np.arange(minLon_, maxLon_, gridSize), dtype=int)
     yGrid = np.array(np.arange(minLat_, maxLat_, gridSize), dtype=int)
 
-    R = gridLatLonDist(cLon, cLat, xGrid / 1000., yGrid / 1000.)
+    return xGrid / 1000., yGrid / 1000.
+
+def polarGrid(cLon, cLat, lonArray, latArray):
+    """
+    Generate a grid of the distance and angle of the points defined by
+    (``lonArray``, ``latArray``) from the point (``cLon``, ``cLat``).
+
+    :param float cLon: Reference longitude.
+    :param float cLat: Reference latitude.
+    :param lonArray: 1-d array of longitudes of the grid.
+    :param latArray: 1-d array of latitudes of the grid.
+
+    :returns: 2 2-d arrays containing the distance (km) and bearing
+              (azimuthal) of all points in the grid.
+    """
+    R = gridLatLonDist(cLon, cLat, lonArray, latArray)
     np.putmask(R, R==0, 1e-30)
-    theta = np.pi/2. - gridLatLonBear(cLon, cLat, xGrid / 1000., yGrid / 1000.)
+    theta = np.pi/2. - gridLatLonBear(cLon, cLat, lonArray, latArray)
 
     return R, theta
 
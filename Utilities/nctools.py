@@ -17,12 +17,19 @@ from netCDF4 import Dataset
 import numpy as np
 import time
 import getpass
+import threading
 
 logger = logging.getLogger(__name__)
 logger.addHandler(logging.NullHandler())
 
 ISO_FORMAT = '%Y-%m-%d %H:%M:%S'
 
+# The netCDF and HDF5 libraries are not usually built to be thread-safe,
+# and netCDF4 releases the GIL around calls into them. Files that may be
+# read or written while the background writer (:mod:`Utilities.writer`)
+# is writing netCDF output are accessed while holding this lock.
+NC_LOCK = threading.RLock()
+
 def ncLoadFile(filename):
     """
     Load a netCDF file and return a :class:`netCDF4.Dataset` object.
@@ -301,6 +308,19 @@ def ncSaveGrid(filename, dimensions, variables, nodata=-9999,
     
         The value for the 'dims' key must be a tuple that is a subset of
         the dimensions specified above.
+
+        A variable may optionally be stored in packed form by including
+        a 'scale_factor' key (and optionally an 'add_offset' key) and
+        setting 'dtype' to an integer type (e.g. 'i2'). The values are
+        passed unpacked and are packed when written; readers using
+        `netCDF4` unpack them transparently. Packed variables use the
+        minimum value of the integer type as the fill value, and any
+        'valid_range' attribute is converted to packed units.
+
+        A variable may also include a 'chunksizes' key, giving the
+        chunk shape to store the (compressed) data in. Smaller chunks
+        let readers of a subset of the variable decompress only the
+        chunks that overlap the subset.
     
     :param float nodata: Value to assign to missing data, default is -9999.
     :param str datatitle: Optional title to give the stored dataset.
@@ -368,17 +388,46 @@ def ncSaveGrid(filename, dimensions, variables, nodata=-9999,
         else:
             varlsd = lsd
 
-        var = ncobj.createVariable(v['name'], v['dtype'],
-                                   v['dims'], 
-                                   zlib=zlib,
-                                   complevel=complevel,
-                                   least_significant_digit=varlsd,
-                                   fill_value=nodata)
+        atts = v['atts']
+        if v.has_key('scale_factor'):
+            packinfo = np.iinfo(np.dtype(v['dtype']))
+            scale = np.float32(v['scale_factor'])
+            offset = np.float32(v.get('add_offset', 0.))
+            var = ncobj.createVariable(v['name'], v['dtype'],
+                                       v['dims'],
+                                       zlib=zlib,
+                                       complevel=complevel,
+                                       chunksizes=v.get('chunksizes'),
+                                       fill_value=packinfo.min)
+            var.setncattr('scale_factor', scale)
+            var.setncattr('add_offset', offset)
+
+            atts = atts.copy()
+            if atts.has_key('valid_range'):
+                atts['valid_range'] = np.array(
+                    np.around((np.array(atts['valid_range']) - offset) /
+                              scale), dtype=v['dtype'])
+
+            if (writedata and v['values'] is not None):
+                # Values outside the packed range are clipped, and
+                # non-finite values are stored as missing:
+                values = np.ma.masked_invalid(v['values'])
+                var[:] = np.ma.clip(values,
+                                    offset + scale * (packinfo.min + 1),
+                                    offset + scale * packinfo.max)
+        else:
+            var = ncobj.createVariable(v['name'], v['dtype'],
+                                       v['dims'],
+                                       zlib=zlib,
+                                       complevel=complevel,
+                                       least_significant_digit=varlsd,
+                                       chunksizes=v.get('chunksizes'),
+                                       fill_value=nodata)
 
-        if (writedata and v['values'] is not None):
-            var[:] = np.array(v['values'], dtype=v['dtype'])
+            if (writedata and v['values'] is not None):
+                var[:] = np.array(v['values'], dtype=v['dtype'])
     
-        var.setncatts(v['atts'])
+        var.setncatts(atts)
 
     # Additional global attributes:
     gatts['created_on'] = time.strftime(ISO_FORMAT, time.localtime())
@@ -40,6 +40,10 @@ validCellNum(cellNum, gridLimit, gridSpace): boolean
     the bounds of the region defined by gridSpace and gridLimit
 maxCellNum(gridLimit, gridSpace): int
     Determine maximum cell number based on grid limits and spacing.
+getCellNumArray(lon, lat, gridLimit, gridSpace): 1D int
+getCellLonLatArray(cellNum, gridLimit, gridSpace): 2 x 1D float
+validCellNumArray(cellNum, gridLimit, gridSpace): 1D boolean
+    Array versions of getCellNum, getCellLonLat and validCellNum.
 """
 def cdf(x, y):
     """
@@ -137,6 +141,67 @@ def maxCellNum(gridLimit, gridSpace):
 
     return latCells*lonCells - 1
 
+def getCellNumArray(lon, lat, gridLimit, gridSpace):
+    """
+    Array version of :func:`getCellNum`. Points outside the grid are
+    given the cell number -1, rather than raising an error.
+
+    :param lon: :class:`numpy.ndarray` of longitudes.
+    :param lat: :class:`numpy.ndarray` of latitudes.
+    :param dict gridLimit: the domain limits.
+    :param dict gridSpace: the grid spacing.
+
+    :returns: :class:`numpy.ndarray` of cell numbers.
+    """
+    # The arithmetic follows getCellNum exactly, including integer
+    # division when the grid limits and spacing are integers:
+    lon = floor(asarray(lon)).astype(int)
+    lat = ceil(asarray(lat)).astype(int)
+
+    j = abs((abs(lon) - abs(gridLimit['xMin'])))/abs(gridSpace['x'])
+    i = abs((abs(lat) - abs(gridLimit['yMax'])))/abs(gridSpace['y'])
+    nx = abs((gridLimit['xMax'] - gridLimit['xMin'])/gridSpace['x'])
+    cellNum = asarray(i*nx + j).astype(int)
+
+    outside = ((lon < gridLimit['xMin']) | (lon >= gridLimit['xMax']) |
+               (lat <= gridLimit['yMin']) | (lat > gridLimit['yMax']))
+    cellNum[outside] = -1
+    return cellNum
+
+def getCellLonLatArray(cellNum, gridLimit, gridSpace):
+    """
+    Array version of :func:`getCellLonLat`.
+
+    :param cellNum: :class:`numpy.ndarray` of cell numbers.
+    :param dict gridLimit: the domain limits.
+    :param dict gridSpace: the grid spacing.
+
+    :returns: :class:`numpy.ndarray`'s of the longitude and latitude of
+              the northwest corner of each cell.
+
+    :raises IndexError: if any cell number is not valid.
+    """
+    cellNum = asarray(cellNum, int)
+    if any(cellNum < 0):
+        raise IndexError, 'Index is negative'
+
+    lat = arange(gridLimit['yMax'], gridLimit['yMin'], -gridSpace['y'])
+    lon = arange(gridLimit['xMin'], gridLimit['xMax'], gridSpace['x'])
+    return lon[cellNum%lon.size], lat[cellNum/lon.size]
+
+def validCellNumArray(cellNum, gridLimit, gridSpace):
+    """
+    Array version of :func:`validCellNum`.
+
+    :param cellNum: :class:`numpy.ndarray` of cell numbers.
+    :param dict gridLimit: the domain limits.
+    :param dict gridSpace: the grid spacing.
+
+    :returns: boolean :class:`numpy.ndarray`, True for valid cells.
+    """
+    cellNum = asarray(cellNum)
+    return (cellNum >= 0) & (cellNum <= maxCellNum(gridLimit, gridSpace))
+
 def getOccurence(occurList, indList):
     """
     Returns an array of indices corresponding to cyclone observations that
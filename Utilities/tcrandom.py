@@ -15,6 +15,7 @@
 """
 import random
 import math
+import numpy as np
 
 #pylint: disable-msg=R0904
 
@@ -54,3 +55,42 @@ class Random(random.Random):
         """
         u1 = self.random()
         return x0 + gamma * math.tan(math.pi * (u1 - 0.5))
+
+
+def randomStream(seed=None, index=None):
+    """
+    Create an independent stream of random numbers for use with bulk
+    (array) draws.
+
+    The stream depends only on `seed` and `index`, so each simulation
+    given its own `index` draws the same numbers however the
+    simulations are distributed across processors.
+
+    Where available, the streams are :class:`numpy.random.Generator`
+    instances, with each `index` spawned from a
+    :class:`numpy.random.SeedSequence` of `seed`. Older versions of
+    numpy fall back to a :class:`numpy.random.RandomState` seeded with
+    both `seed` and `index`. Only methods common to both
+    (e.g. `uniform`, `normal`, `logistic` and `poisson`) should be
+    used.
+
+    :param int seed: the base seed. If None, the stream is seeded from
+                     fresh entropy and is not reproducible.
+    :param int index: the index of the stream (e.g. the simulation
+                      number). If None, the stream for `seed` itself
+                      is returned.
+
+    :returns: a :class:`numpy.random.Generator` or
+              :class:`numpy.random.RandomState` instance.
+
+    """
+    if hasattr(np.random, 'SeedSequence'):
+        spawnKey = () if index is None else (index,)
+        seq = np.random.SeedSequence(seed, spawn_key=spawnKey)
+        return np.random.Generator(np.random.PCG64(seq))
+
+    if seed is None:
+        return np.random.RandomState()
+    if index is None:
+        return np.random.RandomState(seed)
+    return np.random.RandomState([seed, index])
@@ -13,6 +13,7 @@ tsmultipliers.py to apply said multipliers to the output.
 import logging
 import numpy as np
 
+from datetime import datetime
 from os.path import join as pjoin
 
 from ConfigParser import NoOptionError
@@ -20,6 +21,7 @@ from Utilities.config import ConfigParser
 from Utilities.files import flLoadFile
 from Utilities.maputils import find_index
 from Utilities.dynarray import DynamicRecArray
+from Utilities.writer import getWriter
 from shptools import shpGetVertices
 
 #from config import NoOptionError
@@ -36,6 +38,17 @@ OUTPUT_FMT = ['%s', '%s', '%9.5f', '%9.5f',
               '%6.2f', '%6.2f', '%6.2f', '%6.2f', 
               '%7.2f']
 
+# Stations only record samples taken while they lie inside the local
+# wind field grid. The station identifier and location are constant
+# for a station, so they are not repeated in each sparse record.
+SPARSE_NAMES = ('Step', 'Time', 'Speed', 'UU', 'VV', 'Bearing', 'Pressure')
+SPARSE_TYPES = ['i4', '|S16', 'f8', 'f8', 'f8', 'f8', 'f8']
+
+# Each call to :meth:`Timeseries.extract` is a time step. The fill
+# pressure is the value recorded for stations outside the grid.
+STEP_NAMES = ('Time', 'Pressure')
+STEP_TYPES = ['|S16', 'f8']
+
 MINMAX_NAMES = ('Station', 'Time', 'Longitude', 'Latitude',
                 'Speed', 'UU', 'VV', 'Bearing', 'Pressure')
 MINMAX_TYPES = ['|S16', '|S16',  'f8', 'f8',  'f8', 'f8', 'f8', 'f8', 'f8']
@@ -49,13 +62,27 @@ StationID=None
 """
 
 class Station(object):
+    """
+    A single station at which time series data are extracted.
+
+    Only the samples taken while the station lies within the local
+    wind field grid are stored (in :attr:`data`), along with the
+    index of the time step they were recorded at. The complete time
+    series, including the fill values for time steps when the station
+    was outside the grid, is reconstructed with :meth:`series`.
+
+    :param stationid: Unique identifier of the station.
+    :param float longitude: Longitude of the station.
+    :param float latitude: Latitude of the station.
+
+    """
     def __init__(self, stationid, longitude, latitude):
         
         self.id = stationid
         self.lon = longitude
         self.lat = latitude
-        self.data = DynamicRecArray(dtype={'names': OUTPUT_NAMES,
-                                           'formats':OUTPUT_TYPES})
+        self.data = DynamicRecArray(dtype={'names': SPARSE_NAMES,
+                                           'formats':SPARSE_TYPES})
 
     def __getattr__(self, key):
         """
@@ -68,18 +95,36 @@ class Station(object):
             return super(Station, self).__getattr__(key)
         return self.data.data[key]
         
-    def insideGrid(self, gridx, gridy):
+    def series(self, steps):
         """
-        Determine if a point is within the defined grid
+        Reconstruct the complete time series for the station.
+
+        Time steps where no sample was recorded are given zero wind
+        speed, components and bearing, and the fill pressure of that
+        time step.
+
+        :param steps: :class:`numpy.ndarray` of the time and fill
+                      pressure of all time steps (see
+                      :attr:`Timeseries.steps`).
+
+        :returns: :class:`numpy.ndarray` with fields `OUTPUT_NAMES`,
+                  one record for each time step.
 
         """
-        if (float(self.lon) >= gridx.min() \
-            and float(self.lon) <= gridx.max() and \
-            float(self.lat) >= gridy.min() and \
-            float(self.lat) <= gridy.max()):
-            return True
-        else:
-            return False
+        dense = np.zeros(len(steps), dtype={'names': OUTPUT_NAMES,
+                                            'formats': OUTPUT_TYPES})
+        dense['Station'] = str(self.id)
+        dense['Time'] = steps['Time']
+        dense['Longitude'] = self.lon
+        dense['Latitude'] = self.lat
+        dense['Pressure'] = steps['Pressure']
+
+        sparse = self.data.data
+        idx = sparse['Step']
+        for key in ('Time', 'Speed', 'UU', 'VV', 'Bearing', 'Pressure'):
+            dense[key][idx] = sparse[key]
+
+        return dense
 
 class Timeseries(object):
     """Timeseries:
@@ -143,6 +188,11 @@ class Timeseries(object):
             stnlat = stndata[:, 2].astype(float)
             for sid, lon, lat in zip(stnid, stnlon, stnlat):
                 self.stations.append(Station(sid, lon, lat))
+
+        self.stnlon = np.array([float(stn.lon) for stn in self.stations])
+        self.stnlat = np.array([float(stn.lat) for stn in self.stations])
+        self.steps = DynamicRecArray(dtype={'names': STEP_NAMES,
+                                            'formats': STEP_TYPES})
         
     def sample(self, lon, lat, spd, uu, vv, prs, gridx, gridy):
         """
@@ -175,10 +225,12 @@ class Timeseries(object):
     def extract(self, dt, spd, uu, vv, prs, gridx, gridy):
         """
         Extract data from the grid at the given locations.
-        Data is stored in a dictionary, with keys as the station id's.
+        Only stations that lie within the grid record a sample; the
+        time step itself is recorded once, with the fill pressure
+        that applies to all other stations.
         
-        :param float tstep: time step being evaluated, as a float (output
-                            from matplotlib.num2date)
+        :param dt: time step being evaluated, as a
+                   :class:`datetime.datetime` or :class:`numpy.datetime64`.
         :param spd: :class:`numpy.ndarray` of speed values.
         :param uu: :class:`numpy.ndarray` of eastward wind speed values.
         :param vv: :class:`numpy.ndarray` of northward wind speed values.    
@@ -188,21 +240,27 @@ class Timeseries(object):
         
         """
 
-        for stn in self.stations:
-            if stn.insideGrid(gridx, gridy):
-                result = self.sample(stn.lon, stn.lat, spd, uu, vv, prs,
-                                      gridx, gridy)
-                ss, ux, vy, bb, pp = result
-                stn.data.append((str(stn.id), dt, stn.lon, stn.lat, ss, ux, vy, bb, pp))
+        dt = np.datetime64(dt, 's').astype(datetime).strftime(ISO_FORMAT)
+        step = len(self.steps)
+        self.steps.append((dt, prs[0, 0]))
 
-            else:
-                stn.data.append((str(stn.id), dt, stn.lon, stn.lat, 0.0, 0.0,  
-                                          0.0, 0.0, prs[0, 0]))
-                    
+        inside, = ((self.stnlon >= gridx.min()) &
+                   (self.stnlon <= gridx.max()) &
+                   (self.stnlat >= gridy.min()) &
+                   (self.stnlat <= gridy.max())).nonzero()
+
+        for i in inside:
+            stn = self.stations[i]
+            result = self.sample(stn.lon, stn.lat, spd, uu, vv, prs,
+                                 gridx, gridy)
+            ss, ux, vy, bb, pp = result
+            stn.data.append((step, dt, ss, ux, vy, bb, pp))
 
     def shutdown(self):
         """
-        Write the data to file, each station to a separate file.
+        Write the data to file, each station to a separate file. Files
+        are written by the shared background writer while the series
+        for the remaining stations are built.
         """
 
         header = 'Station,Time,Longitude,Latitude,Speed,UU,VV,Bearing,Pressure'
@@ -215,22 +273,29 @@ class Timeseries(object):
         min_data = DynamicRecArray(dtype={'names': MINMAX_NAMES,
                                           'formats':MINMAX_TYPES})
 
+        steps = self.steps.data
+        writer = getWriter()
+
         for stn in self.stations:
             
             if np.any(stn.data.data['Speed'] > 0.0):
+                data = stn.series(steps)
                 fname = pjoin(self.outputPath, 'ts.%s.csv' % str(stn.id))
-                np.savetxt(fname, np.array(stn.data.data), fmt=OUTPUT_FMT,
-                           delimiter=',', header=header, comments='')
-                max_step = np.argmax(stn.data.data['Speed'])
-                min_step = np.argmin(stn.data.data['Pressure'])
-                max_data.append(tuple(stn.data.data[max_step]))
-                min_data.append(tuple(stn.data.data[min_step]))
+                writer.submit(np.savetxt, fname, data, fmt=OUTPUT_FMT,
+                              delimiter=',', header=header, comments='')
+                max_step = np.argmax(data['Speed'])
+                min_step = np.argmin(data['Pressure'])
+                max_data.append(tuple(data[max_step]))
+                min_data.append(tuple(data[min_step]))
                 
         
-        np.savetxt(self.maxfile, max_data.data, fmt=MINMAX_FMT, delimiter=',',
-                    header=maxheader, comments='')
-        np.savetxt(self.minfile, min_data.data, fmt=MINMAX_FMT, delimiter=',',
-                    header=maxheader, comments='')
+        writer.submit(np.savetxt, self.maxfile, max_data.data,
+                      fmt=MINMAX_FMT, delimiter=',', header=maxheader,
+                      comments='')
+        writer.submit(np.savetxt, self.minfile, min_data.data,
+                      fmt=MINMAX_FMT, delimiter=',', header=maxheader,
+                      comments='')
+        writer.flush()
         """
         for stn in self.stations:
             if type(self.maxdata[stn.id][3]) == datetime.datetime:
@@ -4,6 +4,9 @@ Track-related attributes
 
 import numpy as np
 from datetime import datetime
+from netCDF4 import Dataset
+
+from Utilities.nctools import NC_LOCK
 
 trackFields = ('Indicator', 'CycloneNumber', 'Year', 'Month', 
                'Day', 'Hour', 'Minute', 'TimeElapsed', 'Datetime', 'Longitude',
@@ -88,3 +91,140 @@ class Track(object):
                 (np.max(self.Latitude) <= yMax))
                 
 
+
+# Columns of a synthetic track file, with the units they are stored in:
+trackFileFields = ('CycloneNumber', 'Datetime', 'TimeElapsed', 'Longitude',
+                   'Latitude', 'Speed', 'Bearing', 'CentralPressure',
+                   'EnvPressure', 'rMax')
+
+trackFileUnits = ('', '', 'hr', 'degree', 'degree', 'kph', 'degrees',
+                  'hPa', 'hPa', 'km')
+
+trackFileTypes = ('i', 'M8[s]', 'f8', 'f8', 'f8', 'f8', 'f8', 'f8', 'f8',
+                  'f8')
+
+# The record type of synthetic track data held in memory:
+trackFileDtype = np.dtype({'names': trackFileFields,
+                           'formats': trackFileTypes})
+
+# Track times are stored as integer seconds since this date:
+TRACKFILE_EPOCH = np.datetime64('1900-01-01 00:00:00', 's')
+
+
+def ncSaveTracks(trackfile, tracks, append=False, zlib=True, complevel=4):
+    """
+    Save synthetic tracks to a netCDF file.
+
+    The file holds a contiguous ragged array (as described in the CF
+    conventions): every column of the track data is a variable along
+    the `obs` dimension, with the observations of each track stored
+    together. The `rowSize` variable along the `track` dimension
+    holds the number of observations of each track, so a track can be
+    read without scanning the whole file. Values are stored in the
+    same units as a track .csv file.
+
+    Both dimensions are unlimited, so the tracks of a simulation can
+    be written in batches as they are generated.
+
+    :param str trackfile: the filename of the track file.
+    :param tracks: the track data, one record per observation, with
+                   the fields `trackFileFields`. This is the array
+                   returned by
+                   :meth:`TrackGenerator.TrackGenerator.generateTracks`.
+    :param bool append: if True, add the tracks to the end of an
+                        existing track file.
+    :param bool zlib: compress the variables.
+    :param int complevel: the compression level (1-9).
+
+    """
+    if len(tracks) == 0:
+        tracks = np.empty(0, dtype=trackFileDtype)
+
+    number = np.asarray(tracks['CycloneNumber'], int)
+    offsets = np.array([0])
+    if len(number) > 0:
+        starts = np.flatnonzero(np.diff(number)) + 1
+        offsets = np.concatenate((offsets, starts, [len(number)]))
+    seconds = (np.asarray(tracks['Datetime'], 'M8[s]') -
+               TRACKFILE_EPOCH).astype('i8')
+
+    with NC_LOCK:
+        if append:
+            ncobj = Dataset(trackfile, 'a')
+        else:
+            ncobj = _ncCreateTrackFile(trackfile, zlib, complevel)
+        try:
+            ntracks = len(ncobj.dimensions['track'])
+            nobs = len(ncobj.dimensions['obs'])
+            trackSlice = slice(ntracks, ntracks + len(offsets) - 1)
+            obsSlice = slice(nobs, nobs + len(number))
+
+            ncobj.variables['CycloneNumber'][trackSlice] = number[offsets[:-1]]
+            ncobj.variables['rowSize'][trackSlice] = np.diff(offsets)
+            ncobj.variables['Datetime'][obsSlice] = seconds
+            for field in trackFileFields[2:]:
+                ncobj.variables[field][obsSlice] = tracks[field]
+        finally:
+            ncobj.close()
+
+
+def _ncCreateTrackFile(trackfile, zlib, complevel):
+    """
+    Create an empty track file for :func:`ncSaveTracks`.
+
+    :return: the open :class:`netCDF4.Dataset`.
+
+    """
+    ncobj = Dataset(trackfile, 'w', format='NETCDF4')
+    ncobj.createDimension('track', None)
+    ncobj.createDimension('obs', None)
+    ncobj.featureType = 'trajectory'
+    ncobj.Conventions = 'CF-1.6'
+
+    var = ncobj.createVariable('CycloneNumber', 'i4', ('track',),
+                               chunksizes=(1024,))
+    var.cf_role = 'trajectory_id'
+
+    var = ncobj.createVariable('rowSize', 'i4', ('track',),
+                               chunksizes=(1024,))
+    var.sample_dimension = 'obs'
+    var.long_name = 'number of observations for this track'
+
+    var = ncobj.createVariable('Datetime', 'i8', ('obs',), zlib=zlib,
+                               complevel=complevel, chunksizes=(8192,))
+    var.units = 'seconds since 1900-01-01 00:00:00'
+    var.calendar = 'standard'
+
+    for k in range(2, len(trackFileFields)):
+        var = ncobj.createVariable(trackFileFields[k], 'f8', ('obs',),
+                                   zlib=zlib, complevel=complevel,
+                                   chunksizes=(8192,))
+        var.units = trackFileUnits[k]
+    return ncobj
+
+
+def ncReadTrackData(trackfile):
+    """
+    Read a netCDF track file written by :func:`ncSaveTracks`.
+
+    :param str trackfile: the track data filename.
+
+    :return: the track data, in the units of a track .csv file.
+    :rtype: :class:`numpy.ndarray` of type `trackFileDtype`
+
+    """
+    with NC_LOCK:
+        ncobj = Dataset(trackfile)
+        try:
+            ncobj.set_auto_mask(False)
+            number = ncobj.variables['CycloneNumber'][:]
+            rowSize = ncobj.variables['rowSize'][:]
+            seconds = ncobj.variables['Datetime'][:]
+            data = np.empty(len(seconds), dtype=trackFileDtype)
+            data['CycloneNumber'] = np.repeat(number, rowSize)
+            data['Datetime'] = TRACKFILE_EPOCH + seconds.astype('m8[s]')
+            for field in trackFileFields[2:]:
+                data[field] = ncobj.variables[field][:]
+        finally:
+            ncobj.close()
+    return data
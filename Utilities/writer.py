@@ -0,0 +1,173 @@
+"""
+:mod:`writer` -- write output files in the background
+=====================================================
+
+.. module:: writer
+    :synopsis: A shared background writer with a bounded queue, so that
+               the compute loops of each stage are not blocked while
+               output files are compressed and written to disk.
+
+Write jobs (a function and its arguments) are placed on a bounded
+queue and run by a worker thread. When the queue is full,
+:meth:`BackgroundWriter.submit` blocks until a job completes, which
+limits the memory held by pending output. An exception raised by a
+job is re-raised in the calling thread by the next call to
+:meth:`BackgroundWriter.submit` or :meth:`BackgroundWriter.flush`.
+The jobs queued after a failed job may depend on its output (e.g. a
+checkpoint recording the file it wrote), so they are dropped until the
+next :meth:`BackgroundWriter.flush` or :meth:`BackgroundWriter.close`.
+
+Stages should use the shared writer returned by :func:`getWriter`
+and call :meth:`BackgroundWriter.flush` once all their output has
+been submitted::
+
+    >>> from Utilities.writer import getWriter
+    >>> writer = getWriter()
+    >>> writer.submit(np.savetxt, filename, data, fmt='%f')
+    >>> writer.flush()
+
+"""
+
+import sys
+import time
+import atexit
+import logging
+import threading
+import Queue
+
+log = logging.getLogger(__name__)
+log.addHandler(logging.NullHandler())
+
+
+class BackgroundWriter(object):
+    """
+    Run write jobs in background worker threads, fed from a bounded
+    queue.
+
+    netCDF files are written through HDF5, which is not usually built
+    to be thread-safe. Jobs that write netCDF files hold
+    :data:`Utilities.nctools.NC_LOCK`, as does any code that reads
+    netCDF files while they may be running.
+
+    :param int nthreads: number of worker threads.
+    :param int maxsize: maximum number of jobs waiting in the queue.
+
+    """
+
+    def __init__(self, nthreads=1, maxsize=4):
+        self.queue = Queue.Queue(maxsize)
+        self.error = None
+        self.failed = False
+        self.lock = threading.Lock()
+        self.busy = 0.
+        self.threads = []
+        for n in range(nthreads):
+            thread = threading.Thread(target=self._worker,
+                                      name='writer-%d' % n)
+            thread.daemon = True
+            thread.start()
+            self.threads.append(thread)
+
+    def _worker(self):
+        """
+        Take jobs from the queue and run them until a `None` job is
+        received.
+        """
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                func, args, kwargs = job
+                if self.failed:
+                    log.warning("Skipping %s after an earlier write error",
+                                getattr(func, '__name__', func))
+                    continue
+                t0 = time.time()
+                try:
+                    func(*args, **kwargs)
+                except Exception:
+                    log.exception("Error writing output with %s",
+                                  getattr(func, '__name__', func))
+                    with self.lock:
+                        self.failed = True
+                        if self.error is None:
+                            self.error = sys.exc_info()
+                with self.lock:
+                    self.busy += time.time() - t0
+            finally:
+                self.queue.task_done()
+
+    def check(self):
+        """
+        Re-raise the first exception raised by a write job, if any.
+        """
+        with self.lock:
+            error, self.error = self.error, None
+        if error is not None:
+            raise error[0], error[1], error[2]
+
+    def submit(self, func, *args, **kwargs):
+        """
+        Queue `func(*args, **kwargs)` to be run by a worker thread.
+        Blocks while the queue is full.
+
+        The arguments must not be modified by the caller after they
+        are submitted.
+
+        :param func: the function that writes the output.
+
+        """
+        self.check()
+        self.queue.put((func, args, kwargs))
+
+    def flush(self):
+        """
+        Wait until all queued jobs have completed, then re-raise any
+        exception from a job. Jobs submitted after this are run again.
+        """
+        self.queue.join()
+        with self.lock:
+            self.failed = False
+        self.check()
+
+    def close(self):
+        """
+        Complete all queued jobs and stop the worker threads.
+        """
+        self.queue.join()
+        for thread in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        self.threads = []
+        with self.lock:
+            self.failed = False
+        self.check()
+
+    def busyTime(self):
+        """
+        Total time (seconds) the workers have spent running jobs. This
+        is the time taken off the compute loop of the submitting
+        thread.
+        """
+        with self.lock:
+            return self.busy
+
+
+_writer = None
+
+
+def getWriter():
+    """
+    Return the shared :class:`BackgroundWriter`, starting it on first
+    use. Queued jobs are completed when the interpreter exits.
+
+    :returns: the shared :class:`BackgroundWriter` instance.
+
+    """
+    global _writer
+    if _writer is None:
+        _writer = BackgroundWriter()
+        atexit.register(_writer.close)
+    return _writer
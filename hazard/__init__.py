@@ -27,15 +27,15 @@ import sys
 import itertools
 import numpy as np
 import logging
-import random
 
 from os.path import join as pjoin
-from scipy.stats import scoreatpercentile as percentile
 from functools import wraps
 
 from Utilities.files import flProgramVersion
 from Utilities.config import ConfigParser
 from Utilities.parallel import attemptParallel, disableOnWorkers
+from Utilities.tcrandom import randomStream
+from Utilities.bundle import createBundle, loadBundle, saveBundle
 import Utilities.nctools as nctools
 import evd
 
@@ -44,6 +44,20 @@ import pdb
 log = logging.getLogger(__name__)
 log.addHandler(logging.NullHandler())
 
+# Maximum number of values fitted at once when calculating the hazard:
+FIT_BLOCK_SIZE = 2 ** 22
+
+# Tile-major store of the wind field data, and the results of the last
+# hazard calculation, in the process directory:
+WINDFIELD_STORE = 'windfield.bundle'
+HAZARD_CACHE = 'hazard.bundle'
+
+# Approximate bytes of temporary arrays for each value fitted at once,
+# without and with confidence ranges (see tileMemory):
+FIT_BYTES = 40
+CI_BYTES = 64
+
+
 def setDomain(inputPath):
     """
     Establish the full extent of input wind field files
@@ -172,6 +186,18 @@ class TileGrid(object):
                 k += 1
 
 
+    def setTileSize(self, xstep, ystep):
+        """
+        Change the size of the tiles.
+
+        :param int xstep: size of the tile in the x-direction.
+        :param int ystep: size of the tile in the y-direction.
+
+        """
+        self.xstep = xstep
+        self.ystep = ystep
+        self.tileGrid()
+
     def getGridLimit(self, k):
         """
         Return the limits for tile `k`. x-indices correspond to the
@@ -218,7 +244,7 @@ class HazardCalculator(object):
     """
 
     def __init__(self, configFile, tilegrid, numSim, minRecords, yrsPerSim,
-                 calcCI=False):
+                 calcCI=False, store=None):
         """
         Initialise HazardCalculator object.
 
@@ -228,6 +254,10 @@ class HazardCalculator(object):
         :param int minRecords: minimum number of valid wind speed values required
                                to do fitting.
         :param int yrsPerSim:
+        :param dict store: tile-major wind field data, as loaded from the
+                           file written by :func:`transposeWindfields`.
+                           If None, each tile is read from the wind
+                           field files.
         """
         config = ConfigParser()
         config.read(configFile)
@@ -243,10 +273,23 @@ class HazardCalculator(object):
         self.minRecords = minRecords
         self.yrsPerSim = yrsPerSim
         self.calcCI = calcCI
+        self.method = config.get('Hazard', 'Method').lower()
+        self.plottingPosition = config.get('Hazard', 'PlottingPosition')
+        if self.method not in ('gev', 'empirical'):
+            raise ValueError("Unknown hazard method: %s" %
+                             config.get('Hazard', 'Method'))
+        if self.method == 'empirical' and self.calcCI:
+            log.warning("Confidence ranges are not calculated for "
+                        "empirical return period values")
+            self.calcCI = False
+        self.store = store
+        self.cache = None
+        self.cacheExact = False
         if self.calcCI:
             log.debug("Bootstrap confidence intervals will be calculated")
             self.sample_size = config.getint('Hazard', 'SampleSize')
             self.prange = config.getint('Hazard', 'PercentileRange')
+            self.seed = config.getint('Hazard', 'Seed')
 
         self.tilegrid = tilegrid
         lon, lat = self.tilegrid.getDomainExtent()
@@ -280,15 +323,62 @@ class HazardCalculator(object):
 
         :param tilelimits: `tuple` of tile limits
         """
-        Vr = loadFilesFromPath(self.inputPath, tilelimits)
-
-        Rp, loc, scale, shp = calculate(Vr, self.years, self.nodata,
-                                        self.minRecords, self.yrsPerSim)
+        if self.cache is not None:
+            xmin, xmax, ymin, ymax = tilelimits
+            window = (slice(ymin - self.tilegrid.jmin,
+                            ymax - self.tilegrid.jmin),
+                      slice(xmin - self.tilegrid.imin,
+                            xmax - self.tilegrid.imin))
+            cached = [np.array(self.cache[name][(Ellipsis,) + window])
+                      for name in ('Rp', 'loc', 'scale', 'shp')]
+            if self.cacheExact:
+                if not self.calcCI:
+                    return (tilelimits,) + tuple(cached)
+                return (tilelimits,) + tuple(cached) + tuple(
+                    np.array(self.cache[name][(Ellipsis,) + window])
+                    for name in ('RPupper', 'RPlower'))
+
+        if self.store is not None:
+            Vr = loadTile(self.store, tilelimits)
+        else:
+            Vr = loadFilesFromPath(self.inputPath, tilelimits)
+
+        if self.method == 'empirical':
+            Rp, loc, scale, shp = calculateEmpirical(Vr, self.years,
+                                                     self.nodata,
+                                                     self.yrsPerSim,
+                                                     self.plottingPosition)
+        elif self.cache is not None:
+            # The fit only uses the non-zero records, so only points
+            # with new non-zero records need to be fitted again:
+            Rp, loc, scale, shp = cached
+            changed = (self.store[countName(tilelimits)] !=
+                       self.cache['count'][window])
+            log.debug("Fitting %d of %d points", changed.sum(),
+                      changed.size)
+            if changed.any():
+                # The changed points are fitted in blocks, rather than
+                # copying all their records at once:
+                fit = calculate(Vr, self.years, self.nodata,
+                                self.minRecords, self.yrsPerSim, changed)
+                Rp[:, changed] = fit[0][:, changed]
+                loc[changed] = fit[1][changed]
+                scale[changed] = fit[2][changed]
+                shp[changed] = fit[3][changed]
+        else:
+            Rp, loc, scale, shp = calculate(Vr, self.years, self.nodata,
+                                            self.minRecords, self.yrsPerSim)
 
         if self.calcCI:
+            # Each tile has its own random stream, so the results do not
+            # depend on which processor calculates the tile:
+            xmin, xmax, ymin, ymax = tilelimits
+            rng = randomStream(self.seed,
+                               ymin * len(self.tilegrid.wf_lon) + xmin)
             RpUpper, RpLower = calculateCI(Vr, self.years, self.nodata,
                                            self.minRecords, self.yrsPerSim,
-                                           self.sample_size, self.prange)
+                                           self.sample_size, self.prange,
+                                           rng)
 
             return (tilelimits, Rp, loc, scale, shp, RpUpper, RpLower)
         else:
@@ -397,6 +487,87 @@ class HazardCalculator(object):
                     progressCallback(i)
 
 
+    def settings(self):
+        """
+        The settings that the results of the hazard calculation depend
+        on, other than the wind field records.
+
+        """
+        settings = [[float(y) for y in self.years], self.nodata,
+                    self.minRecords, self.yrsPerSim, self.calcCI,
+                    self.method]
+        if self.method == 'empirical':
+            settings += [self.plottingPosition]
+        if self.calcCI:
+            settings += [self.sample_size, self.prange, self.seed]
+        return settings
+
+    def loadCache(self, cacheFile, signature):
+        """
+        Load the results of a previous hazard calculation, to be reused
+        where the wind field records have not changed. The results are
+        only used if they were calculated with the same settings, over
+        the same extent (the tiles may differ), from wind field files
+        that are all still present and unchanged.
+
+        :param str cacheFile: the file written by :meth:`saveCache`.
+        :param signature: the signature of the wind field store (see
+                          :func:`storeSignature`).
+
+        """
+        if self.store is None or not os.path.isfile(cacheFile):
+            return
+        try:
+            arrays, attributes = loadBundle(cacheFile)
+        except IOError:
+            return
+        manifest, tiles = signature
+        oldManifest, oldTiles = attributes['signature']
+        if (attributes['settings'] != self.settings() or
+                tileExtent(oldTiles) != tileExtent(tiles) or
+                not set(oldManifest) <= set(manifest)):
+            log.info("Previous hazard results cannot be reused")
+            return
+
+        self.cacheExact = set(oldManifest) == set(manifest)
+        if self.method == 'empirical' and not self.cacheExact:
+            # Empirical values depend on all records, not just the
+            # non-zero records:
+            log.info("Previous hazard results cannot be reused")
+            return
+        self.cache = arrays
+        log.info("Reusing previous hazard results from %d of %d records",
+                 len(oldManifest), len(manifest))
+
+    @disableOnWorkers
+    def saveCache(self, cacheFile, tiles, signature):
+        """
+        Save the results of the hazard calculation, with the number of
+        non-zero records at each point, so they can be reused when
+        wind field files are added (see :meth:`loadCache`).
+
+        :param str cacheFile: the cache file name.
+        :param list tiles: list of tuples of tile limits.
+        :param signature: the signature of the wind field store (see
+                          :func:`storeSignature`).
+
+        """
+        if self.store is None:
+            return
+        count = np.zeros(self.loc.shape, dtype='i4')
+        for xmin, xmax, ymin, ymax in tiles:
+            count[ymin - self.tilegrid.jmin:ymax - self.tilegrid.jmin,
+                  xmin - self.tilegrid.imin:xmax - self.tilegrid.imin] = \
+                self.store[countName((xmin, xmax, ymin, ymax))]
+
+        arrays = {'Rp': self.Rp, 'loc': self.loc, 'scale': self.scale,
+                  'shp': self.shp, 'count': count}
+        if self.calcCI:
+            arrays['RPupper'] = self.RPupper
+            arrays['RPlower'] = self.RPlower
+        saveBundle(cacheFile, arrays, {'signature': signature,
+                                       'settings': self.settings()})
+
     @disableOnWorkers
     def saveHazard(self):
         """
@@ -543,7 +714,7 @@ class HazardCalculator(object):
                            keepfileopen=False)
 
 
-def calculate(Vr, years, nodata, minRecords, yrsPerSim):
+def calculate(Vr, years, nodata, minRecords, yrsPerSim, points=None):
     """
     Fit a GEV to the wind speed records for a 2-D extent of
     wind speed values
@@ -551,6 +722,8 @@ def calculate(Vr, years, nodata, minRecords, yrsPerSim):
     :param Vr: `numpy.ndarray` of wind speeds (3-D - event, lat, lon)
     :param years: `numpy.ndarray` of years for which to evaluate
                   return period values
+    :param points: optional boolean `numpy.ndarray` (lat, lon) of the
+                   points to fit. The results at other points are zero.
 
     Returns:
     --------
@@ -568,30 +741,71 @@ def calculate(Vr, years, nodata, minRecords, yrsPerSim):
     scale = np.zeros(Vr.shape[1:], dtype='f')
     shp = np.zeros(Vr.shape[1:], dtype='f')
 
-    for i in xrange(Vr.shape[1]):
-        for j in xrange(Vr.shape[2]):
-            if Vr[:,i,j].max() > 0.0:
-                w, l, sc, sh = evd.estimateEVD(Vr[:,i,j],
-                                               years,
-                                               nodata,
-                                               minRecords,
-                                               yrsPerSim)
+    # Fit all the points with data at once, in blocks of points to
+    # limit the size of the temporary arrays:
+    V = Vr.reshape((Vr.shape[0], -1))
+    fit = V.max(axis=0) > 0.0
+    if points is not None:
+        fit &= np.ravel(points)
+    points = np.flatnonzero(fit)
+    blocksize = max(1, FIT_BLOCK_SIZE // max(1, V.shape[0]))
+    for start in xrange(0, len(points), blocksize):
+        idx = points[start:start + blocksize]
+        w, l, sc, sh = evd.estimateEVDArray(V[:, idx], years, nodata,
+                                            minRecords, yrsPerSim)
+        Rp.reshape((len(years), -1))[:, idx] = w
+        loc.flat[idx] = l
+        scale.flat[idx] = sc
+        shp.flat[idx] = sh
+
+    return Rp, loc, scale, shp
 
-                Rp[:, i, j] = w
-                loc[i, j] = l
-                scale[i, j] = sc
-                shp[i, j] = sh
 
+def calculateEmpirical(Vr, years, nodata, yrsPerSim=1,
+                       plottingPosition='weibull'):
+    """
+    Calculate empirical return period wind speeds from the order
+    statistics of the wind speed records for a 2-D extent of wind speed
+    values, without fitting a distribution. The records are only
+    partially sorted, to find the order statistics that are needed.
+
+    :param Vr: `numpy.ndarray` of wind speeds (3-D - event, lat, lon)
+    :param years: `numpy.ndarray` of years for which to evaluate
+                  return period values
+    :param float nodata: missing data value, used where a return period
+                         is outside the range of the records.
+    :param int yrsPerSim: Values represent block maxima - this value indicates
+                          the time span of the block (default 1).
+    :param str plottingPosition: plotting position used to assign return
+                                 periods to the records (see
+                                 :func:`evd.empiricalReturnLevels`).
+
+    :return: `numpy.ndarray` of return period wind speed values, and
+             location, scale and shape arrays filled with `nodata` (so
+             the results have the same form as :func:`calculate`).
+
+    """
+    Rp = evd.empiricalReturnLevels(Vr, years, nodata, yrsPerSim,
+                                   plottingPosition).astype('f')
+    loc = nodata * np.ones(Vr.shape[1:], dtype='f')
+    scale = nodata * np.ones(Vr.shape[1:], dtype='f')
+    shp = nodata * np.ones(Vr.shape[1:], dtype='f')
     return Rp, loc, scale, shp
 
 
 def calculateCI(Vr, years, nodata, minRecords, yrsPerSim=1,
-                sample_size=50, prange=90):
+                sample_size=50, prange=90, rng=None):
     """
     Fit a GEV to the wind speed records for a 2-D extent of
     wind speed values, providing a confidence range by resampling at
     random from the input values.
 
+    The records at each point are split at random into separate samples
+    of `sample_size` records, and a GEV is fitted to each sample. The
+    random orderings are drawn for all points at once, and the fits
+    are done for all samples and points at once, in blocks of points to
+    limit the size of the temporary arrays.
+
     :param Vr: `numpy.ndarray` of wind speeds (3-D - event, lat, lon)
     :param years: `numpy.ndarray` of years for which to evaluate
                   return period values.
@@ -603,47 +817,103 @@ def calculateCI(Vr, years, nodata, minRecords, yrsPerSim=1,
     :param int sample_size: number of records to randomly sample for calculating
                             confidence interval of the fit.
     :param float prange: percentile range.
+    :param rng: random number generator used to draw the samples (see
+                :func:`Utilities.tcrandom.randomStream`). If None, an
+                unseeded generator is used.
 
-
-    :return: `numpy.ndarray` of return period wind speed values
+    :return: `numpy.ndarray` of upper and lower return period wind speed
+             values
 
     """
 
     lower = (100 - prange) / 2.
     upper = 100. - lower
 
+    if rng is None:
+        rng = randomStream()
+
     nrecords = Vr.shape[0]
     nsamples = nrecords / sample_size
     RpUpper = nodata*np.ones((len(years), Vr.shape[1], Vr.shape[2]), dtype='f')
     RpLower = nodata*np.ones((len(years), Vr.shape[1], Vr.shape[2]), dtype='f')
+    if nsamples == 0:
+        log.warning("Fewer than %d records: no confidence range "
+                    "calculated", sample_size)
+        return RpUpper, RpLower
+
+    V = Vr.reshape((nrecords, -1))
+    points = np.flatnonzero(V.max(axis=0) > 0.0)
+    blocksize = max(1, FIT_BLOCK_SIZE // nrecords)
+    for start in xrange(0, len(points), blocksize):
+        idx = points[start:start + blocksize]
+
+        # A random ordering of the records at each point, split into
+        # nsamples samples of sample_size records:
+        order = rng.uniform(size=(nrecords, len(idx))).argsort(axis=0)
+        order = order[:nsamples * sample_size]
+        sample = V[:, idx][order, np.arange(len(idx))]
+        sample = sample.reshape((nsamples, sample_size, len(idx)))
+        sample = sample.transpose(1, 0, 2)
+        sample.sort(axis=0)
+
+        w, loc, scale, shp = evd.estimateEVDArray(sample, years, nodata,
+                                                  minRecords/10, yrsPerSim)
+
+        # Samples that could not be fitted are left out of the range:
+        wLower, wUpper = _percentiles(w, [lower, upper], nodata)
+
+        RpUpper.reshape((len(years), -1))[:, idx] = wUpper
+        RpLower.reshape((len(years), -1))[:, idx] = wLower
 
-    w = np.zeros((len(years), nsamples), dtype='f')
-    wUpper = np.zeros((len(years)), dtype='f')
-    wLower = np.zeros((len(years)), dtype='f')
+    return RpUpper, RpLower
 
-    for i in xrange(Vr.shape[1]):
-        for j in xrange(Vr.shape[2]):
-            if Vr[:, i, j].max() > 0.0:
-                random.shuffle(Vr[:, i, j])
-                for n in xrange(nsamples):
-                    nstart = n*sample_size
-                    nend  = (n + 1)*sample_size - 1
-                    vsub = Vr[nstart:nend, i, j]
 
-                    vsub.sort()
-                    if vsub.max( ) > 0.:
-                        w[:, n], loc, scale, shp = evd.estimateEVD(vsub, years, nodata,
-                                                                   minRecords/10, yrsPerSim)
+def _percentiles(w, q, nodata):
+    """
+    Percentiles along the second axis of an array, leaving out missing
+    values, with linear interpolation between values as for
+    :func:`scipy.stats.scoreatpercentile`.
 
-                for n in range(len(years)):
-                    wUpper[n] = percentile(w[n,:], upper)
-                    wLower[n] = percentile(w[n,:], lower)
+    :param w: `numpy.ndarray` of values (3-D - year, sample, point)
+    :param q: sequence of percentiles to calculate.
+    :param float nodata: missing data value.
 
-                RpUpper[:, i, j] = wUpper
-                RpLower[:, i, j] = wLower
+    :return: list of `numpy.ndarray` of percentile values (2-D - year,
+             point), one for each percentile in `q`. Where all samples
+             are missing, the percentiles are `nodata`.
 
-    return RpUpper, RpLower
+    """
+    w = np.where(w == nodata, np.inf, w)
+    w.sort(axis=1)
+    count = np.isfinite(w).sum(axis=1)
+    last = w.shape[1] - 1
+    result = []
+    for p in q:
+        pos = (count - 1) * p / 100.
+        below = np.clip(np.floor(pos).astype(int), 0, last)
+        above = np.clip(np.ceil(pos).astype(int), 0, last)
+        wbelow = np.take_along_axis(w, below[:, np.newaxis], 1)[:, 0]
+        wabove = np.take_along_axis(w, above[:, np.newaxis], 1)[:, 0]
+        with np.errstate(invalid='ignore'):
+            value = wbelow + (wabove - wbelow) * (pos - np.floor(pos))
+        value[count == 0] = nodata
+        result.append(value)
+    return result
+
+
+def windfieldFiles(inputPath):
+    """
+    List the wind field files in the given path.
 
+    :param str inputPath: path to wind field files.
+
+    :returns: sorted list of the full paths of the files.
+
+    """
+    fileList = os.listdir(inputPath)
+    files = [pjoin(inputPath, f) for f in fileList]
+    files = [f for f in files if os.path.isfile(f)]
+    return sorted(files)
 
 
 def loadFilesFromPath(inputPath, tilelimits):
@@ -658,20 +928,217 @@ def loadFilesFromPath(inputPath, tilelimits):
 
     """
 
-    fileList = os.listdir(inputPath)
-    files = [pjoin(inputPath, f) for f in fileList]
-    files = [f for f in files if os.path.isfile(f)]
+    files = windfieldFiles(inputPath)
     log.debug("Loading data from %d files" % (len(files)))
 
     ysize = tilelimits[3] - tilelimits[2]
     xsize = tilelimits[1] - tilelimits[0]
     Vr = np.empty((len(files), ysize, xsize), dtype='f')
 
-    for n, f in enumerate(sorted(files)):
+    for n, f in enumerate(files):
         Vr[n,:,:] = loadFile(f, tilelimits)
 
     return Vr
 
+
+def tileName(tilelimits):
+    """
+    Name of the array holding a tile in the tile-major wind field store.
+
+    :param tuple tilelimits: tuple of index limits of a tile.
+
+    """
+    return 'tile_%d_%d_%d_%d' % tuple(tilelimits)
+
+
+def countName(tilelimits):
+    """
+    Name of the array holding the number of non-zero records at each
+    point of a tile in the tile-major wind field store.
+
+    :param tuple tilelimits: tuple of index limits of a tile.
+
+    """
+    return 'count_%d_%d_%d_%d' % tuple(tilelimits)
+
+
+def storeSignature(files, tiles):
+    """
+    Signature of the inputs to the tile-major wind field store: the
+    name, size and modification time of each wind field file, and the
+    tile limits.
+
+    :param list files: wind field files.
+    :param list tiles: list of tuples of tile limits.
+
+    """
+    signature = []
+    for f in files:
+        info = os.stat(f)
+        signature.append((os.path.basename(f), info.st_size, info.st_mtime))
+    return [signature, [tuple(t) for t in tiles]]
+
+
+def isStoreCurrent(storeFile, files, tiles):
+    """
+    Determine whether the tile-major wind field store exists and was
+    written from the current wind field files with the same tiles.
+
+    :param str storeFile: the store file name.
+    :param list files: wind field files.
+    :param list tiles: list of tuples of tile limits.
+
+    """
+    if not os.path.isfile(storeFile):
+        return False
+    try:
+        arrays, attributes = loadBundle(storeFile)
+    except IOError:
+        return False
+    return attributes.get('signature') == storeSignature(files, tiles)
+
+
+def previousStore(storeFile, files, tiles):
+    """
+    Find an existing tile-major wind field store that can be extended
+    with new wind field files: one written over the same extent from
+    files that are all still present and unchanged. The tiles may
+    differ, as the tiles get smaller when there are more records.
+
+    :param str storeFile: the store file name.
+    :param list files: wind field files.
+    :param list tiles: list of tuples of tile limits.
+
+    :returns: the arrays of the existing store, the list of files it
+              was written from and its tiles, or None if there is no
+              such store.
+
+    """
+    if not os.path.isfile(storeFile):
+        return None
+    try:
+        arrays, attributes = loadBundle(storeFile)
+    except IOError:
+        return None
+    manifest, storeTiles = storeSignature(files, tiles)
+    oldManifest, oldTiles = attributes.get('signature', ([], []))
+    if (tileExtent(oldTiles) != tileExtent(storeTiles) or
+            not set(oldManifest) <= set(manifest)):
+        return None
+    oldNames = set(entry[0] for entry in oldManifest)
+    oldFiles = [f for f in files if os.path.basename(f) in oldNames]
+    return arrays, oldFiles, [tuple(t) for t in oldTiles]
+
+
+def tileExtent(tiles):
+    """
+    Index limits of the extent covered by a set of tiles.
+
+    :param list tiles: list of tuples of tile limits.
+
+    :returns: tuple of index limits (xmin, xmax, ymin, ymax).
+
+    """
+    return (min(t[0] for t in tiles), max(t[1] for t in tiles),
+            min(t[2] for t in tiles), max(t[3] for t in tiles))
+
+
+def transposeWindfields(files, storeFile, tiles, previous=None):
+    """
+    Write the wind field data to a tile-major store, so that the data
+    for each tile (all records at all points of the tile) can be read
+    with a single contiguous read. Each wind field file is read once.
+
+    The store is a :mod:`Utilities.bundle` file with one array for
+    each tile (see :func:`tileName`), of shape (records, y, x), sorted
+    in ascending order along the records, and an array of the number
+    of non-zero records at each point of the tile (see
+    :func:`countName`).
+
+    :param list files: wind field files.
+    :param str storeFile: the store file name.
+    :param list tiles: list of tuples of tile limits.
+    :param tuple previous: an existing store, the files it was written
+                           from and its tiles (see :func:`previousStore`).
+                           The records of the existing store are copied,
+                           and only the other files are read.
+
+    """
+    if previous is not None:
+        oldArrays, oldFiles, oldTiles = previous
+    else:
+        oldArrays, oldFiles, oldTiles = {}, [], []
+    newFiles = [f for f in files if f not in set(oldFiles)]
+    nold = len(oldFiles)
+    log.info("Transposing %d wind field files into tiles (%d records "
+             "copied)", len(newFiles), nold)
+
+    xmin, xmax, ymin, ymax = tileExtent(tiles)
+
+    specs = {}
+    for t in tiles:
+        specs[tileName(t)] = ('f4', (len(files), t[3] - t[2], t[1] - t[0]))
+        specs[countName(t)] = ('i4', (t[3] - t[2], t[1] - t[0]))
+
+    tmpfile = storeFile + '.tmp%d' % os.getpid()
+    arrays = createBundle(tmpfile, specs,
+                          {'signature': storeSignature(files, tiles)})
+
+    # The store is initially filled with zeros, so only the window of
+    # each file holding non-zero wind speeds is written:
+    for n, f in enumerate(newFiles):
+        data, window = loadWindow(f, (xmin, xmax, ymin, ymax))
+        if window is None:
+            continue
+        for t in tiles:
+            overlap = intersectLimits(t, window)
+            if overlap is None:
+                continue
+            x0, x1, y0, y1 = overlap
+            arrays[tileName(t)][nold + n, y0 - t[2]:y1 - t[2],
+                                x0 - t[0]:x1 - t[0]] = \
+                data[y0 - window[2]:y1 - window[2],
+                     x0 - window[0]:x1 - window[0]]
+
+    # Merge the new records with the existing (sorted) records. A merge
+    # sort is faster on the partly sorted records:
+    kind = 'mergesort' if nold else 'quicksort'
+    for t in tiles:
+        data = np.empty(arrays[tileName(t)].shape, dtype='f4')
+        for s in oldTiles:
+            overlap = intersectLimits(t, s)
+            if overlap is None:
+                continue
+            x0, x1, y0, y1 = overlap
+            data[:nold, y0 - t[2]:y1 - t[2], x0 - t[0]:x1 - t[0]] = \
+                oldArrays[tileName(s)][:, y0 - s[2]:y1 - s[2],
+                                       x0 - s[0]:x1 - s[0]]
+        data[nold:] = arrays[tileName(t)][nold:]
+        data.sort(axis=0, kind=kind)
+        arrays[tileName(t)][:] = data
+        arrays[countName(t)][:] = (data != 0).sum(axis=0)
+
+    for value in arrays.values():
+        if isinstance(value, np.memmap):
+            value.flush()
+    del arrays
+    os.rename(tmpfile, storeFile)
+
+
+def loadTile(store, tilelimits):
+    """
+    Load the wind field data for a tile from the tile-major store.
+
+    :param dict store: the arrays of the store, as loaded by
+                       :func:`Utilities.bundle.loadBundle`.
+    :param tuple tilelimits: tuple of index limits of a tile.
+
+    :returns: 3-D `numpy.narray` of wind field records.
+
+    """
+    return np.array(store[tileName(tilelimits)], dtype='f')
+
+
 def loadFile(filename, limits):
     """
     Load a subset of the data from the given file, with the extent
@@ -683,25 +1150,180 @@ def loadFile(filename, limits):
 
     :returns: 2-D `numpy.ndarray` of wind speed values.
 
+    :Note: files written with packed (integer) wind speeds are
+           unpacked using the `scale_factor` and `add_offset` attributes
+           of the variable.
+
     """
 
     (xmin, xmax, ymin, ymax) = limits
 
-    ncobj = nctools.ncLoadFile(filename)
-    ncobj_vmax = nctools.ncGetVar(ncobj, 'vmax')
-    data_subset = ncobj_vmax[ymin:ymax, xmin:xmax]
-    ncobj.close()
+    data_subset = np.zeros((ymax - ymin, xmax - xmin), dtype='f')
+    data, window = loadWindow(filename, limits)
+    if window is not None:
+        data_subset[window[2] - ymin:window[3] - ymin,
+                    window[0] - xmin:window[1] - xmin] = data
     return data_subset
 
+
+def loadWindow(filename, limits):
+    """
+    Load the part of the data from the given file that lies within
+    `limits` and may be non-zero.
+
+    Files written by the wind stage record the index limits of the
+    non-zero wind speeds in the `footprint` attribute of the `vmax`
+    variable (see :func:`wind.gustFootprint`). Only the overlap of the
+    footprint and `limits` is read, and nothing is read if they do not
+    overlap. For files without the attribute, the whole of `limits`
+    is read.
+
+    :param str filename: str full path to file to load.
+
+    :param tuple limits: tuple of index limits of a tile.
+
+    :returns: 2-D `numpy.ndarray` of wind speed values, and the index
+              limits of the window they were read from, or (None, None)
+              if no values need to be read.
+
+    """
+
+    ncobj = nctools.ncLoadFile(filename)
+    try:
+        ncobj_vmax = nctools.ncGetVar(ncobj, 'vmax')
+        window = tuple(limits)
+        if 'footprint' in ncobj_vmax.ncattrs():
+            window = intersectLimits(window, ncobj_vmax.footprint)
+            if window is None:
+                return None, None
+        (xmin, xmax, ymin, ymax) = window
+        ncobj_vmax.set_auto_maskandscale(True)
+        data = ncobj_vmax[ymin:ymax, xmin:xmax].astype('f')
+    finally:
+        ncobj.close()
+    return data, window
+
+
+def intersectLimits(limits, other):
+    """
+    Intersection of two sets of index limits.
+
+    :param tuple limits: tuple of index limits (xmin, xmax, ymin, ymax).
+    :param tuple other: tuple of index limits (xmin, xmax, ymin, ymax).
+
+    :returns: tuple of the index limits of the intersection, or None if
+              the limits do not overlap.
+
+    """
+    xmin = max(limits[0], other[0])
+    xmax = min(limits[1], other[1])
+    ymin = max(limits[2], other[2])
+    ymax = min(limits[3], other[3])
+    if xmin >= xmax or ymin >= ymax:
+        return None
+    return (int(xmin), int(xmax), int(ymin), int(ymax))
+
+def tileMemory(npoints, nrecords, nyears, calcCI=False, sampleSize=50,
+               itemsize=4):
+    """
+    Predict the peak memory used to calculate the hazard for one tile.
+
+    This counts the wind field records of the tile, the output arrays
+    and the temporary arrays of the fitting, which is done in blocks of
+    at most :data:`FIT_BLOCK_SIZE` values.
+
+    :param int npoints: number of points in the tile.
+    :param int nrecords: number of wind field records (files).
+    :param int nyears: number of return periods.
+    :param bool calcCI: whether confidence ranges are calculated.
+    :param int sampleSize: number of records in each sample for the
+                           confidence ranges.
+    :param int itemsize: size of each wind field value in bytes.
+
+    :returns: predicted peak memory in bytes.
+
+    """
+    block = min(nrecords * npoints, FIT_BLOCK_SIZE)
+    peak = itemsize * nrecords * npoints + 4 * npoints * (nyears + 3)
+    if calcCI:
+        nsamples = max(1, nrecords // sampleSize)
+        peak += 8 * npoints * nyears
+        peak += block * CI_BYTES + 16 * nyears * nsamples * block // nrecords
+    else:
+        peak += block * FIT_BYTES
+    return peak
+
+
+def tileSize(xdim, ydim, nrecords, memory, nyears, calcCI=False,
+             sampleSize=50, nworkers=1, itemsize=4):
+    """
+    Choose the size of the tiles from the memory available to each
+    worker. Tiles are as large as the memory allows but, when there is
+    more than one worker, small enough that there are at least two tiles
+    for each worker, so the work can be balanced between workers.
+
+    :param int xdim: number of points in the x-direction.
+    :param int ydim: number of points in the y-direction.
+    :param int nrecords: number of wind field records (files).
+    :param float memory: memory available to each worker in bytes.
+    :param int nyears: number of return periods.
+    :param bool calcCI: whether confidence ranges are calculated.
+    :param int sampleSize: number of records in each sample for the
+                           confidence ranges.
+    :param int nworkers: number of workers calculating tiles.
+    :param int itemsize: size of each wind field value in bytes.
+
+    :returns: size of the tiles in the x- and y-directions, and the
+              predicted peak memory for a tile in bytes.
+
+    """
+    def peak(npoints):
+        return tileMemory(npoints, nrecords, nyears, calcCI, sampleSize,
+                          itemsize)
+
+    # Largest number of points that fit in memory:
+    lo, hi = 1, xdim * ydim
+    while lo < hi:
+        mid = (lo + hi + 1) // 2
+        if peak(mid) <= memory:
+            lo = mid
+        else:
+            hi = mid - 1
+    npoints = lo
+
+    xstep = min(xdim, max(1, int(np.sqrt(npoints))))
+    ystep = min(ydim, max(1, npoints // xstep))
+    if ystep == ydim:
+        xstep = min(xdim, max(1, npoints // ystep))
+
+    # Split further to give each worker at least two tiles:
+    def ntiles(xstep, ystep):
+        return -(-xdim // xstep) * -(-ydim // ystep)
+
+    while (nworkers > 1 and ntiles(xstep, ystep) < 2 * nworkers and
+           (xstep > 1 or ystep > 1)):
+        if xstep >= ystep:
+            xstep = -(-xstep // 2)
+        else:
+            ystep = -(-ystep // 2)
+
+    return xstep, ystep, peak(xstep * ystep)
+
+
 def getTiles(tilegrid):
     """
     Helper to obtain a generator that yields tile numbers
 
+    The tiles are ordered from largest to smallest, so that the smaller
+    tiles at the edges of the domain are handed out last and the work
+    is balanced between workers.
+
     :param tilegrid: :class:`TileGrid` instance
     """
 
     tilenums = range(tilegrid.num_tiles)
-    return getTileLimits(tilegrid, tilenums)
+    tiles = getTileLimits(tilegrid, tilenums)
+    return sorted(tiles, key=lambda t: -(t[1] - t[0]) * (t[3] - t[2]))
 
 def getTileLimits(tilegrid, tilenums):
     """
@@ -742,6 +1364,10 @@ def run(configFile, callback=None):
     yrsPerSim = config.getint('TrackGenerator', 'YearsPerSimulation')
     minRecords = config.getint('Hazard', 'MinimumRecords')
     calculate_confidence = config.getboolean('Hazard', 'CalculateCI')
+    incremental = config.getboolean('Hazard', 'Incremental')
+    sampleSize = config.getint('Hazard', 'SampleSize')
+    nyears = len(config.get('Hazard', 'Years').split(','))
+    memory = config.getint('Hazard', 'WorkerMemory') * 1024 * 1024
 
     wf_lon, wf_lat = setDomain(inputPath)
 
@@ -750,26 +1376,50 @@ def run(configFile, callback=None):
 
     log.info("Running hazard calculations")
     TG = TileGrid(gridLimit, wf_lon, wf_lat)
+    nrecords = len(windfieldFiles(inputPath))
+    nworkers = max(1, pp.size() - 1)
+    xstep, ystep, peak = tileSize(TG.xdim, TG.ydim, nrecords, memory,
+                                  nyears, calculate_confidence, sampleSize,
+                                  nworkers)
+    TG.setTileSize(xstep, ystep)
     tiles = getTiles(TG)
+    log.info("Using %d tiles of up to %d x %d points for %d records: "
+             "predicted peak memory %.0f MB per worker", len(tiles),
+             xstep, ystep, nrecords, peak / 1024. ** 2)
+    if peak > memory:
+        log.warning("Predicted memory exceeds WorkerMemory (%d MB)",
+                    memory // 1024 ** 2)
 
     #def progress(i):
     #    callback(i, len(tiles))
 
+    storeFile = pjoin(outputPath, 'process', WINDFIELD_STORE)
+    cacheFile = pjoin(outputPath, 'process', HAZARD_CACHE)
+    if pp.rank() == 0:
+        files = windfieldFiles(inputPath)
+        if not isStoreCurrent(storeFile, files, tiles):
+            previous = None
+            if incremental:
+                previous = previousStore(storeFile, files, tiles)
+            transposeWindfields(files, storeFile, tiles, previous)
+
     pp.barrier()
+    store, attributes = loadBundle(storeFile)
     hc = HazardCalculator(configFile, TG,
                           numsimulations,
                           minRecords,
                           yrsPerSim,
-                          calculate_confidence)
-
-
-
+                          calculate_confidence,
+                          store)
+    if incremental:
+        hc.loadCache(cacheFile, attributes['signature'])
 
     hc.dumpHazardFromTiles(tiles)
 
     pp.barrier()
 
     hc.saveHazard()
+    hc.saveCache(cacheFile, tiles, attributes['signature'])
 
     log.info("Completed hazard calculation")
 
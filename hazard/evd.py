@@ -24,6 +24,8 @@ of the Royal Statistical Society, 52, 1, 105-124.
 import logging as log
 import numpy as np
 
+from Utilities import lmomentFit
+
 try:
     import lmoments as lmom
 except ImportError:
@@ -99,3 +101,159 @@ def estimateEVD(v, years, missingValue=-9999., minRecords=50, yrspersim=1):
                 w[i] = missingValue
 
     return w, loc, scale, shp
+
+
+def gevQuantiles(years, loc, scale, shp, missingValue=-9999., yrspersim=1):
+    """
+    Calculate return period values from arrays of GEV distribution
+    parameters.
+
+    :param years: array of years for which to calculate return period values.
+    :type years: :class:`numpy.ndarray`
+    :param loc: array of location parameters.
+    :param scale: array of scale parameters.
+    :param shp: array of shape parameters. Where this equals
+                `missingValue`, the return period values are missing.
+    :param float missingValue: value to insert where the fit is missing or
+                               the return period value is not finite.
+    :param int yrspersim: data represent block maxima - this gives the length
+                          of each block in years.
+
+    :return: return period values, with shape `(len(years),) + loc.shape`
+    :rtype: :class:`numpy.ndarray`
+
+    """
+    years = np.asarray(years, dtype=float)
+    loc, scale, shp = [np.asarray(p, dtype=float) for p in (loc, scale, shp)]
+    t = years.reshape((-1,) + (1,) * loc.ndim)
+    with np.errstate(divide='ignore', invalid='ignore', over='ignore'):
+        w = loc + (scale / shp) * \
+            (1. - np.power(-1. * np.log(1. - (float(yrspersim) / t)), shp))
+    w[~np.isfinite(w) | (shp == missingValue)] = missingValue
+    return w
+
+
+def estimateEVDArray(V, years, missingValue=-9999., minRecords=50,
+                     yrspersim=1):
+    """
+    Array version of :func:`estimateEVD`: calculate extreme value
+    distribution parameters and return period values for each column of
+    an array of data values. This gives the same results as calling
+    :func:`estimateEVD` for each column in turn.
+
+    :param V: array of data values, sorted in ascending order along the
+              first axis.
+    :type V: :class:`numpy.ndarray`
+    :param years: array of years for which to calculate return period values.
+    :type years: :class:`numpy.ndarray`
+    :param float missingValue: value to insert if fit does not converge.
+    :param int minRecords: minimum number of valid observations required to
+                           perform fitting.
+    :param int yrspersim: data represent block maxima - this gives the length
+                          of each block in years.
+
+    :return: return period values, with shape `(len(years),) + V.shape[1:]`
+    :rtype: :class:`numpy.ndarray`
+    :return: location, scale and shape parameters of the distribution,
+             each with shape `V.shape[1:]`
+    :rtype: :class:`numpy.ndarray`
+
+    """
+    missingValue = float(missingValue)
+    V = np.asarray(V)
+    shape = V.shape[1:]
+    loc = missingValue * np.ones(shape)
+    scale = missingValue * np.ones(shape)
+    shp = missingValue * np.ones(shape)
+
+    # As for estimateEVD, only the non-zero values are used, and only
+    # where they are not all equal and there are at least minRecords:
+    nonzero = V != 0
+    vmin = np.where(nonzero, V, np.inf).min(axis=0)
+    vmax = np.where(nonzero, V, -np.inf).max(axis=0)
+    fit = ((V.max(axis=0) > 0.) & (vmin != vmax) &
+           (nonzero.sum(axis=0) >= minRecords))
+
+    if fit.any():
+        # The third value returned is TAU3; it is divided by L2 again
+        # here exactly as in estimateEVD, so the results are the same:
+        l1, l2, l3 = lmomentFit.samlmu3Array(V[:, fit], nonzero[:, fit])
+        with np.errstate(divide='ignore', invalid='ignore'):
+            t3 = l3 / l2
+        valid = (l2 > 0.) & (np.abs(t3) < 1.)
+        if (~valid).any():
+            log.debug("Invalid l-moments at %d points", (~valid).sum())
+        l, sc, sh = lmomentFit.pelgevArray(l1[valid], l2[valid], t3[valid])
+
+        # We only store the values if the location parameter is finite:
+        finite = np.isfinite(l)
+        idx = np.flatnonzero(fit)[np.flatnonzero(valid)[finite]]
+        loc.flat[idx] = l[finite]
+        scale.flat[idx] = sc[finite]
+        shp.flat[idx] = sh[finite]
+
+    w = gevQuantiles(years, loc, scale, shp, missingValue, yrspersim)
+    return w, loc, scale, shp
+
+
+# Constant `a` of the plotting position (m - a) / (N + 1 - 2a) of the
+# m-th largest of N values:
+PLOTTING_POSITIONS = {'weibull': 0.,
+                      'cunnane': 0.4,
+                      'gringorten': 0.44,
+                      'hazen': 0.5}
+
+
+def empiricalReturnLevels(V, years, missingValue=-9999., yrspersim=1,
+                          position='weibull'):
+    """
+    Calculate empirical return period values for each column of an
+    array of data values, from the order statistics of the data.
+
+    The exceedance probability of the m-th largest of N values is given
+    by the plotting position (m - a) / (N + 1 - 2a), with `a` chosen by
+    `position` (see :data:`PLOTTING_POSITIONS`). The return period
+    value is interpolated linearly between the order statistics on
+    either side of the probability `yrspersim / years`. Only the order
+    statistics that are needed are found, using a partial sort.
+
+    :param V: array of data values. The array is partially sorted in
+              place along the first axis.
+    :type V: :class:`numpy.ndarray`
+    :param years: array of years for which to calculate return period values.
+    :type years: :class:`numpy.ndarray`
+    :param float missingValue: value to insert where the return period is
+                               outside the range of the data.
+    :param int yrspersim: data represent block maxima - this gives the length
+                          of each block in years.
+    :param str position: plotting position: 'weibull', 'cunnane',
+                         'gringorten' or 'hazen'.
+
+    :return: return period values, with shape `(len(years),) + V.shape[1:]`
+    :rtype: :class:`numpy.ndarray`
+
+    """
+    try:
+        a = PLOTTING_POSITIONS[position.lower()]
+    except KeyError:
+        raise ValueError("Unknown plotting position: %s" % position)
+
+    years = np.asarray(years, dtype=float)
+    n = V.shape[0]
+    rank = (float(yrspersim) / years) * (n + 1. - 2. * a) + a
+    valid = (rank >= 1.) & (rank <= n)
+    lower = np.floor(np.clip(rank, 1., n)).astype(int)
+    upper = np.minimum(lower + 1, n)
+
+    # Index of the m-th largest value in ascending order is n - m:
+    kth = np.unique(np.concatenate([n - lower[valid], n - upper[valid]]))
+    w = missingValue * np.ones((len(years),) + V.shape[1:])
+    if len(kth) == 0:
+        return w
+    V.partition(kth, axis=0)
+
+    for i in np.flatnonzero(valid):
+        vlower = V[n - lower[i]].astype(float)
+        vupper = V[n - upper[i]].astype(float)
+        w[i] = vlower + (vupper - vlower) * (rank[i] - lower[i])
+    return w
@@ -91,6 +91,7 @@ def doOutputDirectoryCreation(configFile):
             except OSError:
                 raise
 
+@timer
 def doTimeseriesPlotting(configFile):
     """
     Run functions to plot time series output.
@@ -109,6 +110,7 @@ def doTimeseriesPlotting(configFile):
     from PlotInterface.plotTimeseries import plotTimeseries
     plotTimeseries(timeseriesPath, plotPath)
 
+@timer
 def doWindfieldPlotting(configFile):
     """
     Plot the wind field on a map.
@@ -162,16 +164,22 @@ def doWindfieldPlotting(configFile):
                      cbarlabel, map_kwargs, plotPath)
 
 @timer
-def main(configFile):
+def doTrackInterpolation(configFile):
     """
-    Main function to execute the :mod:`wind`.
+    Interpolate the input track to a fine temporal resolution.
 
-    :param str configFile: Path to configuration file.
+    The interpolated track is saved in TCRM format to
+    'tracks/tracks.interp.csv' for reference, but is passed to the wind
+    field calculation in memory.
+
+    :param str configFile: Path to the configuration file.
+
+    :returns: `list` of :class:`Track` objects containing the
+              interpolated track data.
 
     """
     config = ConfigParser()
     config.read(configFile)
-    doOutputDirectoryCreation(configFile)
 
     trackFile = config.get('DataProcess', 'InputFile')
     source = config.get('DataProcess', 'Source')
@@ -180,10 +188,28 @@ def main(configFile):
     outputTrackFile = pjoin(outputPath, "tracks.interp.csv")
 
     # This will save interpolated track data in TCRM format:
-    interpTrack = interpolateTracks.parseTracks(configFile, trackFile,
-                                                source, delta,
-                                                outputTrackFile,
-                                                interpolation_type='akima')
+    return interpolateTracks.parseTracks(configFile, trackFile,
+                                         source, delta,
+                                         outputTrackFile,
+                                         interpolation_type='akima')
+
+@timer
+def doWindfieldCalculations(configFile, tracks):
+    """
+    Calculate the wind field for the interpolated track(s).
+
+    :param str configFile: Path to the configuration file.
+    :param tracks: `list` of :class:`Track` objects containing the
+                   interpolated track data.
+
+    :Note: the output file name will be 'gust.interp.nc'
+
+    """
+    config = ConfigParser()
+    config.read(configFile)
+
+    outputPath = pjoin(config.get('Output','Path'), 'tracks')
+    outputTrackFile = pjoin(outputPath, "tracks.interp.csv")
 
     showProgressBar = config.get('Logging', 'ProgressBar')
 
@@ -193,7 +219,21 @@ def main(configFile):
         pbar.update(float(done)/total)
 
     import wind
-    wind.run(configFile, status)
+    wind.runTracks(configFile, [track.data for track in tracks],
+                   outputTrackFile, status)
+
+@timer
+def main(configFile):
+    """
+    Main function to execute the :mod:`wind`.
+
+    :param str configFile: Path to configuration file.
+
+    """
+    doOutputDirectoryCreation(configFile)
+
+    tracks = doTrackInterpolation(configFile)
+    doWindfieldCalculations(configFile, tracks)
 
     doWindfieldPlotting(configFile)
     doTimeseriesPlotting(configFile)
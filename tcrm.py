@@ -158,13 +158,16 @@ def doOutputDirectoryCreation(configFile):
                 raise
 
 
-def doTrackGeneration(configFile):
+def doTrackGeneration(configFile, windfield=False):
     """
     Do the tropical cyclone track generation in :mod:`TrackGenerator`.
 
     The track generation settings are read from *configFile*.
 
     :param str configFile: Name of configuration file.
+    :param bool windfield: if True, also calculate the wind fields,
+                           passing the tracks of each simulation to
+                           :mod:`wind` in memory.
 
     """
 
@@ -181,7 +184,7 @@ def doTrackGeneration(configFile):
         pbar.update(float(done)/total)
 
     import TrackGenerator
-    TrackGenerator.run(configFile, status)
+    TrackGenerator.run(configFile, status, windfield=windfield)
 
     pbar.update(1.0)
     log.info('Completed track generation')
@@ -374,6 +377,13 @@ def doStatistics(configFile):
     if getRMWDistFromInputData:
         statInterface.cdfCellSize()
 
+    pbar.update(0.9)
+
+    # Compile the calibration that is loaded by each track generator
+    # process:
+    import TrackGenerator
+    TrackGenerator.compileCalibration(configFile)
+
     pbar.update(1.0)
     log.info('Completed StatInterface')
 
@@ -501,12 +511,18 @@ def main(configFile='main.ini'):
 
     pp.barrier()
 
+    # Calculate the wind fields as the tracks are generated, without
+    # reading the tracks back from file:
+    inline = (config.getboolean('Actions', 'ExecuteTrackGenerator') and
+              config.getboolean('Actions', 'ExecuteWindfield') and
+              config.getboolean('TrackGenerator', 'InlineWindfield'))
+
     if config.getboolean('Actions', 'ExecuteTrackGenerator'):
-        doTrackGeneration(configFile)
+        doTrackGeneration(configFile, windfield=inline)
 
     pp.barrier()
 
-    if config.getboolean('Actions', 'ExecuteWindfield'):
+    if config.getboolean('Actions', 'ExecuteWindfield') and not inline:
         doWindfieldCalculations(configFile)
 
     pp.barrier()
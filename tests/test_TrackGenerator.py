@@ -1,15 +1,574 @@
+"""
+Test the tropical cyclone track generator
+"""
+
+import os
+import math
+import shutil
 import unittest
-from numpy.testing import *
+import tempfile
+import numpy as np
+from datetime import datetime
+from netCDF4 import Dataset
+from ConfigParser import RawConfigParser
+from numpy.testing import assert_almost_equal
+
+from StatInterface.generateStats import parameters
+from StatInterface.SamplingOrigin import SamplingOrigin
+from TrackGenerator.trackLandfall import LandfallDecay, LandRaster
+from Utilities.tcrandom import randomStream
+from Utilities.writer import BackgroundWriter
+import TrackGenerator.TrackGenerator as TG
+import wind
+
+
+class FakeStats(object):
+    """Uniform cell coefficients for the AR(1) models"""
+
+    def __init__(self, ncells, mu, sig, alpha, lmu=None):
+        self.coeffs = parameters(ncells)
+        phi = math.sqrt(1. - alpha**2)
+        for prefix in ('', 'l'):
+            getattr(self.coeffs, prefix + 'mu').fill(mu)
+            getattr(self.coeffs, prefix + 'sig').fill(sig)
+            getattr(self.coeffs, prefix + 'alpha').fill(alpha)
+            getattr(self.coeffs, prefix + 'phi').fill(phi)
+        if lmu is not None:
+            self.coeffs.lmu.fill(lmu)
+        self.coeffs.min.fill(900.)
+        self.coeffs.lmin.fill(900.)
+
+
+class FakeMSLP(object):
+    """Environmental pressure increasing towards the south"""
+
+    def get_pressure(self, coords):
+        return 1005. - 0.2 * np.asarray(coords[1], 'd')
+
+
+class FakeLandMask(object):
+    """Land south of latitude `south`"""
+
+    def __init__(self, south):
+        self.south = south
+
+    def sampleGrid(self, lon, lat):
+        return np.where(np.asarray(lat) < self.south, 1., 0.)
+
+
+class FakeLandfall(object):
+
+    def __init__(self, south):
+        self.landMask = FakeLandMask(south)
+
+    def overLand(self, lon, lat):
+        return self.landMask.sampleGrid(lon, lat) > 0.0
+
+    def onLand(self, lon, lat):
+        return self.overLand(lon, lat)
+
+
+class LandMaskGrid(object):
+    """A land-sea mask with land south of 20S"""
+
+    def __init__(self):
+        self.lon = np.arange(130., 170.01, 0.5)
+        self.lat = np.arange(-40., 0.01, 0.5)
+        self.grid = np.where(self.lat < -20., 1., 0.)[:, np.newaxis] * \
+            np.ones(len(self.lon))
+
+
+class FakeOrigin(object):
+    """Genesis points spread over a box"""
+
+    def ppf(self, q1, q2):
+        return 148. + 4. * q1, -14. + 4. * q2
+
+
+def cdfTable(cells, values, rng):
+    """Random empirical CDFs of `values` for each of `cells`"""
+    rows = []
+    for cell in cells:
+        pdf = rng.uniform(size=len(values))
+        cdf = np.cumsum(pdf) / pdf.sum()
+        rows.append(np.column_stack((cell * np.ones(len(values)),
+                                     values, cdf)))
+    return np.vstack(rows)
+
+
+class TestCellCDF(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.table = cdfTable([3, 0, 7, 4], np.linspace(900., 1010., 23),
+                              rng)
+        self.cdf = TG.CellCDF(self.table)
+        self.cells = rng.choice([0, 3, 4, 7], 500)
+        self.q = rng.uniform(size=500)
+
+    def testPpf(self):
+        """Batch sampling matches sampling each cell's table"""
+        result = self.cdf.ppf(self.q, self.cells)
+        for q, c, x in zip(self.q, self.cells, result):
+            rows = self.table[self.table[:, 0] == c, 1:3]
+            self.assertEqual(x, TG.ppf(q, rows))
+
+    def testCdfBelow(self):
+        """Batch CDF values match searching each cell's table"""
+        x = np.linspace(890., 1020., 500)
+        result = self.cdf.cdfBelow(x, self.cells)
+        for value, c, p in zip(x, self.cells, result):
+            rows = self.table[self.table[:, 0] == c, 1:3]
+            ix = rows[:, 0].searchsorted(value)
+            self.assertEqual(p, rows[ix - 1, 1])
+
+    def testMissingCell(self):
+        """Cells without a distribution raise an error"""
+        self.assertRaises(ValueError, self.cdf.ppf, [0.5], [5])
+        self.assertRaises(ValueError, self.cdf.ppf, [0.5], [8])
+
+
+def mslpField(nlat, nlon):
+    """A smooth daily MSLP climatology with a seasonal cycle"""
+    day, lat, lon = np.mgrid[0:365, 0:nlat, 0:nlon].astype(float)
+    day *= 2. * np.pi / 365.
+    lat = np.radians(-90. + lat * 180. / nlat)
+    lon = np.radians(lon * 360. / nlon)
+    return (1010. + 8. * np.cos(2. * lat + 0.2 * np.sin(day)) +
+            3. * np.cos(lat) * np.cos(3. * lon + day))
+
+
+class TestSamplePressure(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.nc')
+        os.close(fd)
+        ncobj = Dataset(self.filename, 'w')
+        ncobj.createDimension('time', 365)
+        ncobj.createDimension('lat', 37)
+        ncobj.createDimension('lon', 72)
+        slp = ncobj.createVariable('slp', 'f', ('time', 'lat', 'lon'))
+        slp.units = 'hPa'
+        slp[:] = mslpField(37, 72)
+        ncobj.close()
+        self.gridLimit = {'xMin': 140, 'xMax': 160, 'yMin': -30, 'yMax': -5}
+
+    def tearDown(self):
+        os.unlink(self.filename)
+
+    def testCubeAtGridPoints(self):
+        """The daily cube matches the interpolation at its grid points"""
+        mslp = TG.SamplePressure(self.filename, resolution=0.5,
+                                 gridLimit=self.gridLimit)
+        day = np.array([0., 45., 180., 364.])
+        lat = np.array([-30., -12.5, -5., -20.])
+        lon = np.array([140., 150.5, 160., 145.])
+        coords = np.array([day, lat, lon])
+        assert_almost_equal(mslp.get_pressure(coords),
+                            mslp.interpolate(coords), decimal=3)
+
+    def testCubeAccuracy(self):
+        """The daily cube is close to the interpolation between points"""
+        spline = TG.SamplePressure(self.filename)
+        mslp = TG.SamplePressure(self.filename, resolution=0.25,
+                                 gridLimit=self.gridLimit)
+        rng = np.random.RandomState(1)
+        coords = np.array([rng.uniform(0., 365., 1000),
+                           rng.uniform(-30., -5., 1000),
+                           rng.uniform(140., 160., 1000)])
+        error = mslp.get_pressure(coords) - spline.get_pressure(coords)
+        self.assertTrue(np.abs(error).max() < 0.2)
+
+
+class TestDayOfYear(unittest.TestCase):
 
-# from TrackGenerator import TrackGenerator
+    def testMatchesStrftime(self):
+        """The day of the year matches the value from strftime"""
+        times = [datetime(2000, 1, 1), datetime(2000, 3, 1, 6),
+                 datetime(2001, 12, 31, 23, 30), datetime(2004, 7, 4, 12)]
+        expected = [int(t.strftime("%j")) + t.hour/24. for t in times]
+        assert_almost_equal(TG._dayOfYear(times), expected)
+        assert_almost_equal(TG._dayOfYear(np.datetime64(times[1])),
+                            expected[1])
 
 
 class TestTrackGenerator(unittest.TestCase):
 
-    def testGeneratePath(self):
-        assert_almost_equal(range(10), range(10))
-        pass
+    def setUp(self):
+        self.tg = TG.TrackGenerator.__new__(TG.TrackGenerator)
+        self.tg.gridLimit = {'xMin': 140, 'xMax': 160,
+                             'yMin': -30, 'yMax': -5}
+        self.tg.gridSpace = {'x': 1, 'y': 1}
+        self.tg.dt = 1.
+        self.tg.maxTimeSteps = 120
+        self.tg.mslp = FakeMSLP()
+        self.tg.landfall = FakeLandfall(-20.)
+        self.tg.allCDFInitSize = None
+        self.tg.innerGridLimit = None
+        self.tg.ensemble = False
+        self.setCoefficients(noise=True)
+
+    def setCoefficients(self, noise):
+        ncells = 500
+        scale = 1. if noise else 0.
+        self.tg.vStats = FakeStats(ncells, 20., 5. * scale, 0.8)
+        self.tg.bStats = FakeStats(ncells, math.radians(225.),
+                                   0.2 * scale, 0.8)
+        self.tg.dpStats = FakeStats(ncells, 0.3, 1. * scale, 0.5, lmu=1.)
+        self.tg.pStats = FakeStats(ncells, 950., 10., 0.5)
+
+    def genesis(self, n):
+        return (range(1, n + 1), [150.] * n, [-12.] * n, [20.] * n,
+                [225.] * n, [960.] * n, [1008.] * n, [30.] * n,
+                [datetime(2000, 3, 1, 6)] * n)
+
+    def scalarTracks(self, n):
+        return [self.tg._singleTrack(*args)
+                for args in zip(*self.genesis(n))]
+
+    def loadDistributions(self):
+        rng = np.random.RandomState(2)
+        cells = range(500)
+        self.tg.originSampler = FakeOrigin()
+        self.tg.innerGridLimit = None
+        self.tg.cdfInitBearing = TG.CellCDF(
+            cdfTable(cells, np.linspace(200., 250., 11), rng))
+        self.tg.cdfInitSpeed = TG.CellCDF(
+            cdfTable(cells, np.linspace(10., 30., 11), rng))
+        self.tg.cdfInitPressure = TG.CellCDF(
+            cdfTable(cells, np.linspace(950., 1000., 11), rng))
+        self.tg.cdfInitDay = TG.CellCDF(
+            cdfTable(cells, np.linspace(1., 120., 11), rng))
+        self.tg.cdfInitSize = TG.CellCDF(
+            cdfTable(cells, np.linspace(20., 60., 11), rng))
+
+    def testGenerateTracks(self):
+        """Tracks are generated from sampled genesis conditions"""
+        self.loadDistributions()
+        for ensemble in (False, True):
+            self.tg.ensemble = ensemble
+            self.tg.rng = randomStream(1)
+            tracks = self.tg.generateTracks(20)
+            self.assertEqual(tracks.dtype.names, TG.trackFileFields)
+            index, age, lon = [tracks[field] for field in
+                               ('CycloneNumber', 'TimeElapsed', 'Longitude')]
+            pressure, penv = tracks['CentralPressure'], tracks['EnvPressure']
+            numbers = np.unique(index)
+            self.assertTrue(len(numbers) > 0)
+            self.assertTrue(np.all(pressure < penv))
+            first = [np.flatnonzero(index == n)[0] for n in numbers]
+            self.assertTrue(np.all(age[first] == 0))
+            self.assertTrue(np.all((lon[first] >= 148.) &
+                                   (lon[first] <= 152.)))
+
+    def testIterTracks(self):
+        """Tracks generated in batches are numbered consecutively"""
+        self.loadDistributions()
+        self.tg.ensemble = True
+        self.tg.rng = randomStream(1)
+        batches = list(self.tg.iterTracks(20, chunkSize=7))
+        self.assertEqual(len(batches), 3)
+        numbers = [np.unique(tracks['CycloneNumber'])
+                   for tracks in batches if len(tracks) > 0]
+        numbers = np.concatenate(numbers)
+        self.assertTrue(np.all(np.diff(numbers) > 0))
+        self.assertTrue(numbers[0] >= 1 and numbers[-1] <= 20)
+
+        # A single batch gives the same tracks as generateTracks:
+        self.tg.rng = randomStream(1)
+        expected = self.tg.generateTracks(20)
+        self.tg.rng = randomStream(1)
+        batches = list(self.tg.iterTracks(20, chunkSize=20))
+        self.assertEqual(len(batches), 1)
+        self.assertTrue(np.all(batches[0] == expected))
+
+    def testChunkSize(self):
+        """The tracks do not depend on the batch size"""
+        self.loadDistributions()
+        for ensemble in (False, True):
+            self.tg.ensemble = ensemble
+            self.tg.rng = randomStream(1)
+            expected = np.concatenate(list(self.tg.iterTracks(20,
+                                                               chunkSize=20)))
+            self.assertTrue(len(expected) > 0)
+            for chunkSize in (1, 7):
+                self.tg.rng = randomStream(1)
+                result = np.concatenate(
+                    list(self.tg.iterTracks(20, chunkSize=chunkSize)))
+                self.assertEqual(len(result), len(expected))
+                self.assertTrue(np.all(result == expected))
+
+    def testSaveInBatches(self):
+        """Track files written in batches match a single write"""
+        self.loadDistributions()
+        self.tg.rng = randomStream(1)
+        tracks = self.tg.generateTracks(10)
+        header, fmt = TG.TRACKFILE_HEADER, TG.TRACKFILE_FMT
+        fd, single = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        fd, batched = tempfile.mkstemp(suffix='.csv')
+        os.close(fd)
+        try:
+            TG.saveTrackFile(single, tracks, header, fmt)
+            TG.saveTrackFile(batched, tracks[:0], header, fmt)
+            for rows in (slice(0, 50), slice(50, None)):
+                TG.saveTrackFile(batched, tracks[rows], header, fmt,
+                                 append=True)
+            with open(single) as fp1, open(batched) as fp2:
+                self.assertEqual(fp1.read(), fp2.read())
+            data = wind.readTrackData(single)
+            self.assertEqual(list(data['Datetime']),
+                             list(tracks['Datetime']))
+        finally:
+            os.unlink(single)
+            os.unlink(batched)
+
+    def testCalibrationBundle(self):
+        """A generator loaded from a calibration bundle gives the same
+        tracks"""
+        self.loadDistributions()
+        self.tg.originSampler = SamplingOrigin(
+            np.random.RandomState(3).uniform(size=(5, 9)),
+            np.linspace(148., 152., 9), np.linspace(-14., -10., 5))
+        self.tg.cdfSize = None
+        # Statistics read from netcdf files are masked arrays:
+        self.tg.pStats.coeffs.min = np.ma.masked_greater(
+            self.tg.pStats.coeffs.min, 1e6)
+
+        path = tempfile.mkdtemp()
+        try:
+            mslpFile = os.path.join(path, 'mslp.nc')
+            ncobj = Dataset(mslpFile, 'w')
+            ncobj.createDimension('time', 365)
+            ncobj.createDimension('lat', 37)
+            ncobj.createDimension('lon', 72)
+            slp = ncobj.createVariable('slp', 'f', ('time', 'lat', 'lon'))
+            slp.units = 'hPa'
+            slp[:] = mslpField(37, 72)
+            ncobj.close()
+            self.tg.mslp = TG.SamplePressure(mslpFile, resolution=0.5,
+                                             gridLimit=self.tg.gridLimit)
+
+            mask = LandMaskGrid()
+            landfall = LandfallDecay.__new__(LandfallDecay)
+            landfall.configFile = 'tcrm.ini'
+            landfall.dt = 1.
+            landfall.tol = 0
+            landfall.landMask = mask
+            landfall.raster = LandRaster(mask, self.tg.gridLimit)
+            self.tg.landfall = landfall
+
+            bundleFile = os.path.join(path, 'calibration.bundle')
+            self.tg.saveCalibration(bundleFile,
+                                    {'gridLimit': self.tg.gridLimit})
+            tg, attributes = TG.loadCalibration(
+                bundleFile, path, self.tg.gridSpace, {'x': 1, 'y': 1},
+                maxTimeSteps=self.tg.maxTimeSteps)
+            self.assertEqual(attributes['gridLimit'], self.tg.gridLimit)
+            self.assertTrue(isinstance(tg.cdfInitDay.x, np.memmap))
+            self.assertTrue(tg.landfall.landMask is None)
+
+            for ensemble in (False, True):
+                self.tg.ensemble = tg.ensemble = ensemble
+                self.tg.rng = randomStream(1)
+                expected = self.tg.generateTracks(20)
+                tg.rng = randomStream(1)
+                result = tg.generateTracks(20)
+                self.assertTrue(len(expected) > 0)
+                self.assertTrue(np.all(result == expected))
+        finally:
+            shutil.rmtree(path)
+
+    def testInnerDomain(self):
+        """Stopping tracks on leaving the inner domain keeps the same
+        tracks"""
+        self.loadDistributions()
+        self.tg.rng = randomStream(1)
+        tracks = self.tg.generateTracks(40)
+        inner = {'xMin': 146., 'xMax': 156., 'yMin': -20., 'yMax': -11.}
+        inside = ((tracks['Longitude'] > inner['xMin']) &
+                  (tracks['Longitude'] < inner['xMax']) &
+                  (tracks['Latitude'] > inner['yMin']) &
+                  (tracks['Latitude'] < inner['yMax']))
+        outside = np.unique(tracks['CycloneNumber'][~inside])
+        expected = tracks[~np.in1d(tracks['CycloneNumber'], outside)]
+
+        self.tg.innerGridLimit = inner
+        self.tg.rng = randomStream(1)
+        result = self.tg.generateTracks(40)
+        self.assertTrue(len(expected) > 0 and len(outside) > 0)
+        self.assertTrue(np.all(result == expected))
+
+        # Ensemble tracks are also culled to the inner domain:
+        self.tg.ensemble = True
+        result = self.tg.generateTracks(40)
+        self.assertTrue(len(result) > 0)
+        self.assertTrue(np.all((result['Longitude'] > inner['xMin']) &
+                               (result['Longitude'] < inner['xMax']) &
+                               (result['Latitude'] > inner['yMin']) &
+                               (result['Latitude'] < inner['yMax'])))
+
+    def testDeterministicEnsemble(self):
+        """Without random variation, the ensemble matches single tracks"""
+        self.setCoefficients(noise=False)
+        self.tg.landfall = FakeLandfall(-90.)
+        self.tg.rng = randomStream(1)
+        expected = self.scalarTracks(3)
+        result = self.tg._ensembleTracks(*self.genesis(3))
+        self.assertEqual(len(result), 3)
+        for track, single in zip(result, expected):
+            self.assertEqual(len(track[0]), len(single[0]))
+            self.assertEqual(list(track[1]), list(single[1]))
+            for k in [0, 2, 3, 4, 5, 6, 7, 8, 9]:
+                assert_almost_equal(track[k], single[k], decimal=3)
+
+    def testStatisticalEquivalence(self):
+        """Ensemble tracks have the same statistics as single tracks"""
+        n = 200
+        self.tg.rng = randomStream(1, 0)
+        single = self.scalarTracks(n)
+        self.tg.rng = randomStream(1, 1)
+        ensemble = self.tg._ensembleTracks(*self.genesis(n))
+
+        def summary(tracks):
+            length = np.array([len(t[0]) for t in tracks], 'd')
+            minp = np.array([t[7].min() for t in tracks])
+            lat = np.array([t[4][-1] for t in tracks])
+            return length, minp, lat
+
+        for x, y in zip(summary(single), summary(ensemble)):
+            stderr = math.sqrt((x.var() + y.var()) / n)
+            self.assertTrue(abs(x.mean() - y.mean()) < 4. * stderr + 1e-6)
+
+        # Some tracks should decay over land in both cases:
+        for tracks in (single, ensemble):
+            self.assertTrue(any(t[4][-1] < -20. for t in tracks))
+
+    def testReproducible(self):
+        """Simulations do not depend on how they are distributed"""
+        def simulate(order):
+            tracks = {}
+            for index in order:
+                self.tg.rng = randomStream(1234, index)
+                tracks[index] = self.tg._ensembleTracks(*self.genesis(5))
+            return tracks
+
+        # One processor running all simulations, and each of two
+        # processors running every second simulation:
+        serial = simulate(range(4))
+        parallel = simulate([1, 3])
+        parallel.update(simulate([0, 2]))
+        for index in range(4):
+            for track, other in zip(serial[index], parallel[index]):
+                for k in [0, 2, 3, 4, 5, 6, 7, 8, 9]:
+                    self.assertTrue(np.all(track[k] == other[k]))
+
+        self.assertFalse(np.all(serial[0][0][7][:10] ==
+                                serial[1][0][7][:10]))
+
+
+class TestCheckpoint(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.outfile = os.path.join(self.path, 'tracks.00003.csv')
+        with open(self.outfile, 'w') as fh:
+            fh.write('%CycloneNumber\n1\n')
+        self.sim = TG.Simulation(3, 1, 10, 'tracks.00003.csv')
+        self.checkpointFile = os.path.join(self.path, 'checkpoint.000.dat')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def testComplete(self):
+        """A recorded simulation is complete until its inputs change"""
+        TG.saveCheckpoint(self.checkpointFile, self.sim, 'abc',
+                          [self.outfile])
+        record = TG.loadCheckpoints(self.path).get(3)
+        self.assertTrue(TG.isComplete(record, self.sim, 'abc'))
+        self.assertFalse(TG.isComplete(record, self.sim, 'abd'))
+        self.assertFalse(TG.isComplete(None, self.sim, 'abc'))
+        other = TG.Simulation(3, 2, 10, 'tracks.00003.csv')
+        self.assertFalse(TG.isComplete(record, other, 'abc'))
+
+        with open(self.outfile, 'a') as fh:
+            fh.write('2\n')
+        self.assertFalse(TG.isComplete(record, self.sim, 'abc'))
+
+    def testFailedWrite(self):
+        """No checkpoint is recorded if writing the output fails"""
+        def fail(filename, tracks):
+            with open(filename, 'a') as fh:
+                fh.write('2\n')
+            raise IOError("disk full")
+
+        writer = BackgroundWriter()
+        try:
+            writer.submit(fail, self.outfile, None)
+            writer.submit(TG.saveCheckpoint, self.checkpointFile, self.sim,
+                          'abc', [self.outfile])
+            self.assertRaises(IOError, writer.flush)
+        finally:
+            writer.close()
+        self.assertEqual(TG.loadCheckpoints(self.path), {})
+
+    def testIncompleteRecord(self):
+        """A partly written record is ignored"""
+        TG.saveCheckpoint(self.checkpointFile, self.sim, 'abc',
+                          [self.outfile])
+        with open(self.checkpointFile, 'a') as fh:
+            fh.write('4|1|10|abc|%s' % self.outfile)
+        self.assertEqual(sorted(TG.loadCheckpoints(self.path)), [3])
+
+    def testCalibrationHash(self):
+        """The calibration hash depends on the calibration files"""
+        config = RawConfigParser()
+        config.add_section('Input')
+        config.set('Input', 'MSLPFile', os.path.join(self.path, 'mslp.nc'))
+        config.add_section('Logging')
+        config.set('Logging', 'LogFile', 'tcrm.log')
+        first = TG.calibrationHash(config, self.path)
+        config.set('Logging', 'LogFile', 'other.log')
+        self.assertEqual(TG.calibrationHash(config, self.path), first)
+
+        with open(os.path.join(self.path, 'speed_stats.nc'), 'w') as fh:
+            fh.write('speed')
+        second = TG.calibrationHash(config, self.path)
+        self.assertNotEqual(second, first)
+        self.assertNotEqual(TG.calibrationHash(config, self.path, [1]),
+                            second)
+
+    def testCalibrationSettings(self):
+        """The calibration hash only depends on the settings that
+        determine the tracks of a simulation"""
+        config = RawConfigParser()
+        config.add_section('Input')
+        config.set('Input', 'MSLPFile', os.path.join(self.path, 'mslp.nc'))
+        config.add_section('TrackGenerator')
+        config.set('TrackGenerator', 'NumSimulations', '10')
+        config.set('TrackGenerator', 'YearsPerSimulation', '1')
+        config.add_section('Hazard')
+        config.set('Hazard', 'Years', '10,100')
+        first = TG.calibrationHash(config, self.path)
+        signature = TG.calibrationSignature(config, self.path)
+
+        # More simulations, another batch size, or other hazard
+        # settings, leave the earlier simulations complete:
+        config.set('TrackGenerator', 'NumSimulations', '20')
+        config.set('TrackGenerator', 'ChunkSize', '100')
+        config.set('Hazard', 'Years', '10,100,1000')
+        self.assertEqual(TG.calibrationHash(config, self.path), first)
+        self.assertEqual(TG.calibrationSignature(config, self.path),
+                         signature)
+        TG.saveCheckpoint(self.checkpointFile, self.sim, first,
+                          [self.outfile])
+        record = TG.loadCheckpoints(self.path).get(3)
+        self.assertTrue(TG.isComplete(record, self.sim,
+                                      TG.calibrationHash(config, self.path)))
+
+        config.set('TrackGenerator', 'YearsPerSimulation', '2')
+        self.assertNotEqual(TG.calibrationHash(config, self.path), first)
+
 
 if __name__ == "__main__":
-    suite = unittest.makeSuite(TestTrackGenerator, 'test')
-    unittest.TextTestRunner().run(suite)
+    unittest.main()
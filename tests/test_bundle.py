@@ -0,0 +1,70 @@
+"""
+Test the memory-mapped array bundles
+"""
+
+import os
+import unittest
+import tempfile
+import numpy as np
+
+from Utilities.bundle import saveBundle, loadBundle, createBundle
+
+
+class TestBundle(unittest.TestCase):
+
+    def setUp(self):
+        fd, self.filename = tempfile.mkstemp(suffix='.bundle')
+        os.close(fd)
+
+    def tearDown(self):
+        os.unlink(self.filename)
+
+    def testRoundTrip(self):
+        """Arrays and attributes are loaded as they were saved"""
+        arrays = {'x': np.linspace(0., 1., 11),
+                  'cells': np.arange(12, dtype='i4').reshape((3, 4)).T,
+                  'land': np.array([True, False, True]),
+                  'empty': np.empty((0, 3)),
+                  'scalar': np.array(2.5)}
+        attributes = {'gridLimit': {'xMin': 100., 'xMax': 110.},
+                      'fields': ['mu', 'sig'], 'size': None}
+        saveBundle(self.filename, arrays, attributes)
+        result, resultAttributes = loadBundle(self.filename)
+        self.assertEqual(resultAttributes, attributes)
+        self.assertEqual(sorted(result), sorted(arrays))
+        for name, value in arrays.items():
+            self.assertEqual(result[name].dtype, value.dtype)
+            self.assertEqual(result[name].shape, value.shape)
+            self.assertTrue(np.all(result[name] == value))
+        self.assertTrue(isinstance(result['x'], np.memmap))
+        self.assertFalse(result['x'].flags.writeable)
+
+    def testCreate(self):
+        """Arrays created in place are loaded as they were filled"""
+        arrays = createBundle(self.filename,
+                              {'tile': ('f4', (4, 3, 2)),
+                               'count': ('i8', ())},
+                              {'files': ['a.nc', 'b.nc']})
+        self.assertTrue(np.all(arrays['tile'] == 0.))
+        expected = np.arange(24, dtype='f4').reshape((4, 3, 2))
+        for n in range(4):
+            arrays['tile'][n] = expected[n]
+        arrays['count'][...] = 4
+        for value in arrays.values():
+            value.flush()
+        del arrays
+
+        result, attributes = loadBundle(self.filename)
+        self.assertEqual(attributes, {'files': ['a.nc', 'b.nc']})
+        self.assertTrue(np.all(result['tile'] == expected))
+        self.assertEqual(result['count'], 4)
+
+    def testNotBundle(self):
+        """Loading a file that is not a bundle raises an IOError"""
+        with open(self.filename, 'w') as fh:
+            fh.write('CycloneNumber,Datetime\n')
+        self.assertRaises(IOError, loadBundle, self.filename)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -6,7 +6,7 @@ import unittest
 import numpy as np
 
 from numpy.testing import assert_almost_equal
-from hazard.evd import estimateEVD
+from hazard.evd import estimateEVD, estimateEVDArray, empiricalReturnLevels
 
 
 class TestEvd(unittest.TestCase):
@@ -45,6 +45,66 @@ class TestEvd(unittest.TestCase):
         assert_almost_equal(scale2, self.missingValue, decimal=5)
         assert_almost_equal(shp2, self.missingValue, decimal=5)
 
+    def testEVDArray(self):
+        """Array version gives the same results as estimateEVD"""
+        rng = np.random.RandomState(1)
+        V = rng.gumbel(30., 8., size=(200, 40))
+        V[rng.uniform(size=V.shape) < 0.3] = 0.
+        V[:, 0] = 0.
+        V[:, 1] = 0.
+        V[-5:, 1] = 25.
+        V[:150, 2] = 0.
+        V[:, 3] = 35. - np.exp(rng.uniform(0., 3., 200))
+        V.sort(axis=0)
+
+        w, loc, scale, shp = estimateEVDArray(V, self.years, -9999.,
+                                              minRecords=60, yrspersim=1)
+        self.assertEqual(w.shape, (6, 40))
+        for j in range(V.shape[1]):
+            w0, loc0, scale0, shp0 = estimateEVD(V[:, j], self.years,
+                                                 -9999., 60, 1)
+            assert_almost_equal(w[:, j], w0, decimal=5)
+            assert_almost_equal(loc[j], loc0, decimal=5)
+            assert_almost_equal(scale[j], scale0, decimal=5)
+            assert_almost_equal(shp[j], shp0, decimal=5)
+        self.assertTrue(np.all(w[:, :3] == -9999.))
+
+        w, loc, scale, shp = estimateEVDArray(self.v[:, None], self.years,
+                                              minRecords=3, yrspersim=10)
+        assert_almost_equal(w[:, 0], self.w0, decimal=5)
+        assert_almost_equal(shp, self.shp0, decimal=5)
+
+    def testEmpirical(self):
+        """Empirical return period values from order statistics"""
+        rng = np.random.RandomState(1)
+        V = rng.gumbel(30., 8., size=(99, 20))
+        V[:, 0] = 0.
+        expected = np.sort(V, axis=0)[::-1]
+        years = np.array([2., 10., 50., 100., 200.])
+
+        w = empiricalReturnLevels(V.copy(), years, -9999., 1, 'weibull')
+        self.assertEqual(w.shape, (5, 20))
+        # With the Weibull plotting position, the m-th largest of 99
+        # values has a return period of 100 / m years:
+        assert_almost_equal(w[:4], expected[[49, 9, 1, 0]])
+        self.assertTrue(np.all(w[4] == -9999.))
+        self.assertTrue(np.all(w[:4, 0] == 0.))
+
+        # Interpolated between order statistics:
+        w = empiricalReturnLevels(V.copy(), years, -9999., 2, 'gringorten')
+        rank = 2. / years * (99 + 1 - 0.88) + 0.44
+        for i in range(len(years)):
+            if rank[i] < 1. or rank[i] > 99.:
+                self.assertTrue(np.all(w[i] == -9999.))
+                continue
+            m = int(rank[i])
+            value = expected[m - 1] + (rank[i] - m) * (expected[m] -
+                                                      expected[m - 1])
+            assert_almost_equal(w[i], value)
+
+        self.assertRaises(ValueError, empiricalReturnLevels, V, years,
+                          -9999., 1, 'plotting')
+
 if __name__ == "__main__":
     suite = unittest.makeSuite(TestEvd, 'test')
     unittest.TextTestRunner().run(suite)
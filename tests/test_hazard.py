@@ -0,0 +1,462 @@
+"""
+Test the return period hazard calculations
+"""
+
+import os
+import shutil
+import unittest
+import tempfile
+import numpy as np
+from datetime import datetime, timedelta
+
+from numpy.testing import assert_almost_equal
+from scipy.stats import scoreatpercentile
+from netCDF4 import Dataset
+
+import hazard
+import wind
+from wind import gustFootprint
+from hazard.evd import estimateEVD, empiricalReturnLevels
+from Utilities.tcrandom import randomStream
+from Utilities.bundle import loadBundle
+from Utilities.config import ConfigParser
+from Utilities.parallel import attemptParallel
+from Utilities.track import ncSaveTracks, trackFileDtype
+
+
+class TestCalculate(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(1)
+        self.Vr = rng.gumbel(30., 8., size=(500, 6, 5)).astype('f')
+        self.Vr[rng.uniform(size=self.Vr.shape) < 0.3] = 0.
+        self.Vr[:, 0, 0] = 0.
+        self.years = np.array([10., 50., 100., 500.], 'f')
+        self.nodata = -9999.
+
+    def testCalculate(self):
+        """Fitting a tile gives the same result as fitting each point"""
+        Rp, loc, scale, shp = hazard.calculate(self.Vr.copy(), self.years,
+                                               self.nodata, 50, 1)
+        V = np.sort(self.Vr, axis=0)
+        for i in range(V.shape[1]):
+            for j in range(V.shape[2]):
+                if i == j == 0:
+                    continue
+                w, l, sc, sh = estimateEVD(V[:, i, j], self.years,
+                                           self.nodata, 50, 1)
+                assert_almost_equal(Rp[:, i, j], w, decimal=3)
+                assert_almost_equal(loc[i, j], l, decimal=4)
+                assert_almost_equal(scale[i, j], sc, decimal=4)
+                assert_almost_equal(shp[i, j], sh, decimal=4)
+
+        # Points without data are not fitted:
+        self.assertTrue(np.all(Rp[:, 0, 0] == 0.))
+        self.assertEqual(loc[0, 0], 0.)
+
+    def testCalculatePoints(self):
+        """Fitting selected points matches fitting the whole tile"""
+        points = np.zeros(self.Vr.shape[1:], dtype=bool)
+        points[::2, 1:] = True
+        points[0, 0] = True
+        Rp, loc, scale, shp = hazard.calculate(self.Vr.copy(), self.years,
+                                               self.nodata, 50, 1)
+        result = hazard.calculate(self.Vr.copy(), self.years, self.nodata,
+                                  50, 1, points)
+        for expected, value in zip((Rp, loc, scale, shp), result):
+            self.assertTrue(np.all(value[..., points] ==
+                                   expected[..., points]))
+            self.assertTrue(np.all(value[..., ~points] == 0.))
+
+    def testCalculateCI(self):
+        """Confidence ranges are reproducible and bracket the fit"""
+        Rp, loc, scale, shp = hazard.calculate(self.Vr.copy(), self.years,
+                                               self.nodata, 50, 1)
+        upper, lower = hazard.calculateCI(self.Vr, self.years, self.nodata,
+                                          50, 1, 50, 90, randomStream(1, 3))
+        upper2, lower2 = hazard.calculateCI(self.Vr, self.years,
+                                            self.nodata, 50, 1, 50, 90,
+                                            randomStream(1, 3))
+        self.assertTrue(np.all(upper == upper2))
+        self.assertTrue(np.all(lower == lower2))
+        self.assertEqual(upper.shape, Rp.shape)
+
+        self.assertTrue(np.all(upper[:, 0, 0] == self.nodata))
+        self.assertTrue(np.all(lower[:, 0, 0] == self.nodata))
+        valid = upper[:, 1:, 1:] != self.nodata
+        self.assertTrue(valid.all())
+        self.assertTrue(np.all(lower[:, 1:, 1:] < upper[:, 1:, 1:]))
+        self.assertTrue(np.all(lower[:, 1:, 1:] < Rp[:, 1:, 1:]))
+        self.assertTrue(np.all(Rp[:, 1:, 1:] < upper[:, 1:, 1:]))
+
+    def testCalculateCIFewRecords(self):
+        """No confidence range is calculated without enough records"""
+        upper, lower = hazard.calculateCI(self.Vr[:40], self.years,
+                                          self.nodata, 50, 1, 50, 90)
+        self.assertTrue(np.all(upper == self.nodata))
+        self.assertTrue(np.all(lower == self.nodata))
+
+    def testPercentiles(self):
+        """Percentiles leave out missing values"""
+        rng = np.random.RandomState(2)
+        w = rng.uniform(0., 50., size=(3, 17, 4))
+        w[rng.uniform(size=w.shape) < 0.3] = self.nodata
+        w[:, :, 0] = self.nodata
+        lower, upper = hazard._percentiles(w, [5., 95.], self.nodata)
+        self.assertTrue(np.all(lower[:, 0] == self.nodata))
+        for i in range(3):
+            for j in range(1, 4):
+                values = w[i, :, j][w[i, :, j] != self.nodata]
+                assert_almost_equal(lower[i, j],
+                                    scoreatpercentile(values, 5.))
+                assert_almost_equal(upper[i, j],
+                                    scoreatpercentile(values, 95.))
+
+
+class TestTileSize(unittest.TestCase):
+
+    def testMemory(self):
+        """Tiles are as large as the memory allows"""
+        memory = 512 * 1024 ** 2
+        for calcCI in (False, True):
+            xstep, ystep, peak = hazard.tileSize(1000, 800, 10000, memory,
+                                                 11, calcCI)
+            self.assertTrue(peak <= memory)
+            self.assertEqual(peak, hazard.tileMemory(xstep * ystep, 10000,
+                                                     11, calcCI))
+            larger = hazard.tileMemory((xstep + 1) * (ystep + 1), 10000,
+                                       11, calcCI)
+            self.assertTrue(larger > memory)
+
+        # More records give smaller tiles:
+        xstep2, ystep2, peak2 = hazard.tileSize(1000, 800, 40000, memory,
+                                                11, True)
+        self.assertTrue(xstep2 * ystep2 < xstep * ystep)
+
+    def testWorkers(self):
+        """Each worker has at least two tiles"""
+        xstep, ystep, peak = hazard.tileSize(50, 40, 1000, 1024 ** 3, 11)
+        self.assertEqual((xstep, ystep), (50, 40))
+        xstep, ystep, peak = hazard.tileSize(50, 40, 1000, 1024 ** 3, 11,
+                                             nworkers=7)
+        ntiles = -(-50 // xstep) * -(-40 // ystep)
+        self.assertTrue(ntiles >= 14)
+
+    def testOrder(self):
+        """Larger tiles come first"""
+        lon = np.arange(100., 110.01, 0.1)
+        lat = np.arange(-20., -10.01, 0.1)
+        tilegrid = hazard.TileGrid({'xMin': 100., 'xMax': 110.,
+                                    'yMin': -20., 'yMax': -10.},
+                                   lon, lat)
+        tilegrid.setTileSize(30, 40)
+        tiles = hazard.getTiles(tilegrid)
+        self.assertEqual(len(tiles), 12)
+        sizes = [(t[1] - t[0]) * (t[3] - t[2]) for t in tiles]
+        self.assertEqual(sizes, sorted(sizes, reverse=True))
+        self.assertEqual(sum(sizes), tilegrid.xdim * tilegrid.ydim)
+
+
+class TestWindfieldStore(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        self.inputPath = os.path.join(self.path, 'windfield')
+        os.mkdir(self.inputPath)
+        self.lon = np.arange(120., 130.01, 0.5)
+        self.lat = np.arange(-20., -11.99, 0.5)
+        rng = np.random.RandomState(1)
+        for n in range(7):
+            self.writeFile(n, rng.uniform(0., 60., (len(self.lat),
+                                                     len(self.lon))))
+        self.gridLimit = {'xMin': 121., 'xMax': 129.,
+                          'yMin': -19., 'yMax': -13.}
+        self.tilegrid = hazard.TileGrid(self.gridLimit, self.lon, self.lat,
+                                        xstep=5, ystep=4)
+        self.tiles = hazard.getTiles(self.tilegrid)
+        self.storeFile = os.path.join(self.path, 'windfield.bundle')
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def writeFile(self, n, data, footprint=False):
+        ncobj = Dataset(os.path.join(self.inputPath, 'gust-%03d.nc' % n), 'w')
+        ncobj.createDimension('lat', len(self.lat))
+        ncobj.createDimension('lon', len(self.lon))
+        vmax = ncobj.createVariable('vmax', 'f', ('lat', 'lon'))
+        vmax[:] = data
+        if footprint:
+            vmax.footprint = np.array(gustFootprint(data), dtype='i4')
+        ncobj.close()
+
+    def testTranspose(self):
+        """Tiles from the store match tiles read from the files"""
+        files = hazard.windfieldFiles(self.inputPath)
+        self.assertEqual(len(files), 7)
+        self.assertFalse(hazard.isStoreCurrent(self.storeFile, files,
+                                               self.tiles))
+        hazard.transposeWindfields(files, self.storeFile, self.tiles)
+        self.assertTrue(hazard.isStoreCurrent(self.storeFile, files,
+                                              self.tiles))
+
+        store, attributes = loadBundle(self.storeFile)
+        self.assertEqual(len(store), 2 * len(self.tiles))
+        for tile in self.tiles:
+            expected = hazard.loadFilesFromPath(self.inputPath, tile)
+            expected.sort(axis=0)
+            result = hazard.loadTile(store, tile)
+            self.assertEqual(result.dtype, expected.dtype)
+            self.assertTrue(np.all(result == expected))
+            self.assertTrue(np.all(store[hazard.countName(tile)] ==
+                                   (expected != 0).sum(axis=0)))
+
+        # The store is out of date if a file changes:
+        info = os.stat(files[2])
+        os.utime(files[2], (info.st_atime, info.st_mtime + 10))
+        self.assertFalse(hazard.isStoreCurrent(self.storeFile, files,
+                                               self.tiles))
+        self.assertFalse(hazard.isStoreCurrent(self.storeFile, files,
+                                               self.tiles[1:]))
+
+    def testFootprint(self):
+        """Files with a footprint give the same tiles as full files"""
+        rng = np.random.RandomState(2)
+        data = np.zeros((4, len(self.lat), len(self.lon)), dtype='f')
+        data[0, 2:5, 3:7] = rng.uniform(10., 60., (3, 4))
+        data[1, 10:, 15:] = rng.uniform(10., 60., (7, 6))
+        data[2, 1:14, 2:19] = rng.uniform(10., 60., (13, 17))
+        fullStore = os.path.join(self.path, 'full.bundle')
+        for footprint, storeFile in [(False, fullStore),
+                                     (True, self.storeFile)]:
+            for n in range(len(data)):
+                self.writeFile(n, data[n], footprint)
+            files = hazard.windfieldFiles(self.inputPath)
+            hazard.transposeWindfields(files[:len(data)], storeFile,
+                                       self.tiles)
+
+        values, window = hazard.loadWindow(files[0], (10, 21, 8, 17))
+        self.assertIsNone(window)
+        values, window = hazard.loadWindow(files[0], (0, 21, 0, 17))
+        self.assertEqual(window, (3, 7, 2, 5))
+        assert_almost_equal(values, data[0, 2:5, 3:7])
+
+        full, attributes = loadBundle(fullStore)
+        store, attributes = loadBundle(self.storeFile)
+        for tile in self.tiles:
+            for n, f in enumerate(files[:len(data)]):
+                result = hazard.loadFile(f, tile)
+                self.assertTrue(np.all(result == data[n, tile[2]:tile[3],
+                                                      tile[0]:tile[1]]))
+            self.assertTrue(np.all(hazard.loadTile(store, tile) ==
+                                   hazard.loadTile(full, tile)))
+
+    def calculator(self, store, method='gev'):
+        configFile = os.path.join(self.path, 'hazard.ini')
+        with open(configFile, 'w') as fh:
+            fh.write('[Output]\nPath = %s\n' % self.path)
+            fh.write('[Region]\ngridLimit = %r\n' % self.gridLimit)
+            fh.write('[Hazard]\nCalculateCI = False\n')
+        hc = hazard.HazardCalculator(configFile, self.tilegrid, 1, 3, 1,
+                                     store=store)
+        # The configuration is only read once, so set these directly:
+        hc.method = method
+        hc.outputPath = os.path.join(self.path, 'hazard')
+        return hc
+
+    def testIncremental(self):
+        """Adding files gives the same store and hazard as starting
+        again"""
+        hazard.pp = attemptParallel()
+        files = hazard.windfieldFiles(self.inputPath)
+        hazard.transposeWindfields(files, self.storeFile, self.tiles)
+        store, attributes = loadBundle(self.storeFile)
+        hc = self.calculator(store)
+        hc.dumpHazardFromTiles(self.tiles)
+        cacheFile = os.path.join(self.path, 'hazard.bundle')
+        hc.saveCache(cacheFile, self.tiles, attributes['signature'])
+
+        # New files with wind only in part of the domain:
+        data = np.zeros((len(self.lat), len(self.lon)))
+        data[2:6, 3:9] = 45.
+        self.writeFile(7, data)
+        self.writeFile(8, data * 0.9)
+        files = hazard.windfieldFiles(self.inputPath)
+        self.assertEqual(len(files), 9)
+
+        previous = hazard.previousStore(self.storeFile, files, self.tiles)
+        self.assertEqual(previous[1], files[:7])
+        hazard.transposeWindfields(files, self.storeFile, self.tiles,
+                                   previous)
+        store, attributes = loadBundle(self.storeFile)
+        hc = self.calculator(store)
+        hc.loadCache(cacheFile, attributes['signature'])
+        self.assertTrue(hc.cache is not None)
+        self.assertFalse(hc.cacheExact)
+        hc.dumpHazardFromTiles(self.tiles)
+
+        fullFile = os.path.join(self.path, 'full.bundle')
+        hazard.transposeWindfields(files, fullFile, self.tiles)
+        full, fullAttributes = loadBundle(fullFile)
+        self.assertEqual(fullAttributes, attributes)
+        for name in full:
+            self.assertTrue(np.all(full[name] == store[name]))
+        expected = self.calculator(full)
+        expected.dumpHazardFromTiles(self.tiles)
+        for name in ('Rp', 'loc', 'scale', 'shp'):
+            self.assertTrue(np.all(getattr(hc, name) ==
+                                   getattr(expected, name)))
+        self.assertTrue(np.any(hc.loc != 0.))
+
+        # Without new files, the results are reused:
+        hc.saveCache(cacheFile, self.tiles, attributes['signature'])
+        reused = self.calculator(store)
+        reused.loadCache(cacheFile, attributes['signature'])
+        self.assertTrue(reused.cacheExact)
+        reused.dumpHazardFromTiles(self.tiles)
+        self.assertTrue(np.all(reused.Rp == expected.Rp))
+
+        # Changing a file means starting again:
+        info = os.stat(files[2])
+        os.utime(files[2], (info.st_atime, info.st_mtime + 10))
+        self.assertTrue(hazard.previousStore(self.storeFile, files,
+                                             self.tiles) is None)
+
+    def testRetile(self):
+        """A store can be extended with different tiles"""
+        files = hazard.windfieldFiles(self.inputPath)
+        hazard.transposeWindfields(files[:4], self.storeFile, self.tiles)
+        self.tilegrid.setTileSize(3, 5)
+        tiles = hazard.getTiles(self.tilegrid)
+        self.assertNotEqual(sorted(tiles), sorted(self.tiles))
+
+        previous = hazard.previousStore(self.storeFile, files, tiles)
+        self.assertEqual(previous[1], files[:4])
+        self.assertEqual(previous[2], self.tiles)
+        hazard.transposeWindfields(files, self.storeFile, tiles, previous)
+        store, attributes = loadBundle(self.storeFile)
+        fullFile = os.path.join(self.path, 'full.bundle')
+        hazard.transposeWindfields(files, fullFile, tiles)
+        full, fullAttributes = loadBundle(fullFile)
+        self.assertEqual(sorted(full), sorted(store))
+        for name in full:
+            self.assertTrue(np.all(full[name] == store[name]))
+
+    def testEmpirical(self):
+        """Empirical return period values are saved in the same form"""
+        hazard.pp = attemptParallel()
+        files = hazard.windfieldFiles(self.inputPath)
+        hazard.transposeWindfields(files, self.storeFile, self.tiles)
+        store, attributes = loadBundle(self.storeFile)
+        hc = self.calculator(store, 'empirical')
+        hc.dumpHazardFromTiles(self.tiles)
+        for tile in self.tiles:
+            xmin, xmax, ymin, ymax = tile
+            Vr = hazard.loadFilesFromPath(self.inputPath, tile)
+            expected = empiricalReturnLevels(Vr, hc.years, hc.nodata)
+            result = hc.Rp[:, ymin - self.tilegrid.jmin:
+                           ymax - self.tilegrid.jmin,
+                           xmin - self.tilegrid.imin:
+                           xmax - self.tilegrid.imin]
+            assert_almost_equal(result, expected, decimal=4)
+        self.assertTrue(np.all(hc.Rp[0] > 0.))
+        self.assertTrue(np.all(hc.Rp[-1] == hc.nodata))
+        self.assertTrue(np.all(hc.loc == hc.nodata))
+
+        os.mkdir(hc.outputPath)
+        hc.saveHazard()
+        ncobj = Dataset(os.path.join(hc.outputPath, 'hazard.nc'))
+        for name in ('wspd', 'loc', 'scale', 'shp', 'wspdupper'):
+            self.assertTrue(name in ncobj.variables)
+        assert_almost_equal(ncobj.variables['wspd'][:], hc.Rp)
+        ncobj.close()
+
+
+class TestRun(unittest.TestCase):
+
+    def setUp(self):
+        self.path = tempfile.mkdtemp()
+        for name in ('tracks', 'windfield', 'process', 'hazard'):
+            os.mkdir(os.path.join(self.path, name))
+        self.configFile = os.path.join(self.path, 'tcrm.ini')
+        with open(self.configFile, 'w') as fh:
+            fh.write('[Output]\nPath = %s\n' % self.path)
+            fh.write('[Region]\ngridLimit = {"xMin": 148., "xMax": 153., '
+                     '"yMin": -18., "yMax": -13.}\n')
+            fh.write('[WindfieldInterface]\nMargin = 1\n'
+                     'Resolution = 0.2\n')
+            fh.write('[TrackGenerator]\nNumSimulations = 4\n'
+                     'YearsPerSimulation = 1\n')
+            fh.write('[Hazard]\nYears = 2,5\nMinimumRecords = 3\n'
+                     'CalculateCI = False\nIncremental = True\n'
+                     'Method = GEV\n')
+        # The configuration is only read once, so read this file:
+        ConfigParser().readonce = False
+        ConfigParser().read(self.configFile)
+        hazard.pp = attemptParallel()
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def writeTracks(self, n):
+        rng = np.random.RandomState(n)
+        start = datetime(2000, 1, 1)
+        rows = []
+        lon, lat = rng.uniform(149., 152.), rng.uniform(-17., -14.)
+        for i in range(4):
+            rows.append((1, start + timedelta(hours=i), i, lon - 0.1 * i,
+                         lat - 0.1 * i, 15., 225.,
+                         rng.uniform(940., 980.), 1008., 30.))
+        ncSaveTracks(os.path.join(self.path, 'tracks',
+                                  'tracks.%05d.nc' % n),
+                     np.array(rows, dtype=trackFileDtype))
+
+    def runStages(self):
+        wind.run(self.configFile, lambda i, n: None)
+        hazard.run(self.configFile)
+        ncobj = Dataset(os.path.join(self.path, 'hazard', 'hazard.nc'))
+        try:
+            return ncobj.variables['wspd'][:]
+        finally:
+            ncobj.close()
+
+    def testExtend(self):
+        """Adding simulations to a run only calculates the new wind
+        fields and extends the store"""
+        for n in range(4):
+            self.writeTracks(n)
+        self.runStages()
+        gustFiles = hazard.windfieldFiles(os.path.join(self.path,
+                                                       'windfield'))
+        mtimes = [os.stat(f).st_mtime for f in gustFiles]
+
+        for n in range(4, 6):
+            self.writeTracks(n)
+        ConfigParser().set('TrackGenerator', 'NumSimulations', '6')
+        transpose = hazard.transposeWindfields
+        calls = []
+
+        def record(files, storeFile, tiles, previous=None):
+            calls.append(previous)
+            transpose(files, storeFile, tiles, previous)
+
+        hazard.transposeWindfields = record
+        try:
+            extended = self.runStages()
+        finally:
+            hazard.transposeWindfields = transpose
+
+        # The earlier gust files are unchanged, and the store is
+        # extended rather than written again:
+        self.assertEqual([os.stat(f).st_mtime for f in gustFiles], mtimes)
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(len(calls[0][1]), 4)
+
+        # The results match a run from the start:
+        for name in (hazard.WINDFIELD_STORE, hazard.HAZARD_CACHE):
+            os.remove(os.path.join(self.path, 'process', name))
+        self.assertTrue(np.all(self.runStages() == extended))
+        self.assertTrue(np.any(extended > 0))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -78,6 +78,32 @@ class Testlmoments(NumpyTestCase.NumpyTestCase):
         params = lmom.pelgev(xmom)
         self.numpyAssertAlmostEqual(params,self.params)
 
+    def test_samlmu3Array(self):
+        """Test samlmu3Array returns same values as samlmu3"""
+        rng = numpy.random.RandomState(1)
+        X = numpy.sort(rng.gumbel(30., 8., size=(101, 5)), axis=0)
+        mask = rng.uniform(size=X.shape) > 0.2
+        L1, L2, T3 = lmom.samlmu3Array(X, mask)
+        for j in range(X.shape[1]):
+            moments = lmom.samlmu3(X[mask[:, j], j])
+            self.numpyAssertAlmostEqual(numpy.array([L1[j], L2[j], T3[j]]),
+                                        moments)
+        moments = lmom.samlmu3Array(self.values[:, numpy.newaxis])
+        self.numpyAssertAlmostEqual(numpy.ravel(moments),
+                                    self.moments[0:3])
+
+    def test_pelgevArray(self):
+        """Test pelgevArray returns same values as pelgev"""
+        T3 = numpy.array([-0.99, -0.9, -0.5, 0.0, 0.1, 0.2, 0.5, 0.9,
+                          0.16993, 1.2])
+        L1 = numpy.linspace(20., 50., len(T3))
+        L2 = numpy.linspace(2., 10., len(T3))
+        loc, scale, shp = lmom.pelgevArray(L1, L2, T3)
+        for j in range(len(T3)):
+            params = lmom.pelgev([L1[j], L2[j], T3[j]])
+            self.numpyAssertAlmostEqual(numpy.array([loc[j], scale[j],
+                                                     shp[j]]), params)
+
 if __name__ == "__main__":
     flStartLog('', 'CRITICAL', False)
     testSuite = unittest.makeSuite(Testlmoments,'test')
@@ -42,6 +42,7 @@ except:
 unittest_dir = pathLocate.getUnitTestDirectory()
 sys.path.append(pathLocate.getRootDirectory())
 from Utilities import maputils
+from Utilities import Cmap
 from Utilities.files import flStartLog
 
 class TestMapUtils(NumpyTestCase.NumpyTestCase):
@@ -125,6 +126,22 @@ class TestMapUtils(NumpyTestCase.NumpyTestCase):
         bear = maputils.gridLatLonBear(cLon, cLat, lonArray, latArray)
         self.numpyAssertAlmostEqual(bear, expected)
 
+    def test_Bear2LatLonArray(self):
+        """Test array bear2LatLon against the scalar versions"""
+        bearing = numpy.random.uniform(0., 360., 100)
+        dist = numpy.random.uniform(0., 500., 100)
+        lon = numpy.random.uniform(100., 180., 100)
+        lat = numpy.random.uniform(-40., 0., 100)
+        nlon, nlat = maputils.bear2LatLonArray(bearing, dist, lon, lat)
+        for k in range(100):
+            expected = Cmap.bear2LatLon(bearing[k], dist[k], lon[k], lat[k])
+            self.assertAlmostEqual(nlon[k], expected[0], places=10)
+            self.assertAlmostEqual(nlat[k], expected[1], places=10)
+            expected = maputils.bear2LatLon(bearing[k], dist[k], lon[k],
+                                            lat[k])
+            self.assertAlmostEqual(nlon[k], expected[0], places=5)
+            self.assertAlmostEqual(nlat[k], expected[1], places=5)
+
     def test_Bearing(self):
         """Test conversion from bearing to theta and back again"""
         for th in self.theta:
@@ -15,6 +15,7 @@ import unittest
 import NumpyTestCase
 import numpy as np
 import netCDF4
+from numpy.testing import assert_almost_equal
 from datetime import datetime, timedelta
 
 try:
@@ -276,6 +277,30 @@ class TestNetCDF(NumpyTestCase.NumpyTestCase):
                            self.dimensions,
                            self.nullvalue_var)
 
+    def test_ncSaveGridPacked(self):
+        """Test ncSaveGrid packs variables to integers and unpacks on read"""
+        values = np.linspace(-150., 150., 72).reshape((6, 12))
+        values[0, 0] = np.nan
+        dimensions = {0: self.dimensions[2], 1: self.dimensions[3]}
+        variables = {0: {'name': 'speed',
+                         'dims': ('lat', 'lon'),
+                         'values': values,
+                         'dtype': 'i2',
+                         'scale_factor': 0.01,
+                         'add_offset': 0.,
+                         'atts': {'units': 'm/s',
+                                  'valid_range': (-200., 200.)}}}
+        nctools.ncSaveGrid(self.ncfile, dimensions, variables)
+
+        ncobj = Dataset(self.ncfile)
+        var = ncobj.variables['speed']
+        self.assertEqual(var.dtype, np.int16)
+        assert_almost_equal(var.valid_range, [-20000, 20000])
+        data = var[:]
+        self.assertTrue(data.mask[0, 0])
+        assert_almost_equal(data[1:], values[1:], decimal=2)
+        ncobj.close()
+
 
 class TestNCReading(NumpyTestCase.NumpyTestCase):
 
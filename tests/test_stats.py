@@ -41,7 +41,9 @@ except:
 # Add parent folder to python path
 unittest_dir = pathLocate.getUnitTestDirectory()
 sys.path.append(pathLocate.getRootDirectory())
+import numpy
 import Utilities.stats as statutils
+import Utilities.Cstats as Cstats
 from Utilities.files import flStartLog
 
 
@@ -107,6 +109,55 @@ class Teststatutils(NumpyTestCase.NumpyTestCase):
             result = statutils.validCellNum(cell, self.gridLimit, self.gridSpace)
             self.assertEqual(result, valid)
 
+    def test_GetCellNumArray(self):
+        """Testing getCellNumArray against getCellNum"""
+        lon = numpy.random.uniform(60., 190., 500)
+        lat = numpy.random.uniform(-50., 10., 500)
+        unitLimit = {'xMin':70., 'xMax':180., 'yMin':-40., 'yMax':0.}
+        unitSpace = {'x':1., 'y':1.}
+        for gridLimit, gridSpace in ((self.gridLimit, self.gridSpace),
+                                     (unitLimit, unitSpace)):
+            cells = statutils.getCellNumArray(lon, lat, gridLimit, gridSpace)
+            for x, y, cell in zip(lon, lat, cells):
+                if cell < 0:
+                    self.assertRaises(ValueError, statutils.getCellNum, x, y,
+                                      gridLimit, gridSpace)
+                else:
+                    expected = statutils.getCellNum(x, y, gridLimit,
+                                                    gridSpace)
+                    self.assertEqual(cell, expected)
+
+        # The C version used by the track generator agrees for unit
+        # grid spacing:
+        cells = statutils.getCellNumArray(lon, lat, unitLimit, unitSpace)
+        for x, y, cell in zip(lon, lat, cells):
+            if cell >= 0:
+                self.assertEqual(cell, Cstats.getCellNum(x, y, unitLimit,
+                                                         unitSpace))
+
+    def test_GetCellLonLatArray(self):
+        """Testing getCellLonLatArray against getCellLonLat"""
+        cells = numpy.arange(176)
+        lon, lat = statutils.getCellLonLatArray(cells, self.gridLimit,
+                                                self.gridSpace)
+        for cell, x, y in zip(cells, lon, lat):
+            expected = statutils.getCellLonLat(cell, self.gridLimit,
+                                               self.gridSpace)
+            self.assertEqual((x, y), expected)
+        for cell in (-10, 176, 2000):
+            self.assertRaises(IndexError, statutils.getCellLonLatArray,
+                              [0, cell], self.gridLimit, self.gridSpace)
+
+    def test_ValidCellNumArray(self):
+        """Testing validCellNumArray against validCellNum"""
+        cells = numpy.array([-10, 0, 100, 175, 176, 2000])
+        result = statutils.validCellNumArray(cells, self.gridLimit,
+                                             self.gridSpace)
+        for cell, valid in zip(cells, result):
+            expected = statutils.validCellNum(cell, self.gridLimit,
+                                              self.gridSpace)
+            self.assertEqual(valid, expected)
+
     def test_MaxCellNum(self):
         """Testing maxCellNum"""
         maxCellNum = 175
@@ -8,7 +8,7 @@ import unittest
 import numpy as np
 
 from numpy.testing import assert_almost_equal
-from Utilities.tcrandom import Random
+from Utilities.tcrandom import Random, randomStream
 
 class TestRandom(unittest.TestCase):
 
@@ -35,6 +35,26 @@ class TestRandom(unittest.TestCase):
         self.prng.seed(self.seed)
         result = self.prng.cauchyvariate(0, 1)
         assert_almost_equal(result, -2.22660116)
+
+class TestRandomStream(unittest.TestCase):
+
+    def testReproducible(self):
+        """Streams depend only on the seed and index"""
+        first = randomStream(1, 3).logistic(size=10)
+        randomStream(1, 2).logistic(size=1000)
+        second = randomStream(1, 3).logistic(size=10)
+        assert_almost_equal(first, second)
+
+    def testIndependent(self):
+        """Streams with different indices or seeds differ"""
+        values = [randomStream(1, 0).uniform(size=10),
+                  randomStream(1, 1).uniform(size=10),
+                  randomStream(2, 0).uniform(size=10),
+                  randomStream(1).uniform(size=10)]
+        for i in range(len(values)):
+            for j in range(i + 1, len(values)):
+                self.assertFalse(np.allclose(values[i], values[j]))
+
         
 if __name__ == '__main__':
     unittest.main()
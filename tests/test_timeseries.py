@@ -0,0 +1,51 @@
+"""
+Test the sparse station records used for time series extraction
+"""
+
+import unittest
+import numpy as np
+
+from numpy.testing import assert_almost_equal
+from Utilities.timeseries import Station, STEP_NAMES, STEP_TYPES
+
+
+class TestStation(unittest.TestCase):
+
+    def setUp(self):
+        self.station = Station('1', 150.0, -20.0)
+        times = ['2000-01-01 0%d:00' % i for i in range(5)]
+        self.steps = np.array(zip(times, [1010., 1009., 1008., 1007., 1006.]),
+                              dtype={'names': STEP_NAMES,
+                                     'formats': STEP_TYPES})
+
+        # Station only inside the grid for steps 2 and 3:
+        self.station.data.append((2, times[2], 20., 10., -5., 30., 990.))
+        self.station.data.append((3, times[3], 25., 12., -6., 35., 985.))
+
+    def testSparseStorage(self):
+        """Only in-footprint samples are stored"""
+        self.assertEqual(len(self.station.data), 2)
+        assert_almost_equal(self.station.Speed, [20., 25.])
+
+    def testSeries(self):
+        """Dense series is reconstructed with fill values"""
+        dense = self.station.series(self.steps)
+        self.assertEqual(len(dense), 5)
+        assert_almost_equal(dense['Speed'], [0., 0., 20., 25., 0.])
+        assert_almost_equal(dense['Bearing'], [0., 0., 30., 35., 0.])
+        assert_almost_equal(dense['Pressure'],
+                            [1010., 1009., 990., 985., 1006.])
+        self.assertEqual(list(dense['Time']), list(self.steps['Time']))
+        self.assertTrue(np.all(dense['Station'] == '1'))
+        assert_almost_equal(dense['Longitude'], 150.0)
+        assert_almost_equal(dense['Latitude'], -20.0)
+
+    def testEmptySeries(self):
+        """A station never inside the grid gives only fill values"""
+        station = Station('2', 100.0, 0.0)
+        dense = station.series(self.steps)
+        assert_almost_equal(dense['Speed'], np.zeros(5))
+        assert_almost_equal(dense['Pressure'], self.steps['Pressure'])
+
+if __name__ == "__main__":
+    unittest.main()
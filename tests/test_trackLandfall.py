@@ -0,0 +1,60 @@
+"""
+Test the rasterised land lookup used for landfall decay
+"""
+
+import unittest
+import numpy as np
+
+from Utilities.grid import SampleGrid
+from TrackGenerator.trackLandfall import LandRaster
+
+
+class MaskGrid(SampleGrid):
+    """A land-sea mask with land where `land(lon, lat)` is True"""
+
+    def __init__(self, land):
+        self.lon = np.arange(100., 170.01, 0.5)
+        self.lat = np.arange(-40., 0.01, 0.5)
+        lon, lat = np.meshgrid(self.lon, self.lat)
+        self.grid = land(lon, lat).astype(float)
+
+
+class TestLandRaster(unittest.TestCase):
+
+    def setUp(self):
+        self.gridLimit = {'xMin': 120., 'xMax': 160.,
+                          'yMin': -30., 'yMax': -5.}
+        rng = np.random.RandomState(1)
+        self.lon = rng.uniform(120., 160., 2000)
+        self.lat = rng.uniform(-30., -5., 2000)
+
+    def testMatchesSampleGrid(self):
+        """The raster gives the same result as sampling the mask"""
+        mask = MaskGrid(lambda lon, lat: (np.sin(lon / 3.) +
+                                          np.cos(lat / 2.)) > 0.5)
+        raster = LandRaster(mask, self.gridLimit)
+        expected = mask.sampleGrid(self.lon, self.lat) > 0.0
+        result = raster.onLand(self.lon, self.lat)
+        self.assertEqual(result.dtype, bool)
+        self.assertTrue(np.all(result == expected))
+        self.assertTrue(raster.onLand(150.2, -10.1) ==
+                        (mask.sampleGrid(150.2, -10.1) > 0.0))
+
+    def testCoarseRaster(self):
+        """A coarser raster agrees with the mask away from the coast"""
+        mask = MaskGrid(lambda lon, lat: lon > 150.)
+        raster = LandRaster(mask, self.gridLimit, resolution=1.0)
+        expected = mask.sampleGrid(self.lon, self.lat) > 0.0
+        result = raster.onLand(self.lon, self.lat)
+        far = np.abs(self.lon - 150.) > 1.
+        self.assertTrue(np.all(result[far] == expected[far]))
+
+    def testNoLand(self):
+        """A domain without land has no land points"""
+        mask = MaskGrid(lambda lon, lat: lon > 165.)
+        raster = LandRaster(mask, self.gridLimit)
+        self.assertFalse(raster.onLand(self.lon, self.lat).any())
+
+
+if __name__ == "__main__":
+    unittest.main()
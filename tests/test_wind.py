@@ -0,0 +1,264 @@
+"""
+Test loading of track data for the wind field calculations
+"""
+
+import os
+import time
+import shutil
+import unittest
+import tempfile
+import numpy as np
+from datetime import datetime, timedelta
+from numpy.testing import assert_almost_equal
+
+import wind
+from netCDF4 import Dataset
+from Utilities.config import ConfigParser
+from Utilities.nctools import NC_LOCK
+from Utilities.track import ncSaveTracks, trackFileDtype
+from Utilities.writer import BackgroundWriter
+
+
+class TestTrackDataFromFields(unittest.TestCase):
+
+    def setUp(self):
+        n = 5
+        start = datetime(2000, 1, 1)
+        self.data = np.empty(n, dtype={'names': wind.TRACKFILE_COLS,
+                                       'formats': wind.TRACKFILE_FMTS})
+        self.data['CycloneNumber'] = 1
+        self.data['Datetime'] = [start + timedelta(hours=i) for i in range(n)]
+        self.data['TimeElapsed'] = np.arange(n)
+        self.data['Longitude'] = np.linspace(150., 151., n)
+        self.data['Latitude'] = np.linspace(-15., -16., n)
+        self.data['Speed'] = np.linspace(10., 20., n)
+        self.data['Bearing'] = np.linspace(180., 230., n)
+        self.data['CentralPressure'] = np.linspace(990., 950., n)
+        self.data['EnvPressure'] = 1008.
+        self.data['rMax'] = 30.
+
+        fd, self.trackfile = tempfile.mkstemp(prefix='tracks', suffix='.csv')
+        with os.fdopen(fd, 'w') as fp:
+            fp.write('%' + ','.join(wind.TRACKFILE_COLS) + '\n')
+            for row in self.data:
+                fp.write('%i,%s,%7.3f,%8.3f,%8.3f,%6.2f,%6.2f,%7.2f,%7.2f,'
+                         '%6.2f\n' % (row['CycloneNumber'],
+                                      row['Datetime'].astype(
+                                          datetime).strftime(
+                                              wind.DATEFORMAT),
+                                      row['TimeElapsed'], row['Longitude'],
+                                      row['Latitude'], row['Speed'],
+                                      row['Bearing'], row['CentralPressure'],
+                                      row['EnvPressure'], row['rMax']))
+
+    def tearDown(self):
+        os.unlink(self.trackfile)
+
+    def testMatchesFile(self):
+        """Converted arrays match the data read from a track file"""
+        fromfile = wind.readTrackData(self.trackfile)
+        frommem = wind.trackDataFromFields(self.data)
+        self.assertEqual(fromfile.dtype, frommem.dtype)
+        for col in ['TimeElapsed', 'Longitude', 'Latitude', 'Speed',
+                    'Bearing', 'CentralPressure', 'EnvPressure', 'rMax']:
+            assert_almost_equal(fromfile[col], frommem[col], decimal=2)
+        self.assertEqual(list(fromfile['Datetime']),
+                         list(frommem['Datetime']))
+
+    def testNetCDFFile(self):
+        """A netCDF track file reads back the same as the .csv file"""
+        tracks = self.data.copy()
+        tracks['CycloneNumber'][3:] = 2
+        fd, ncfile = tempfile.mkstemp(prefix='tracks', suffix='.nc')
+        os.close(fd)
+        try:
+            ncSaveTracks(ncfile, tracks)
+            fromnc = wind.readTrackData(ncfile)
+            datas = wind.readMultipleTrackData(ncfile)
+        finally:
+            os.unlink(ncfile)
+        fromcsv = wind.readTrackData(self.trackfile)
+        self.assertEqual(fromnc.dtype, fromcsv.dtype)
+        self.assertEqual(list(fromnc['CycloneNumber']), [1, 1, 1, 2, 2])
+        for col in ['TimeElapsed', 'Longitude', 'Latitude', 'Speed',
+                    'Bearing', 'CentralPressure', 'EnvPressure', 'rMax']:
+            assert_almost_equal(fromnc[col], fromcsv[col], decimal=2)
+        self.assertEqual(list(fromnc['Datetime']),
+                         list(fromcsv['Datetime']))
+        self.assertEqual([len(data) for data in datas], [3, 2])
+
+    def testAppendNetCDFFile(self):
+        """Tracks can be added to a netCDF track file in batches"""
+        tracks = self.data.copy()
+        tracks['CycloneNumber'][3:] = 2
+        fd, ncfile = tempfile.mkstemp(prefix='tracks', suffix='.nc')
+        os.close(fd)
+        try:
+            ncSaveTracks(ncfile, tracks[:0])
+            ncSaveTracks(ncfile, tracks[:3], append=True)
+            ncSaveTracks(ncfile, tracks[3:], append=True)
+            datas = wind.readMultipleTrackData(ncfile)
+        finally:
+            os.unlink(ncfile)
+        self.assertEqual([len(data) for data in datas], [3, 2])
+        assert_almost_equal(datas[1]['Longitude'],
+                            self.data['Longitude'][3:])
+
+    def testEmptyNetCDFFile(self):
+        """A netCDF track file can hold no tracks"""
+        fd, ncfile = tempfile.mkstemp(prefix='tracks', suffix='.nc')
+        os.close(fd)
+        try:
+            ncSaveTracks(ncfile, np.array([]))
+            data = wind.readTrackData(ncfile)
+        finally:
+            os.unlink(ncfile)
+        self.assertEqual(len(data), 0)
+        self.assertEqual(data.dtype.names, wind.TRACKFILE_COLS)
+
+    def testNetCDFLock(self):
+        """Background netCDF writes wait for the netCDF lock"""
+        fd, ncfile = tempfile.mkstemp(prefix='tracks', suffix='.nc')
+        os.close(fd)
+        writer = BackgroundWriter()
+        try:
+            with NC_LOCK:
+                writer.submit(ncSaveTracks, ncfile, self.data)
+                time.sleep(0.1)
+                self.assertEqual(os.path.getsize(ncfile), 0)
+            writer.flush()
+            data = wind.readTrackData(ncfile)
+        finally:
+            writer.close()
+            os.unlink(ncfile)
+        self.assertEqual(len(data), len(self.data))
+
+    def testLoadTracksFromArrays(self):
+        """Tracks built from arrays carry the label and track id"""
+        datas = [wind.trackDataFromFields(self.data)] * 2
+        tracks = wind.loadTracksFromArrays(datas, 'tracks.interp.csv')
+        self.assertEqual(len(tracks), 2)
+        self.assertEqual(tracks[1].trackId, (1, 2))
+        self.assertEqual(tracks[0].trackfile, 'tracks.interp.csv')
+
+
+class TestGustsFromBatches(unittest.TestCase):
+
+    def setUp(self):
+        rows = []
+        start = datetime(2000, 1, 1)
+        for number, lon in [(3, 150.), (4, 151.), (6, 149.5)]:
+            for i in range(4):
+                rows.append((number, start + timedelta(hours=i), i,
+                             lon - 0.1 * i, -15. - 0.1 * i, 15., 225.,
+                             950. + number, 1008., 30.))
+        self.tracks = np.array(rows, dtype=trackFileDtype)
+        self.path = tempfile.mkdtemp()
+        self.trackfile = os.path.join(self.path, 'tracks.00001.nc')
+        ncSaveTracks(self.trackfile, self.tracks)
+
+    def tearDown(self):
+        shutil.rmtree(self.path)
+
+    def generator(self):
+        gridLimit = {'xMin': 147., 'xMax': 153., 'yMin': -18., 'yMax': -13.}
+        return wind.WindfieldGenerator(ConfigParser(), margin=1.,
+                                       resolution=0.1,
+                                       profileType='holland',
+                                       windFieldType='kepert',
+                                       gridLimit=gridLimit)
+
+    def readGust(self, path):
+        ncobj = Dataset(os.path.join(path, 'gust.00001.nc'))
+        try:
+            return ncobj.variables['vmax'][:], ncobj.variables['slp'][:]
+        finally:
+            ncobj.close()
+
+    def readFootprint(self, path):
+        ncobj = Dataset(os.path.join(path, 'gust.00001.nc'))
+        try:
+            return tuple(ncobj.variables['vmax'].footprint)
+        finally:
+            ncobj.close()
+
+    def testMatchesTrackFile(self):
+        """Gusts from batches in memory match gusts from the track file"""
+        fromfile = os.path.join(self.path, 'file')
+        frommem = os.path.join(self.path, 'mem')
+        os.mkdir(fromfile)
+        os.mkdir(frommem)
+        self.generator().dumpGustsFromTracks(wind.loadTracks(self.trackfile),
+                                             fromfile, None)
+        batches = [self.tracks[:5], self.tracks[5:5], self.tracks[5:]]
+        self.generator().dumpGustsFromBatches(batches, self.trackfile,
+                                              frommem)
+        wind.getWriter().flush()
+        for expected, result in zip(self.readGust(fromfile),
+                                    self.readGust(frommem)):
+            assert_almost_equal(result, expected, decimal=4)
+
+        # The footprint holds all the non-zero gusts:
+        gust, slp = self.readGust(frommem)
+        xmin, xmax, ymin, ymax = self.readFootprint(frommem)
+        self.assertTrue(np.any(gust[ymin:ymax, xmin:xmax] != 0))
+        self.assertTrue(np.all(gust[:ymin] == 0))
+        self.assertTrue(np.all(gust[ymax:] == 0))
+        self.assertTrue(np.all(gust[:, :xmin] == 0))
+        self.assertTrue(np.all(gust[:, xmax:] == 0))
+
+    def testNoTracks(self):
+        """A simulation without tracks has no gusts"""
+        self.generator().dumpGustsFromBatches([np.array([])],
+                                              self.trackfile, self.path)
+        wind.getWriter().flush()
+        gust, slp = self.readGust(self.path)
+        self.assertTrue(np.all(gust == 0.))
+        self.assertEqual(self.readFootprint(self.path), (0, 0, 0, 0))
+
+
+class TestNestedWindField(unittest.TestCase):
+
+    def setUp(self):
+        n = 3
+        start = datetime(2000, 1, 1)
+        data = np.empty(n, dtype={'names': wind.TRACKFILE_COLS,
+                                  'formats': wind.TRACKFILE_FMTS})
+        data['CycloneNumber'] = 1
+        data['Datetime'] = [start + timedelta(hours=i) for i in range(n)]
+        data['TimeElapsed'] = np.arange(n)
+        data['Longitude'] = [150., 149.9, 149.8]
+        data['Latitude'] = [-15., -15.1, -15.2]
+        data['Speed'] = 15.
+        data['Bearing'] = 225.
+        data['CentralPressure'] = 950.
+        data['EnvPressure'] = 1008.
+        data['rMax'] = 30.
+        self.track = wind.Track(wind.trackDataFromFields(data))
+
+    def testUpsample(self):
+        """Bilinear upsampling reproduces a linear field"""
+        yy, xx = np.mgrid[0:11, 0:13]
+        field = 2. * xx - 3. * yy + 1.
+        iy = wind._coarseIndices(11, 3)
+        ix = wind._coarseIndices(13, 3)
+        self.assertEqual(list(iy), [0, 3, 6, 9, 10])
+        result = wind._upsample(field[iy][:, ix], iy, ix, 11, 13)
+        assert_almost_equal(result, field)
+
+    def testNestedMatchesUniform(self):
+        """Nested grids agree with the uniform grid"""
+        uniform = wind.WindfieldAroundTrack(self.track, margin=3.)
+        nested = wind.WindfieldAroundTrack(self.track, margin=3.,
+                                           nestFactor=3, nestRadius=4.)
+        for i in range(len(self.track.data)):
+            Ux, Vy, P = uniform.localWindField(i)
+            Uxn, Vyn, Pn = nested.localWindField(i)
+            self.assertEqual(Uxn.shape, Ux.shape)
+            self.assertTrue(np.abs(Uxn - Ux).max() < 0.5)
+            self.assertTrue(np.abs(Vyn - Vy).max() < 0.5)
+            self.assertTrue(np.abs(Pn - P).max() < 20.)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,75 @@
+"""
+Test the background writer
+"""
+
+import time
+import threading
+import unittest
+
+from Utilities.writer import BackgroundWriter
+
+
+class TestBackgroundWriter(unittest.TestCase):
+
+    def setUp(self):
+        self.writer = BackgroundWriter(maxsize=2)
+        self.done = []
+
+    def tearDown(self):
+        self.writer.close()
+
+    def testFlush(self):
+        """All submitted jobs are completed in order on flush"""
+        for i in range(10):
+            self.writer.submit(self.done.append, i)
+        self.writer.flush()
+        self.assertEqual(self.done, range(10))
+
+    def testBackPressure(self):
+        """Submit blocks while the queue is full"""
+        release = threading.Event()
+        for i in range(3):
+            # One job running, two waiting in the queue:
+            self.writer.submit(release.wait)
+
+        blocked = threading.Thread(target=self.writer.submit,
+                                   args=(self.done.append, 1))
+        blocked.start()
+        time.sleep(0.1)
+        self.assertTrue(blocked.is_alive())
+
+        release.set()
+        blocked.join(1.)
+        self.assertFalse(blocked.is_alive())
+        self.writer.flush()
+        self.assertEqual(self.done, [1])
+
+    def testErrorPropagation(self):
+        """Errors in a job are raised in the submitting thread"""
+        def fail():
+            raise IOError("disk full")
+        self.writer.submit(fail)
+        self.assertRaises(IOError, self.writer.flush)
+        # The error is only raised once, and the writer keeps working:
+        self.writer.submit(self.done.append, 1)
+        self.writer.flush()
+        self.assertEqual(self.done, [1])
+
+    def testErrorDropsQueuedJobs(self):
+        """Jobs queued after a failed job are not run"""
+        release = threading.Event()
+        def fail():
+            release.wait()
+            raise IOError("disk full")
+        self.writer.submit(fail)
+        self.writer.submit(self.done.append, 1)
+        release.set()
+        self.assertRaises(IOError, self.writer.flush)
+        self.assertEqual(self.done, [])
+        self.writer.submit(self.done.append, 2)
+        self.writer.flush()
+        self.assertEqual(self.done, [2])
+
+
+if __name__ == "__main__":
+    unittest.main()
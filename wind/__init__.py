@@ -34,16 +34,19 @@ import itertools
 import math
 import os
 import sys
+import hashlib
 import windmodels
-from datetime import datetime
 from os.path import join as pjoin, split as psplit, splitext as psplitext
 from collections import defaultdict
 
-from Utilities.files import flModDate, flProgramVersion
+from Utilities.files import flModDate, flProgramVersion, flGetStat
 from Utilities.config import ConfigParser
 from Utilities.metutils import convert
-from Utilities.maputils import bearing2theta, makeGrid
+from Utilities.maputils import bearing2theta, makeGrid, makeGridCoords, \
+     polarGrid
 from Utilities.parallel import attemptParallel
+from Utilities.writer import getWriter
+from Utilities.track import ncReadTrackData
 
 import Utilities.nctools as nctools
 
@@ -56,11 +59,30 @@ TRACKFILE_COLS = ('CycloneNumber', 'Datetime', 'TimeElapsed', 'Longitude',
 TRACKFILE_UNIT = ('', '', 'hr', 'degree', 'degree', 'kph', 'degrees',
                   'hPa', 'hPa', 'km')
 
-TRACKFILE_FMTS = ('i', 'object', 'f', 'f8', 'f8', 'f8', 'f8', 'f8', 'f8', 'f8')
+TRACKFILE_FMTS = ('i', 'M8[s]', 'f', 'f8', 'f8', 'f8', 'f8', 'f8', 'f8', 'f8')
+
+# Packing parameters (dtype, scale_factor, add_offset) for the gust
+# output variables, used when the `PackOutput` option is set. Wind
+# speeds are stored to 0.01 m/s and pressures to 1 Pa:
+GUST_PACKING = {
+    'vmax': ('i2', 0.01, 0.),
+    'ua': ('i2', 0.01, 0.),
+    'va': ('i2', 0.01, 0.),
+    'slp': ('i2', 1., 92500.),
+}
+
+# Chunk size (points along each axis) of the gust output variables.
+# Each chunk is compressed separately, so a reader of a window of the
+# region only decompresses the chunks that overlap the window:
+GUST_CHUNKSIZE = 128
+
+# Distance (km) spanned by one degree of latitude, for the earth radius
+# used in :func:`Utilities.maputils.gridLatLonDist`:
+KM_PER_DEGREE = 6367.0 * math.pi / 180.
 
 TRACKFILE_CNVT = {
     0: lambda s: int(float(s.strip() or 0)),
-    1: lambda s: datetime.strptime(s.strip(), DATEFORMAT),
+    1: lambda s: s.strip(),
     5: lambda s: convert(float(s.strip() or 0), TRACKFILE_UNIT[5], 'mps'),
     6: lambda s: bearing2theta(float(s.strip() or 0) * np.pi / 180.),
     7: lambda s: convert(float(s.strip() or 0), TRACKFILE_UNIT[7], 'Pa'),
@@ -170,12 +192,22 @@ class WindfieldAroundTrack(object):
                       latitude and the *x* variable bounds the
                       longitude.
 
+    :type  nestFactor: int
+    :param nestFactor: ratio of the grid spacing of the coarse outer grid
+                       to `resolution`. A value of 1 evaluates the wind
+                       field on a single uniform grid.
+
+    :type  nestRadius: float
+    :param nestRadius: half-width of the fine inner grid, in multiples
+                       of the radius to maximum winds.
+
     """
 
     def __init__(self, track, profileType='powell', windFieldType='kepert',
                  beta=1.5, beta1=1.5, beta2=1.4, thetaMax=70.0,
                  margin=2.0, resolution=0.05, gustFactor=1.23,
-                 gridLimit=None, domain='bounded'):
+                 gridLimit=None, domain='bounded', nestFactor=1,
+                 nestRadius=4.0):
         self.track = track
         self.profileType = profileType
         self.windFieldType = windFieldType
@@ -188,6 +220,19 @@ class WindfieldAroundTrack(object):
         self.gustFactor = gustFactor
         self.gridLimit = gridLimit
         self.domain = domain
+        self.nestFactor = int(nestFactor)
+        self.nestRadius = nestRadius
+
+        # Resolve the profile and boundary layer models once, rather
+        # than on every time step of the track:
+        self.profileModel = windmodels.profile(self.profileType)
+        self.profileValues = [getattr(self, p) for p in
+                              windmodels.profileParams(self.profileType)
+                              if hasattr(self, p)]
+        self.fieldModel = windmodels.field(self.windFieldType)
+        self.fieldValues = [getattr(self, p) for p in
+                            windmodels.fieldParams(self.windFieldType)
+                            if hasattr(self, p)]
 
     def polarGridAroundEye(self, i):
         """
@@ -211,6 +256,27 @@ class WindfieldAroundTrack(object):
                                 self.margin, self.resolution)
         return R, theta
 
+    def gridCoordsAroundEye(self, i):
+        """
+        Longitudes and latitudes of the grid returned by
+        :meth:`polarGridAroundEye` at time i.
+
+        :type  i: int
+        :param i: the time.
+        """
+        if self.domain=='full':
+            return makeGridCoords(self.track.Longitude[i],
+                                  self.track.Latitude[i],
+                                  self.margin, self.resolution,
+                                  minLon=self.gridLimit['xMin'],
+                                  maxLon=self.gridLimit['xMax'],
+                                  minLat=self.gridLimit['yMin'],
+                                  maxLat=self.gridLimit['yMax'])
+        else:
+            return makeGridCoords(self.track.Longitude[i],
+                                  self.track.Latitude[i],
+                                  self.margin, self.resolution)
+
     def pressureProfile(self, i, R):
         """
         Calculate the pressure profile at time `i` at the radiuses `R`
@@ -244,11 +310,73 @@ class WindfieldAroundTrack(object):
         Calculate the local wind field at time `i` around the
         tropical cyclone.
 
+        :type  i: int
+        :param i: the time.
+        """
+        if self.nestFactor > 1:
+            return self.nestedWindField(i)
+
+        R, theta = self.polarGridAroundEye(i)
+        return self.windFieldOnGrid(i, R, theta)
+
+    def nestedWindField(self, i):
+        """
+        Calculate the local wind field at time `i` around the tropical
+        cyclone on nested grids. The wind field is evaluated on a coarse
+        grid (every `nestFactor` points of the local grid) and
+        bilinearly interpolated to the local grid, then replaced by a
+        full resolution evaluation within `nestRadius` * rMax of the
+        eye. The returned arrays have the same shape as those from a
+        uniform grid.
+
         :type  i: int
         :param i: the time.
         """
         lat = self.track.Latitude[i]
         lon = self.track.Longitude[i]
+        lonArray, latArray = self.gridCoordsAroundEye(i)
+        ny, nx = len(latArray), len(lonArray)
+
+        # Coarse outer grid:
+        iy = _coarseIndices(ny, self.nestFactor)
+        ix = _coarseIndices(nx, self.nestFactor)
+        R, theta = polarGrid(lon, lat, lonArray[ix], latArray[iy])
+        Ux, Vy, P = [_upsample(a, iy, ix, ny, nx) for a in
+                     self.windFieldOnGrid(i, R, theta)]
+
+        # Fine inner grid around the eye:
+        dlat = (self.nestRadius * self.track.rMax[i] / KM_PER_DEGREE +
+                self.resolution)
+        dlon = dlat / math.cos(math.radians(lat))
+        jj = np.where(np.abs(latArray - lat) <= dlat)[0]
+        ii = np.where(np.abs(lonArray - lon) <= dlon)[0]
+        if len(jj) > 0 and len(ii) > 0:
+            j0, j1 = jj[0], jj[-1] + 1
+            i0, i1 = ii[0], ii[-1] + 1
+            R, theta = polarGrid(lon, lat, lonArray[i0:i1], latArray[j0:j1])
+            Ui, Vi, Pi = self.windFieldOnGrid(i, R, theta)
+            Ux[j0:j1, i0:i1] = Ui
+            Vy[j0:j1, i0:i1] = Vi
+            P[j0:j1, i0:i1] = Pi
+
+        return (Ux, Vy, P)
+
+    def windFieldOnGrid(self, i, R, theta):
+        """
+        Calculate the wind field and pressure at time `i` on a polar
+        grid around the tropical cyclone.
+
+        :type  i: int
+        :param i: the time.
+
+        :type  R: :class:`numpy.ndarray`
+        :param R: the distances (km) of the grid points from the eye.
+
+        :type  theta: :class:`numpy.ndarray`
+        :param theta: the angles of the grid points from the eye.
+        """
+        lat = self.track.Latitude[i]
+        lon = self.track.Longitude[i]
         eP = self.track.EnvPressure[i]
         cP = self.track.CentralPressure[i]
         rMax = self.track.rMax[i]
@@ -256,21 +384,12 @@ class WindfieldAroundTrack(object):
         thetaFm = self.track.Bearing[i]
         thetaMax = self.thetaMax
 
-        #FIXME: temporary way to do this
-        cls = windmodels.profile(self.profileType)
-        params = windmodels.profileParams(self.profileType)
-        values = [getattr(self, p) for p in params if hasattr(self, p)]
-        profile = cls(lat, lon, eP, cP, rMax, *values)
-
-        R, theta = self.polarGridAroundEye(i)
+        profile = self.profileModel(lat, lon, eP, cP, rMax,
+                                    *self.profileValues)
 
         P = self.pressureProfile(i, R)
 
-        #FIXME: temporary way to do this
-        cls = windmodels.field(self.windFieldType)
-        params = windmodels.fieldParams(self.windFieldType)
-        values = [getattr(self, p) for p in params if hasattr(self, p)]
-        windfield = cls(profile, *values)
+        windfield = self.fieldModel(profile, *self.fieldValues)
 
         Ux, Vy = windfield.field(R, theta, vFm, thetaFm,  thetaMax)
 
@@ -392,6 +511,121 @@ class WindfieldAroundTrack(object):
         return gust, bearing, UU, VV, pressure, lonGrid / 100., latGrid / 100.
 
 
+def _coarseIndices(n, factor):
+    """
+    Indices of every `factor` points along an axis of length `n`. The
+    last point is always included so the coarse grid spans the axis.
+    """
+    idx = np.arange(0, n, factor)
+    if idx[-1] != n - 1:
+        idx = np.append(idx, n - 1)
+    return idx
+
+
+def _upsample(data, iy, ix, ny, nx):
+    """
+    Bilinearly interpolate `data`, defined at the rows `iy` and columns
+    `ix` of a (`ny`, `nx`) grid, to every point of that grid.
+    """
+    def weights(idx, n):
+        pos = np.arange(n)
+        k = np.clip(np.searchsorted(idx, pos, side='right') - 1,
+                    0, max(len(idx) - 2, 0))
+        if len(idx) < 2:
+            return k, k, np.zeros(n)
+        w = (pos - idx[k]).astype(float) / (idx[k + 1] - idx[k])
+        return k, k + 1, w
+
+    k0, k1, w = weights(ix, nx)
+    tmp = data[:, k0] * (1. - w) + data[:, k1] * w
+    k0, k1, w = weights(iy, ny)
+    return tmp[k0, :] * (1. - w[:, None]) + tmp[k1, :] * w[:, None]
+
+
+def gustFileName(trackfile, windfieldPath):
+    """
+    Name of the gust output file of a track file: 'tracks.00001.nc'
+    gives 'gust.00001.nc'.
+
+    :param str trackfile: the track file name (or label).
+    :param str windfieldPath: the path of the gust output files.
+
+    """
+    base = psplitext(psplit(trackfile)[1])[0]
+    return pjoin(windfieldPath, base.replace('tracks', 'gust') + '.nc')
+
+
+def windfieldSettings(config):
+    """
+    A hash of the configuration settings that determine the gust
+    output of a track: the settings of the Region and
+    WindfieldInterface sections.
+
+    :param config: :class:`Utilities.config.ConfigParser` instance.
+
+    :return: the md5 hash of the settings, as a hex string.
+
+    """
+    md5 = hashlib.md5()
+    for section in ('Region', 'WindfieldInterface'):
+        if not config.has_section(section):
+            continue
+        for option in sorted(config.options(section)):
+            md5.update('%s_%s=%s\n' % (section, option,
+                                       config.get(section, option)))
+    return md5.hexdigest()
+
+
+def isGustCurrent(gustfile, trackfile, settings):
+    """
+    Test if a gust output file was written from the current contents of
+    a track file, with the same settings (see :func:`windfieldSettings`).
+    The md5 checksum of the track file and the settings are saved as the
+    `track_file_md5` and `windfield_settings` attributes of the gust
+    output file.
+
+    :param str gustfile: the gust output file.
+    :param str trackfile: the track file.
+    :param str settings: the hash of the current settings.
+
+    :rtype: bool
+
+    """
+    if not os.path.isfile(gustfile):
+        return False
+    with nctools.NC_LOCK:
+        try:
+            ncobj = nctools.ncLoadFile(gustfile)
+        except (IOError, RuntimeError):
+            return False
+        try:
+            attributes = ncobj.__dict__
+            recorded = (attributes.get('track_file_md5'),
+                        attributes.get('windfield_settings'))
+        finally:
+            ncobj.close()
+    return recorded == (flGetStat(trackfile)[2], settings)
+
+
+def gustFootprint(gust):
+    """
+    Index limits of the smallest window of the grid that holds all the
+    non-zero gust wind speeds (the footprint of an event).
+
+    :param gust: 2-D :class:`numpy.ndarray` of gust wind speeds.
+
+    :returns: tuple of index limits (xmin, xmax, ymin, ymax), in the
+              same form as the limits of a hazard tile, or
+              (0, 0, 0, 0) if all gust wind speeds are zero.
+
+    """
+    rows = np.flatnonzero(np.any(gust != 0, axis=1))
+    cols = np.flatnonzero(np.any(gust != 0, axis=0))
+    if len(rows) == 0:
+        return (0, 0, 0, 0)
+    return (int(cols[0]), int(cols[-1]) + 1, int(rows[0]), int(rows[-1]) + 1)
+
+
 class WindfieldGenerator(object):
     """
     The wind field generator.
@@ -428,12 +662,26 @@ class WindfieldGenerator(object):
                       variable bounds the latitude and the *x* variable bounds
                       the longitude.
 
+    :type  packOutput: bool
+    :param packOutput: if True, store the gust output as packed 16-bit
+                       integers (see `GUST_PACKING`).
+
+    :type  nestFactor: int
+    :param nestFactor: ratio of the outer grid spacing to `resolution`
+                       for nested wind field evaluation (1 disables
+                       nesting).
+
+    :type  nestRadius: float
+    :param nestRadius: half-width of the fine inner grid, in multiples
+                       of the radius to maximum winds.
+
     """
 
     def __init__(self, config, margin=2.0, resolution=0.05,
                  profileType='powell', windFieldType='kepert',
                  beta=1.5, beta1=1.5, beta2=1.4,
-                 thetaMax=70.0, gridLimit=None, domain='bounded'):
+                 thetaMax=70.0, gridLimit=None, domain='bounded',
+                 packOutput=False, nestFactor=1, nestRadius=4.0):
 
         self.config = config
         self.margin = margin
@@ -446,6 +694,9 @@ class WindfieldGenerator(object):
         self.thetaMax = thetaMax
         self.gridLimit = gridLimit
         self.domain = domain
+        self.packOutput = packOutput
+        self.nestFactor = nestFactor
+        self.nestRadius = nestRadius
 
     def setGridLimit(self, track):
         """
@@ -494,7 +745,9 @@ class WindfieldGenerator(object):
                                   margin=self.margin,
                                   resolution=self.resolution,
                                   gridLimit=self.gridLimit,
-                                  domain=self.domain)
+                                  domain=self.domain,
+                                  nestFactor=self.nestFactor,
+                                  nestRadius=self.nestRadius)
 
         return track, wt.regionalExtremes(self.gridLimit, callback)
 
@@ -638,7 +891,8 @@ class WindfieldGenerator(object):
             }
         }
 
-        nctools.ncSaveGrid(dumpfile, dimensions, variables)
+        with nctools.NC_LOCK:
+            nctools.ncSaveGrid(dumpfile, dimensions, variables)
 
 
     def plotExtremesFromTrackfile(self, trackfile, windfieldfile,
@@ -679,6 +933,10 @@ class WindfieldGenerator(object):
         Dump the maximum wind speeds (gusts) observed over a region to
         netcdf files. One file is created for every track file.
 
+        Files are written by the shared background writer
+        (:mod:`Utilities.writer`) while the next track file is
+        processed. All files have been written when this method returns.
+
         :type  trackiter: list of :class:`Track` objects
         :param trackiter: a list of :class:`Track` objects.
 
@@ -691,7 +949,8 @@ class WindfieldGenerator(object):
 
         :type  progressCallback: function
         :param progressCallback: optional function to be called after a file is
-                                 saved. This can be used to track progress.
+                                 queued for saving. This can be used to track
+                                 progress.
 
         :type  timeStepCallBack: function
         :param timeStepCallback: optional function to be called at each
@@ -706,6 +965,7 @@ class WindfieldGenerator(object):
 
         gusts = {}
         done = defaultdict(list)
+        writer = getWriter()
 
         i = 0
         for track, result in results:
@@ -717,20 +977,17 @@ class WindfieldGenerator(object):
                 gust = np.where(gust > gust1, gust, gust1)
                 Vx = np.where(gust > gust1, Vx, Vx1)
                 Vy = np.where(gust > gust1, Vy, Vy1)
-                P = np.where(P1 < P, P1, P)
+                # Empty tracks give a NaN pressure, which is ignored:
+                P = np.fmin(P1, P)
 
             gusts[track.trackfile] = (gust, bearing, Vx, Vy, P, lon, lat)
             done[track.trackfile] += [track.trackId]
             if len(done[track.trackfile]) >= done[track.trackfile][0][1]:
-                path, basename = psplit(track.trackfile)
-                base, ext = psplitext(basename)
-                dumpfile = pjoin(windfieldPath,
-                                 base.replace('tracks', 'gust') + '.nc')
+                dumpfile = gustFileName(track.trackfile, windfieldPath)
 
                 #dumpfile = pjoin(windfieldPath, fnFormat % (pp.rank(), i))
-                self._saveGustToFile(track.trackfile,
-                                     (lat, lon, gust, Vx, Vy, P),
-                                     dumpfile)
+                writer.submit(self._saveGustToFile, track.trackfile,
+                              (lat, lon, gust, Vx, Vy, P), dumpfile)
 
                 del done[track.trackfile]
                 del gusts[track.trackfile]
@@ -740,13 +997,86 @@ class WindfieldGenerator(object):
                 if progressCallback:
                     progressCallback(i)
 
+        writer.flush()
+
+    def dumpGustsFromBatches(self, batches, trackfile, windfieldPath,
+                             timeStepCallback=None):
+        """
+        Dump the maximum wind speeds (gusts) from the tracks of one
+        simulation to a netcdf file, where the tracks are held in memory
+        rather than read from a track file.
+
+        The tracks arrive in batches, as generated by
+        :meth:`TrackGenerator.TrackGenerator.iterTracks`, and only the
+        extremes over the tracks seen so far are kept between batches.
+        The output file is named after `trackfile` as for
+        :meth:`dumpGustsFromTracks`, and is written by the shared
+        background writer.
+
+        :param batches: iterable of track record arrays, with the
+                        fields `TRACKFILE_COLS`, in the units of a
+                        track .csv file.
+        :param str trackfile: the track file name (or label) of the
+                              simulation.
+        :param str windfieldPath: the path where to store the gust
+                                  output file.
+        :param timeStepCallback: optional function to be called at each
+                                 timestep to extract point values for
+                                 specified locations.
+
+        :return: the name of the gust file.
+
+        """
+        extremes = None
+        for batch in batches:
+            if len(batch) == 0:
+                continue
+            data = trackDataFromFields(batch)
+            for track in loadTracksFromArrays(splitTracks(data), trackfile):
+                track, result = self.calculateExtremesFromTrack(
+                    track, timeStepCallback)
+                gust, bearing, Vx, Vy, P, lon, lat = result
+                if extremes is not None:
+                    gust1, bearing1, Vx1, Vy1, P1, lon1, lat1 = extremes
+                    gust = np.where(gust > gust1, gust, gust1)
+                    Vx = np.where(gust > gust1, Vx, Vx1)
+                    Vy = np.where(gust > gust1, Vy, Vy1)
+                    P = np.fmin(P1, P)
+                extremes = (gust, bearing, Vx, Vy, P, lon, lat)
+
+        if extremes is None:
+            # As for an empty track file, the output holds the extremes
+            # of an empty track:
+            empty = trackDataFromFields(
+                dict((col, []) for col in TRACKFILE_COLS))
+            track = loadTracksFromArrays([empty], trackfile)[0]
+            track, extremes = self.calculateExtremesFromTrack(
+                track, timeStepCallback)
+
+        gust, bearing, Vx, Vy, P, lon, lat = extremes
+        dumpfile = gustFileName(trackfile, windfieldPath)
+        getWriter().submit(self._saveGustToFile, trackfile,
+                           (lat, lon, gust, Vx, Vy, P), dumpfile)
+        return dumpfile
+
     def _saveGustToFile(self, trackfile, result, filename):
         """
-        Save gusts to a file.
+        Save gusts to a file. The index limits of the non-zero gust wind
+        speeds (see :func:`gustFootprint`) are saved as the `footprint`
+        attribute of the `vmax` variable, and the checksum of the track
+        file and the settings as global attributes (see
+        :func:`isGustCurrent`).
         """
         lat, lon, speed, Vx, Vy, P = result
 
-        trackfileDate = flModDate(trackfile)
+        # Tracks passed in memory may carry a label rather than the
+        # name of a file on disk:
+        if os.path.isfile(trackfile):
+            trackfileDate = flModDate(trackfile)
+            trackfileMd5 = flGetStat(trackfile)[2]
+        else:
+            trackfileDate = ''
+            trackfileMd5 = ''
 
         gatts = {
             'title': 'TCRM hazard simulation - synthetic event wind field',
@@ -754,6 +1084,8 @@ class WindfieldGenerator(object):
             'python_version': sys.version,
             'track_file': trackfile,
             'track_file_date': trackfileDate,
+            'track_file_md5': trackfileMd5,
+            'windfield_settings': windfieldSettings(self.config),
             'radial_profile': self.profileType,
             'boundary_layer': self.windFieldType,
             'beta': self.beta}
@@ -804,6 +1136,7 @@ class WindfieldGenerator(object):
                     'valid_range': (0.0, 200.),
                     'cell_methods': ('time: maximum '
                                      'time: maximum (interval: 3 seconds)'),
+                    'footprint': np.array(gustFootprint(speed), dtype='i4'),
                     'grid_mapping': 'crs'
                 }
             },
@@ -864,7 +1197,23 @@ class WindfieldGenerator(object):
             }
         }
 
-        nctools.ncSaveGrid(filename, dimensions, variables, gatts=gatts)
+        if self.packOutput:
+            for var in variables.itervalues():
+                if var['name'] in GUST_PACKING:
+                    dtype, scale, offset = GUST_PACKING[var['name']]
+                    var['dtype'] = dtype
+                    var['scale_factor'] = scale
+                    var['add_offset'] = offset
+
+        chunksizes = (min(len(lat), GUST_CHUNKSIZE),
+                      min(len(lon), GUST_CHUNKSIZE))
+        for var in variables.itervalues():
+            if var['dims'] == ('lat', 'lon'):
+                var['chunksizes'] = chunksizes
+
+        with nctools.NC_LOCK:
+            nctools.ncSaveGrid(filename, dimensions, variables,
+                               gatts=gatts)
 
     def dumpGustsFromTrackfiles(self, trackfiles, windfieldPath,
                                 filenameFormat='gust-%02i-%04i.nc',
@@ -912,6 +1261,14 @@ def readTrackData(trackfile):
         TRACKFILE_FMTS -- The entry formats
         TRACKFILE_CNVT -- The column converters
 
+    The times (in the format `DATEFORMAT`) are read as text, and
+    converted to :class:`numpy.datetime64` values for the whole file
+    at once.
+
+    Track files with the extension `.nc` are read with
+    :func:`Utilities.track.ncReadTrackData`, and converted with
+    :func:`trackDataFromFields`.
+
     :param str trackfile: the track data filename.
 
     :return: track data
@@ -919,14 +1276,21 @@ def readTrackData(trackfile):
 
     """
 
+    if trackfile.endswith('.nc'):
+        return trackDataFromFields(ncReadTrackData(trackfile))
+
+    formats = list(TRACKFILE_FMTS)
+    formats[1] = 'S19'
     try:
-        return np.loadtxt(trackfile,
+        data = np.loadtxt(trackfile,
                           comments='%',
                           delimiter=',',
                           dtype={
                           'names': TRACKFILE_COLS,
-                          'formats': TRACKFILE_FMTS},
+                          'formats': formats},
                           converters=TRACKFILE_CNVT)
+        return data.astype({'names': TRACKFILE_COLS,
+                            'formats': TRACKFILE_FMTS})
     except ValueError:
         # return an empty array with the appropriate `dtype` field names
         return np.empty(0, dtype={
@@ -949,14 +1313,38 @@ def readMultipleTrackData(trackfile):
     datas = []
     data = readTrackData(trackfile)
     if len(data) > 0:
+        # Find the rows of each track with one sort, rather than
+        # comparing every row with each cyclone number:
         cycloneId = data['CycloneNumber']
-        for i in range(1, np.max(cycloneId) + 1):
-            datas.append(data[cycloneId == i])
+        order = np.argsort(cycloneId, kind='mergesort')
+        bounds = cycloneId[order].searchsorted(
+            np.arange(1, np.max(cycloneId) + 2))
+        for start, end in zip(bounds[:-1], bounds[1:]):
+            datas.append(data[order[start:end]])
     else:
         datas.append(data)
     return datas
 
 
+def splitTracks(data):
+    """
+    Split track data into one array for each track. The rows of each
+    track must be contiguous, as they are in the output of the track
+    generator.
+
+    :param data: track data, as returned by :func:`readTrackData` or
+                 :func:`trackDataFromFields`.
+
+    :return: list of track data arrays, one per track.
+
+    """
+
+    if len(data) == 0:
+        return []
+    starts = np.flatnonzero(np.diff(data['CycloneNumber'])) + 1
+    return np.split(data, starts)
+
+
 def loadTracksFromFiles(trackfiles):
     """
     Generator that yields :class:`Track` objects from a list of track
@@ -983,8 +1371,8 @@ def loadTracksFromFiles(trackfiles):
 
 def loadTracks(trackfile):
     """
-    Read tracks from a track .csv file and return a list of :class:`Track`
-    objects.
+    Read tracks from a track .csv (or .nc) file and return a list of
+    :class:`Track` objects.
 
     This calls the function `readMultipleTrackData` to parse the track .csv
     file.
@@ -995,8 +1383,58 @@ def loadTracks(trackfile):
 
     """
 
-    tracks = []
     datas = readMultipleTrackData(trackfile)
+    return loadTracksFromArrays(datas, trackfile)
+
+
+def trackDataFromFields(data):
+    """
+    Convert track data held in memory (in the units of a track .csv
+    file) to the form returned by :func:`readTrackData`.
+
+    This applies the same unit conversions as `TRACKFILE_CNVT`, but to
+    whole columns at once, so that a track does not need to be written
+    to and parsed from a file before the wind field is calculated.
+
+    :param data: the track data. Any object that can be indexed by the
+                 names in `TRACKFILE_COLS`, e.g. a :class:`numpy.recarray`.
+
+    :return: track data
+    :rtype: :class:`numpy.ndarray`
+
+    """
+
+    n = len(data[TRACKFILE_COLS[0]])
+    newdata = np.empty(n, dtype={'names': TRACKFILE_COLS,
+                                 'formats': TRACKFILE_FMTS})
+    for col in TRACKFILE_COLS:
+        newdata[col] = data[col]
+
+    newdata['Speed'] = convert(newdata['Speed'], TRACKFILE_UNIT[5], 'mps')
+    newdata['Bearing'] = bearing2theta(newdata['Bearing'] * np.pi / 180.)
+    newdata['CentralPressure'] = convert(newdata['CentralPressure'],
+                                         TRACKFILE_UNIT[7], 'Pa')
+    newdata['EnvPressure'] = convert(newdata['EnvPressure'],
+                                     TRACKFILE_UNIT[8], 'Pa')
+    return newdata
+
+
+def loadTracksFromArrays(datas, trackfile):
+    """
+    Return a list of :class:`Track` objects from a list of track data
+    arrays that have already been converted with :func:`readTrackData`
+    or :func:`trackDataFromFields`.
+
+    :param datas: list of track data arrays, one per track.
+    :param str trackfile: the track file name (or a label when the tracks
+                          have not been read from a file). Gust output is
+                          grouped and named by this value.
+
+    :return: list of :class:`Track` objects.
+
+    """
+
+    tracks = []
     n = len(datas)
     for i, data in enumerate(datas):
         track = Track(data)
@@ -1037,12 +1475,16 @@ def balanced(iterable):
     return itertools.islice(iterable, p, None, P)
 
 
-def run(configFile, callback=None):
+def windfieldGeneratorFromConfig(configFile):
     """
-    Run the wind field calculations.
+    Set up a :class:`WindfieldGenerator` and the time step callback
+    from the settings in a configuration file.
 
     :param str configFile: path to a configuration file.
-    :param func callback: optional callback function to track progress.
+
+    :return: the wind field generator, the time step callback and the
+             :class:`Utilities.timeseries.Timeseries` object used by the
+             callback (or `None` if no time series are extracted).
 
     """
 
@@ -1053,7 +1495,6 @@ def run(configFile, callback=None):
     config = ConfigParser()
     config.read(configFile)
 
-    outputPath = config.get('Output', 'Path')
     profileType = config.get('WindfieldInterface', 'profileType')
     windFieldType = config.get('WindfieldInterface', 'windFieldType')
     beta = config.getfloat('WindfieldInterface', 'beta')
@@ -1063,10 +1504,9 @@ def run(configFile, callback=None):
     margin = config.getfloat('WindfieldInterface', 'Margin')
     resolution = config.getfloat('WindfieldInterface', 'Resolution')
     domain = config.get('WindfieldInterface', 'Domain')
-
-    windfieldPath = pjoin(outputPath, 'windfield')
-    trackPath = pjoin(outputPath, 'tracks')
-    windfieldFormat = 'gust-%i-%04d.nc'
+    packOutput = config.getboolean('WindfieldInterface', 'PackOutput')
+    nestFactor = config.getint('WindfieldInterface', 'NestFactor')
+    nestRadius = config.getfloat('WindfieldInterface', 'NestRadius')
 
     gridLimit = None
     if config.has_option('Region','gridLimit'):
@@ -1075,18 +1515,16 @@ def run(configFile, callback=None):
     if config.has_option('WindfieldInterface', 'gridLimit'):
         gridLimit = config.geteval('WindfieldInterface', 'gridLimit')
 
+    ts = None
     if config.has_section('Timeseries'):
         if config.has_option('Timeseries', 'Extract'):
             if config.getboolean('Timeseries', 'Extract'):
                 from Utilities.timeseries import Timeseries
                 log.debug("Timeseries data will be extracted")
                 ts = Timeseries(configFile)
-                timestepCallback = ts.extract
-            else:
-                def timestepCallback(*args):
-                    """Dummy timestepCallback function"""
-                    pass
 
+    if ts is not None:
+        timestepCallback = ts.extract
     else:
         def timestepCallback(*args):
             """Dummy timestepCallback function"""
@@ -1094,12 +1532,6 @@ def run(configFile, callback=None):
 
     thetaMax = math.radians(thetaMax)
 
-    # Attempt to start the track generator in parallel
-    global pp
-    pp = attemptParallel()
-
-    log.info('Running windfield generator')
-
     wfg = WindfieldGenerator(config=config,
                              margin=margin,
                              resolution=resolution,
@@ -1110,7 +1542,38 @@ def run(configFile, callback=None):
                              beta2=beta2,
                              thetaMax=thetaMax,
                              gridLimit=gridLimit,
-                             domain=domain)
+                             domain=domain,
+                             packOutput=packOutput,
+                             nestFactor=nestFactor,
+                             nestRadius=nestRadius)
+
+    return wfg, timestepCallback, ts
+
+
+def run(configFile, callback=None):
+    """
+    Run the wind field calculations.
+
+    :param str configFile: path to a configuration file.
+    :param func callback: optional callback function to track progress.
+
+    """
+
+    config = ConfigParser()
+    config.read(configFile)
+
+    outputPath = config.get('Output', 'Path')
+    windfieldPath = pjoin(outputPath, 'windfield')
+    trackPath = pjoin(outputPath, 'tracks')
+    windfieldFormat = 'gust-%i-%04d.nc'
+
+    wfg, timestepCallback, ts = windfieldGeneratorFromConfig(configFile)
+
+    # Attempt to start the track generator in parallel
+    global pp
+    pp = attemptParallel()
+
+    log.info('Running windfield generator')
 
     msg = 'Dumping gusts to %s' % windfieldPath
     log.info(msg)
@@ -1119,6 +1582,18 @@ def run(configFile, callback=None):
 
     files = os.listdir(trackPath)
     trackfiles = [pjoin(trackPath, f) for f in files if f.startswith('tracks')]
+
+    # Track files whose gust output is up to date are skipped, so the
+    # gust files of earlier simulations are left unchanged when more
+    # simulations are added. Time series need every track:
+    if ts is None:
+        settings = windfieldSettings(config)
+        current = [f for f in trackfiles if
+                   isGustCurrent(gustFileName(f, windfieldPath), f, settings)]
+        if current:
+            log.info('Skipping %d track files with current gust output',
+                     len(current))
+            trackfiles = sorted(set(trackfiles) - set(current))
     nfiles = len(trackfiles)
 
     def progressCallback(i):
@@ -1134,11 +1609,58 @@ def run(configFile, callback=None):
 
     wfg.dumpGustsFromTrackfiles(trackfiles, windfieldPath, windfieldFormat,
                                 progressCallback, timestepCallback)
-    try:
+    if ts is not None:
         ts.shutdown()
-    except NameError:
-        pass
 
     pp.barrier()
 
     log.info('Completed windfield generator')
+
+
+def runTracks(configFile, tracks, trackfile, callback=None):
+    """
+    Run the wind field calculations for tracks that are already held in
+    memory, e.g. the interpolated track of a single event. This avoids
+    writing the tracks to a file and parsing them again.
+
+    The gust output file is named after `trackfile` in the same way as
+    for :func:`run`, so a label of 'tracks.interp.csv' gives an output
+    file 'gust.interp.nc'.
+
+    :param str configFile: path to a configuration file.
+    :param tracks: list of track data arrays (one per track) in the units
+                   of a track .csv file. See :func:`trackDataFromFields`.
+    :param str trackfile: the track file name or label for the tracks.
+    :param func callback: optional callback function to track progress.
+
+    """
+
+    config = ConfigParser()
+    config.read(configFile)
+
+    outputPath = config.get('Output', 'Path')
+    windfieldPath = pjoin(outputPath, 'windfield')
+    windfieldFormat = 'gust-%i-%04d.nc'
+
+    wfg, timestepCallback, ts = windfieldGeneratorFromConfig(configFile)
+
+    global pp
+    pp = attemptParallel()
+
+    log.info('Running windfield generator on %d tracks held in memory',
+             len(tracks))
+
+    datas = [trackDataFromFields(data) for data in tracks]
+    trackiter = loadTracksFromArrays(datas, trackfile)
+
+    def progressCallback(i):
+        """Define the callback function"""
+        if callback:
+            callback(i, 1)
+
+    wfg.dumpGustsFromTracks(trackiter, windfieldPath, windfieldFormat,
+                            progressCallback, timestepCallback)
+    if ts is not None:
+        ts.shutdown()
+
+    log.info('Completed windfield generator')